@@ -0,0 +1,73 @@
+"""
+Cold-start benchmark for the web app.
+
+Measures, each in a fresh interpreter:
+  - import: `import src.main` (must not need a GROQ key or touch the dataset)
+  - startup: running the app lifespan, i.e. loading the knowledge base and
+    building the model client and caches, as a new worker does
+
+Usage:
+    python -m src.benchmarks.boot_time --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import src.main
+print(json.dumps({"import": time.perf_counter() - started}))
+"""
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from src.main import create_app
+imported = time.perf_counter()
+
+async def run():
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+
+def _run(script: str, env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-target-ms", type=float, default=1500.0)
+    parser.add_argument("--startup-target-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    base_env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    base_env["KNOWLEDGE_WATCH_INTERVAL_SECONDS"] = "0"
+    # The startup run never reaches the model, it only builds the client.
+    startup_env = {**base_env, "GROQ_API_KEY": "benchmark"}
+
+    imports = [_run(IMPORT_SCRIPT, base_env)["import"] * 1000 for _ in range(args.runs)]
+    startups = [_run(STARTUP_SCRIPT, startup_env)["startup"] * 1000 for _ in range(args.runs)]
+
+    import_ms = statistics.median(imports)
+    startup_ms = statistics.median(startups)
+    print(f"runs={args.runs} import median={import_ms:.0f}ms max={max(imports):.0f}ms "
+          f"startup median={startup_ms:.0f}ms max={max(startups):.0f}ms")
+    print(f"target import < {args.import_target_ms:.0f}ms (no GROQ key):",
+          "PASS" if import_ms < args.import_target_ms else "FAIL")
+    print(f"target startup < {args.startup_target_ms:.0f}ms:",
+          "PASS" if startup_ms < args.startup_target_ms else "FAIL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Scaling benchmark for dataset loading and prompt building.
+
+Writes synthetic datasets --scales times the size of the combined RAG
+dataset (every record repeated with its titles, texts and FAQ questions made
+unique, so deduplication keeps them) and times load_and_process_rag_data and
+create_system_prompt on each, with the resulting prompt size.
+
+Usage:
+    python -m src.benchmarks.dataset_bench --scales 10,100,1000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..services.data_loader import DATASET_FILE, load_and_process_rag_data
+from ..services.prompt_builder import create_system_prompt
+from ..services.tokens import estimate_tokens
+
+
+def _variant(record: Dict[str, Any], copy: int) -> Dict[str, Any]:
+    if copy == 0:
+        return record
+    record = json.loads(json.dumps(record))
+    tag = f" (campus {copy})"
+    for field in ("title", "text_content"):
+        if isinstance(record.get(field), str):
+            record[field] += tag
+    for faq in record.get("faq_list") or []:
+        faq["question"] = faq.get("question", "") + tag
+    return record
+
+
+def write_scaled_dataset(records: List[Dict[str, Any]], scale: int, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for copy in range(scale):
+            for record in records:
+                f.write(json.dumps(_variant(record, copy), ensure_ascii=False) + "\n")
+
+
+def _time(fn, repeat: int) -> np.ndarray:
+    timings = np.empty(repeat)
+    for n in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings[n] = time.perf_counter() - started
+    return timings * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DATASET_FILE)
+    parser.add_argument("--scales", default="1,10,100,1000", help="comma-separated size multiples")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.dataset, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in (int(step) for step in args.scales.split(",")):
+            path = os.path.join(tmp, f"rag_x{scale}.jsonl")
+            write_scaled_dataset(records, scale, path)
+            size_mib = os.path.getsize(path) / 2**20
+
+            rag_data = load_and_process_rag_data(path)
+            load_ms = _time(lambda: load_and_process_rag_data(path), args.repeat)
+            prompt_ms = _time(lambda: create_system_prompt(rag_data), args.repeat)
+            prompt = create_system_prompt(rag_data)
+
+            print(f"x{scale:<5} records={len(records) * scale:<7} file={size_mib:7.2f} MiB "
+                  f"load p50={np.percentile(load_ms, 50):9.1f}ms "
+                  f"prompt p50={np.percentile(prompt_ms, 50):9.1f}ms "
+                  f"prompt={len(prompt) / 1024:9.1f} KiB ~{estimate_tokens(prompt)} tokens")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
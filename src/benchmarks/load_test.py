@@ -0,0 +1,116 @@
+"""
+Closed-loop load generator for the chat API.
+
+Runs --duration seconds at each concurrency in --steps (every worker sends
+its next request as soon as the previous one finishes) and reports
+throughput, latency percentiles, error rate and the answer sources. Run it
+against a server whose LLM_BASE_URL points at src.benchmarks.stub_llm_server
+to measure the app itself rather than the model provider.
+
+Usage:
+    python -m src.benchmarks.load_test --url http://127.0.0.1:8000 --steps 1,8,32,128 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import List, Tuple
+
+import httpx
+import numpy as np
+
+TOPICS = ["diploma in agricultural engineering", "certificate in ict", "hostel accommodation", "the library",
+          "helb loans", "the january intake", "electrical engineering", "fee payment", "student id cards",
+          "the admissions office", "building technology", "food and beverage", "automotive engineering"]
+TEMPLATES = ["what are the requirements for {0}", "how much are the fees for {0}", "tell me about {0}",
+             "how long does {0} take", "where can I find information on {0}", "is {0} available this year"]
+
+
+def make_questions(count: int, rng: random.Random) -> List[str]:
+    """
+    count distinct questions; a larger pool means fewer cache hits.
+    """
+    questions = [template.format(topic) for template in TEMPLATES for topic in TOPICS]
+    while len(questions) < count:
+        questions.append(f"{rng.choice(TEMPLATES).format(rng.choice(TOPICS))} (ref {len(questions)})")
+    rng.shuffle(questions)
+    return questions[:count]
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, question: str) -> Tuple[float, bool, str]:
+    started = time.perf_counter()
+    try:
+        response = await client.post(endpoint, json={"message": question})
+        if response.status_code != 200:
+            return time.perf_counter() - started, False, f"http {response.status_code}"
+        if endpoint.endswith("/stream"):
+            body = response.text
+            ok = "event: error" not in body
+            source = "stream"
+            for line in body.splitlines():
+                if line.startswith("data:") and '"source"' in line:
+                    source = json.loads(line[5:]).get("source", source)
+                    break
+            return time.perf_counter() - started, ok, source if ok else "stream error"
+        return time.perf_counter() - started, True, response.json().get("source", "unknown")
+    except httpx.HTTPError as e:
+        return time.perf_counter() - started, False, type(e).__name__
+
+
+async def run_step(url: str, endpoint: str, concurrency: int, duration: float, questions: List[str],
+                   timeout: float, rng: random.Random) -> None:
+    latencies: List[float] = []
+    errors = 0
+    sources: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                elapsed, ok, source = await _one_request(client, endpoint, rng.choice(questions))
+                latencies.append(elapsed)
+                sources[source] += 1
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    total = len(latencies)
+    if not total:
+        print(f"concurrency={concurrency:<4} no requests completed")
+        return
+    millis = np.array(latencies) * 1000
+    mix = " ".join(f"{source}={count / total:.0%}" for source, count in sources.most_common())
+    print(f"concurrency={concurrency:<4} requests={total:<6} rps={total / wall:8.1f} "
+          f"p50={np.percentile(millis, 50):7.1f}ms p95={np.percentile(millis, 95):7.1f}ms "
+          f"p99={np.percentile(millis, 99):7.1f}ms errors={errors / total:.1%}  [{mix}]")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    questions = make_questions(args.questions, rng)
+    print(f"target={args.url}{args.endpoint} questions={len(questions)} duration={args.duration}s per step")
+    for concurrency in (int(step) for step in args.steps.split(",")):
+        await run_step(args.url, args.endpoint, concurrency, args.duration, questions, args.timeout, rng)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="/chat", choices=("/chat", "/chat/stream"))
+    parser.add_argument("--steps", default="1,8,32,128", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per step")
+    parser.add_argument("--questions", type=int, default=5000, help="distinct questions in the pool")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Per-page extraction benchmark for the site spiders.
+
+Runs each spider callback over saved HTML pages (fixtures/scraper/pages.json
+lists the file, spider, callback, URL and request meta of every page) without
+any network or Scrapy engine, and reports the items and follow-up requests
+it produced with its p50/p95 extraction time. Point --fixtures at a directory
+of pages saved from a new site, with its own pages.json, to check that its
+extraction spec works and what it costs.
+
+Usage:
+    python -m src.benchmarks.parse_bench [--fixtures DIR] [--repeat 200]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..refresh_dataset import SCRAPY_PROJECT_DIR
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scraper")
+
+
+def _spider_classes() -> Dict[str, Any]:
+    if SCRAPY_PROJECT_DIR not in sys.path:
+        sys.path.insert(0, SCRAPY_PROJECT_DIR)
+    from site_scraper.spiders.heq_faq_spider import HefFaqSpider
+    from site_scraper.spiders.site_spider import SiteExplorerForRagSpider
+    return {cls.name: cls for cls in (SiteExplorerForRagSpider, HefFaqSpider)}
+
+
+def load_pages(fixtures_dir: str) -> List[Dict[str, Any]]:
+    """
+    Returns the fixture pages as ready-made responses with the callback that parses them.
+    """
+    from scrapy.http import HtmlResponse, Request
+
+    spider_classes = _spider_classes()
+    spiders: Dict[str, Any] = {}
+    pages = []
+    with open(os.path.join(fixtures_dir, "pages.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    for page in manifest:
+        if page["spider"] not in spiders:
+            spiders[page["spider"]] = spider_classes[page["spider"]]()
+        with open(os.path.join(fixtures_dir, page["file"]), "rb") as f:
+            body = f.read()
+        request = Request(page["url"], meta=page.get("meta", {}))
+        pages.append({
+            "file": page["file"],
+            "callback": getattr(spiders[page["spider"]], page["callback"]),
+            "response": HtmlResponse(page["url"], body=body, encoding="utf-8", request=request),
+        })
+    return pages
+
+
+def run_callback(page: Dict[str, Any]) -> List[Any]:
+    # A fresh response per run: parsel caches the parsed document on the response.
+    response = page["response"].replace()
+    return list(page["callback"](response) or [])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="directory with pages.json and saved HTML pages")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    from scrapy.http import Request
+
+    print(f"{'page':<24} {'KiB':>6} {'items':>6} {'requests':>9} {'p50 us':>9} {'p95 us':>9}")
+    total = 0.0
+    for page in load_pages(args.fixtures):
+        output = run_callback(page)
+        requests = sum(isinstance(result, Request) for result in output)
+        timings = np.empty(args.repeat)
+        for n in range(args.repeat):
+            started = time.perf_counter()
+            run_callback(page)
+            timings[n] = time.perf_counter() - started
+        timings *= 1e6
+        total += float(np.median(timings))
+        print(f"{page['file']:<24} {len(page['response'].body) / 1024:>6.1f} {len(output) - requests:>6} "
+              f"{requests:>9} {np.percentile(timings, 50):>9.0f} {np.percentile(timings, 95):>9.0f}")
+    print(f"{'all pages (p50 sum)':<24} {'':>6} {'':>6} {'':>9} {total:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
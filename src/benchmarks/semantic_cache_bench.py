@@ -0,0 +1,100 @@
+"""
+Lookup-cost benchmark for the semantic answer cache.
+
+Fills a SemanticCache with synthetic student questions and times lookups for
+paraphrases of cached questions and for unseen questions.
+
+Usage:
+    python -m src.benchmarks.semantic_cache_bench --entries 100000
+"""
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+
+from ..services.semantic_cache import NgramVectorizer, SemanticCache
+
+TEMPLATES = [
+    "how much is the fee for {a} {b}",
+    "what are the requirements for {a} {b}",
+    "when does {a} {b} start",
+    "how long is the {a} {b} course",
+    "is {a} {b} offered at rvnp",
+]
+
+PARAPHRASES = [
+    "{a} {b} fees?",
+    "{a} {b} requirements",
+    "{a} {b} start date",
+    "{a} {b} course duration",
+    "do you offer {a} {b}",
+]
+
+
+def _make_vocabulary(size: int, rng: random.Random) -> list:
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))) for _ in range(size)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = _make_vocabulary(max(1000, args.entries // 20), rng)
+
+    subjects = []
+    for _ in range(args.entries):
+        a, b = rng.sample(vocabulary, 2)
+        subjects.append((rng.randrange(len(TEMPLATES)), a, b))
+    questions = [TEMPLATES[t].format(a=a, b=b) for t, a, b in subjects]
+
+    # In the server the IDF weights are fitted on the knowledge base; here a
+    # sample of the synthetic questions plays that role.
+    vectorizer = NgramVectorizer(dim=args.dim).fit(questions[:5000])
+    cache = SemanticCache(vectorizer, capacity=args.entries, threshold=args.threshold)
+    started = time.perf_counter()
+    for i, question in enumerate(questions):
+        cache.add(question, f"answer {i}", "bench")
+    fill_seconds = time.perf_counter() - started
+
+    queries = []
+    for _ in range(args.queries // 2):
+        t, a, b = rng.choice(subjects)
+        queries.append(PARAPHRASES[t].format(a=a, b=b))
+    for _ in range(args.queries - len(queries)):
+        a, b = rng.sample(vocabulary, 2)
+        queries.append(rng.choice(TEMPLATES).format(a=a, b=b))
+
+    n_paraphrases = args.queries // 2
+    timings = np.empty(len(queries))
+    paraphrase_hits = 0
+    unseen_hits = 0
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        result = cache.lookup(query, "bench")
+        timings[i] = time.perf_counter() - started
+        if result is not None:
+            if i < n_paraphrases:
+                paraphrase_hits += 1
+            else:
+                unseen_hits += 1
+
+    micros = timings * 1e6
+    print(f"entries={len(cache)} dim={args.dim} matrix={cache._matrix.nbytes / 2**20:.1f} MiB fill={fill_seconds:.1f}s")
+    print(f"paraphrase hit rate={paraphrase_hits / n_paraphrases:.1%} "
+          f"unseen-question hit rate={unseen_hits / (len(queries) - n_paraphrases):.1%}")
+    print(f"lookups={len(queries)} "
+          f"mean={micros.mean():.0f}us p50={np.percentile(micros, 50):.0f}us "
+          f"p95={np.percentile(micros, 95):.0f}us p99={np.percentile(micros, 99):.0f}us")
+    print("target p95 < 1000us:", "PASS" if np.percentile(micros, 95) < 1000 else "FAIL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Memory and latency benchmark for the in-memory session store.
+
+Opens --sessions conversations with --turns question/answer pairs each and
+reports the traced memory of the store, its own byte accounting and the cost
+of load/append, then keeps writing new sessions to show memory staying flat
+under the cap. Exits with status 1 if the traced memory after filling or
+after the churn exceeds the cap (the peak also includes the transient copy
+made while the session dict grows, and is only reported).
+
+Usage:
+    python -m src.benchmarks.session_store_bench --sessions 50000
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from ..services.sessions import InMemorySessionBackend
+
+QUESTION = "what are the requirements for diploma in {0} and how much are the fees"
+ANSWER = "The diploma in {0} requires a KCSE mean grade of C- (minus). " * 4
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--max-memory-mb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    store = InMemorySessionBackend(max_sessions=args.sessions, max_bytes=args.max_memory_mb * 2**20)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(args.sessions):
+        for turn in range(args.turns):
+            subject = f"subject{i}-{turn}"
+            store.append(f"session-{i}", QUESTION.format(subject), ANSWER.format(subject))
+    fill_seconds = time.perf_counter() - started
+    filled_mib = tracemalloc.get_traced_memory()[0] / 2**20
+
+    # Twice as many new sessions again: the cap must keep memory where it is.
+    for i in range(args.sessions, 3 * args.sessions):
+        store.append(f"session-{i}", QUESTION.format(i), ANSWER.format(i))
+    churned_mib, peak_mib = (value / 2**20 for value in tracemalloc.get_traced_memory())
+    tracemalloc.stop()
+
+    timings = np.empty(2000)
+    for n in range(len(timings)):
+        session_id = f"session-{rng.randrange(args.sessions, 3 * args.sessions)}"
+        t0 = time.perf_counter()
+        store.load(session_id)
+        store.append(session_id, "and the fees?", "The annual fees are listed above.")
+        timings[n] = time.perf_counter() - t0
+    micros = timings * 1e6
+
+    stats = store.stats()
+    print(f"sessions={args.sessions} turns={args.turns} fill={fill_seconds:.1f}s")
+    print(f"traced memory after fill={filled_mib:.1f} MiB after churn={churned_mib:.1f} MiB peak={peak_mib:.1f} MiB "
+          f"accounted={stats['bytes'] / 2**20:.1f} MiB cap={args.max_memory_mb} MiB")
+    print(f"live sessions={stats['sessions']} evictions={stats['evictions']}")
+    print(f"load+append mean={micros.mean():.1f}us p95={np.percentile(micros, 95):.1f}us")
+    within_cap = max(filled_mib, churned_mib) <= args.max_memory_mb
+    print("traced memory stays under the cap:", "PASS" if within_cap else "FAIL")
+    if not within_cap:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
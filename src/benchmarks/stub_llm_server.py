@@ -0,0 +1,148 @@
+"""
+OpenAI-compatible stub of the upstream model API, for load tests.
+
+Serves POST /openai/v1/chat/completions (and /v1/chat/completions) with the
+same request and response shapes as Groq, including streamed responses, so
+the app can be run unchanged against it:
+
+    python -m src.benchmarks.stub_llm_server --port 9100 --latency-ms 400 --tokens-per-second 250
+    LLM_BASE_URL=http://127.0.0.1:9100/openai/v1 GROQ_API_KEY=stub uvicorn src.main:app
+
+Latency to the first token is drawn from the chosen distribution; tokens are
+then produced at --tokens-per-second. --error-rate answers that share of
+calls with --error-status, and --hang-rate never answers (to exercise
+client timeouts). GET /stats returns call and error counts.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the course runs for two years and admission requires a KCSE mean grade of C plain with "
+    "mathematics and english fees are payable per term at the finance office students may apply "
+    "online through the portal before the intake deadline"
+).split()
+
+
+class StubConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.latency_dist = args.latency_dist
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.tokens_per_second = args.tokens_per_second
+        self.completion_tokens = args.completion_tokens
+        self.error_rate = args.error_rate
+        self.error_status = args.error_status
+        self.hang_rate = args.hang_rate
+        self.rng = random.Random(args.seed)
+
+    def first_token_delay(self) -> float:
+        median = self.latency_ms / 1000
+        if self.latency_dist == "fixed":
+            return median
+        if self.latency_dist == "uniform":
+            return self.rng.uniform(0, 2 * median)
+        # Log-normal: a long right tail, like real model APIs under load.
+        return self.rng.lognormvariate(math.log(median), self.latency_sigma) if median > 0 else 0.0
+
+    def completion(self) -> List[str]:
+        n = max(1, int(self.rng.gauss(self.completion_tokens, self.completion_tokens / 4)))
+        return [self.rng.choice(WORDS) for _ in range(n)]
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    stats = {"calls": 0, "streams": 0, "errors": 0, "hangs": 0, "completion_tokens": 0}
+
+    def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["calls"] += 1
+        model = body.get("model", "stub")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+
+        roll = config.rng.random()
+        if roll < config.hang_rate:
+            stats["hangs"] += 1
+            await asyncio.sleep(3600)
+        if roll < config.hang_rate + config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(config.first_token_delay() / 4)
+            return JSONResponse(status_code=config.error_status,
+                                content={"error": {"message": "injected error", "type": "stub_error"}})
+
+        words = config.completion()
+        stats["completion_tokens"] += len(words)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        per_token = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        await asyncio.sleep(config.first_token_delay())
+
+        if body.get("stream"):
+            stats["streams"] += 1
+
+            async def events():
+                yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for i, word in enumerate(words):
+                    yield _chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+                    if per_token:
+                        await asyncio.sleep(per_token)
+                yield _chunk(completion_id, model, {}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(per_token * len(words))
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-dist", choices=("lognormal", "uniform", "fixed"), default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal shape")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--completion-tokens", type=int, default=120, help="mean completion length")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_stub_app(StubConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+import argparse
 import json
 import os
+import sqlite3
+import sys
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_DIR = os.path.join(BASE_DIR, "dataset")
+SCRAPY_PROJECT_DIR = os.path.join(BASE_DIR, "services", "scraper", "site_scraper")
+
+if SCRAPY_PROJECT_DIR not in sys.path:
+    sys.path.insert(0, SCRAPY_PROJECT_DIR)
+# The key the crawler's delta files use, so deltas and spider outputs address the same records.
+from site_scraper.incremental import record_key  # noqa: E402
 
 INPUT_FILES_TO_COMBINE = [
     "rvist_data.jsonl",
@@ -13,10 +22,268 @@ INPUT_FILES_TO_COMBINE = [
 COMBINED_OUTPUT_FILE = "combined_rag_data.jsonl"
 output_file_path = os.path.join(DATASET_DIR, COMBINED_OUTPUT_FILE)
 
-def combine_jsonl_files():
+# Persistent key -> (offset, length) index kept next to the combined file.
+INDEX_SUFFIX = ".index.sqlite3"
+COPY_CHUNK_SIZE = 1024 * 1024
+# The file is compacted once superseded lines and tombstones make up this share of it.
+COMPACT_DEAD_RATIO = 0.5
+
+
+def tombstone(offset):
+    """
+    The line that marks the record line at a byte offset of the combined
+    file as superseded or deleted (see data_loader).
+    """
+    return (json.dumps({"op": "removed", "offset": offset}) + '\n').encode('utf-8')
+
+
+def is_tombstone(record):
+    return record.get("op") == "removed" and "offset" in record
+
+
+def _read_lines(path):
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            yield offset, line
+            offset += len(line)
+
+
+def _connect(index_path):
+    conn = sqlite3.connect(index_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, offset INTEGER NOT NULL, "
+                 "length INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS records_offset ON records (offset)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER, "
+                 "mtime_ns INTEGER, dead_bytes INTEGER)")
+    return conn
+
+
+def _save_meta(conn, dataset_path, dead_bytes):
+    stat = os.stat(dataset_path)
+    conn.execute("INSERT OR REPLACE INTO meta VALUES (0, ?, ?, ?)", (stat.st_size, stat.st_mtime_ns, dead_bytes))
+
+
+def _dead_bytes(conn):
+    return conn.execute("SELECT dead_bytes FROM meta").fetchone()[0]
+
+
+def build_index(dataset_path, conn=None):
+    """
+    Scans the combined file once and maps every record key to the byte offset
+    and length of its line, skipping the lines that tombstones supersede. A
+    key that appears twice keeps its last line. A torn last line (from an
+    interrupted merge) is closed with a newline so later appends stay whole.
+    Builds into conn, or an in-memory index, and returns it.
+    """
+    conn = conn or _connect(":memory:")
+    with open(dataset_path, 'rb+') as f:
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    with conn:
+        conn.execute("DELETE FROM records")
+        for offset, line in _read_lines(dataset_path):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"  Dropping invalid JSON at byte {offset} of {dataset_path}: {e}")
+                continue
+            if is_tombstone(record):
+                conn.execute("DELETE FROM records WHERE offset = ?", (record["offset"],))
+            else:
+                conn.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?)", (record_key(record), offset, len(line)))
+        live = conn.execute("SELECT COALESCE(SUM(length), 0) FROM records").fetchone()[0]
+        _save_meta(conn, dataset_path, os.path.getsize(dataset_path) - live)
+    return conn
+
+
+def load_index(dataset_path):
+    """
+    Opens the persisted key index of the combined file (creating an empty
+    file if there is none), rebuilding it when it is missing or the file was
+    changed without it, e.g. by an interrupted merge or refresh_dataset.
+    """
+    if not os.path.exists(dataset_path):
+        open(dataset_path, 'wb').close()
+    conn = _connect(dataset_path + INDEX_SUFFIX)
+    stat = os.stat(dataset_path)
+    if conn.execute("SELECT 1 FROM meta WHERE size = ? AND mtime_ns = ?",
+                    (stat.st_size, stat.st_mtime_ns)).fetchone() is None:
+        print(f"Rebuilding the record index of {dataset_path}...")
+        build_index(dataset_path, conn)
+    return conn
+
+
+def index_entries(conn):
+    return {key: [offset, length] for key, offset, length in conn.execute("SELECT key, offset, length FROM records")}
+
+
+def read_changes(input_paths):
+    """
+    Streams (key, line) changes from the input files. Plain records are
+    upserts. Delta lines written by the crawler ({"op": "added" | "changed" |
+    "removed", "key", "record"}) are upserts, or deletes (line None).
+    Invalid lines are reported and skipped.
+    """
+    for path in input_paths:
+        print(f"Processing file: {path}...")
+        try:
+            for offset, line in _read_lines(path):
+                line_content = line.strip()
+                if not line_content:
+                    continue
+                try:
+                    record = json.loads(line_content)
+                except json.JSONDecodeError as e:
+                    print(f"  Skipping invalid JSON at byte {offset} in {path}: {e} - Content: '{line_content[:100]}...'")
+                    continue
+                if "op" in record and "key" in record:
+                    if record["op"] == "removed":
+                        yield record["key"], None
+                    else:
+                        yield record_key(record["record"]), (json.dumps(record["record"], ensure_ascii=False) + '\n').encode('utf-8')
+                else:
+                    yield record_key(record), line_content + b'\n'
+        except FileNotFoundError:
+            print(f"  Warning: File {path} not found. Skipping.")
+
+
+def _copy_range(src, out, start, end):
+    src.seek(start)
+    remaining = end - start
+    while remaining:
+        chunk = src.read(min(remaining, COPY_CHUNK_SIZE))
+        out.write(chunk)
+        remaining -= len(chunk)
+
+
+def compact(dataset_path, conn):
     """
-    Reads multiple .jsonl files from the DATASET_DIR and combines them
-    into a single output .jsonl file in the same directory.
+    Rewrites the combined file with only its live record lines, in file
+    order, and re-indexes it. Both files are replaced by atomic renames, the
+    index first: a crash in between leaves an index that no longer matches
+    the file, so it is rebuilt on the next merge.
+    """
+    tmp_path, tmp_index = dataset_path + ".tmp", dataset_path + INDEX_SUFFIX + ".tmp"
+    if os.path.exists(tmp_index):
+        os.remove(tmp_index)
+    new_conn = _connect(tmp_index)
+    position = run_start = run_end = 0
+    with open(dataset_path, 'rb') as old, open(tmp_path, 'wb') as out, new_conn:
+        for key, offset, length in conn.execute("SELECT key, offset, length FROM records ORDER BY offset"):
+            # Adjacent live lines are copied as one block.
+            if offset != run_end:
+                _copy_range(old, out, run_start, run_end)
+                run_start = offset
+            run_end = offset + length
+            new_conn.execute("INSERT INTO records VALUES (?, ?, ?)", (key, position, length))
+            position += length
+        _copy_range(old, out, run_start, run_end)
+        out.flush()
+        os.fsync(out.fileno())
+        _save_meta(new_conn, tmp_path, 0)
+    new_conn.close()
+    conn.close()
+    os.replace(tmp_index, dataset_path + INDEX_SUFFIX)
+    os.replace(tmp_path, dataset_path)
+
+
+def merge_changes(dataset_path, changes, replace=False):
+    """
+    Applies (key, line) changes to the combined file: an unknown key is
+    inserted, a known key whose line differs is updated and a None line
+    deletes. The changes are streamed, and each one costs an index lookup in
+    the SQLite index next to the file plus at most two appended lines: the
+    new record line, and a tombstone (see tombstone) for the line it
+    supersedes. So a merge takes time proportional to the changes, not to the
+    dataset, and holds no more than one change in memory. When nothing
+    changes the file is not touched at all. With replace=True the existing
+    records are discarded and the file is rebuilt from the changes alone.
+
+    The appended lines are synced before the index transaction commits; a
+    merge interrupted in between leaves an index that no longer matches the
+    file, which is rebuilt on the next merge. Once superseded lines and
+    tombstones reach COMPACT_DEAD_RATIO of the file, it is compacted.
+
+    Only explicit deletes remove records: a key that is simply absent from
+    the changes is kept, so upserting a full spider output never drops the
+    records that vanished from the site (use replace=True, or a crawl delta,
+    whose removed lines carry those deletes).
+
+    Returns the number of inserted, updated, deleted and unchanged records.
+    """
+    target = dataset_path
+    if replace:
+        dataset_path = dataset_path + ".new"
+        for path in (dataset_path, dataset_path + INDEX_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+    conn = load_index(dataset_path)
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    try:
+        dead = _dead_bytes(conn)
+        with open(dataset_path, 'r+b') as f, conn:
+            end = f.seek(0, os.SEEK_END)
+
+            def append(line):
+                nonlocal end
+                f.seek(end)
+                f.write(line)
+                end += len(line)
+                return end - len(line)
+
+            for key, line in changes:
+                row = conn.execute("SELECT offset, length FROM records WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    offset, length = row
+                    if line is not None:
+                        f.seek(offset)
+                        if f.read(length) == line:
+                            counts["unchanged"] += 1
+                            continue
+                    counts["updated" if line is not None else "deleted"] += 1
+                elif line is None:
+                    continue
+                else:
+                    counts["inserted"] += 1
+                if line is not None:
+                    conn.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?)", (key, append(line), len(line)))
+                else:
+                    conn.execute("DELETE FROM records WHERE key = ?", (key,))
+                if row is not None:
+                    stone = tombstone(offset)
+                    append(stone)
+                    dead += length + len(stone)
+
+            if counts["inserted"] or counts["updated"] or counts["deleted"]:
+                f.flush()
+                os.fsync(f.fileno())
+                _save_meta(conn, dataset_path, dead)
+        if dead > COMPACT_DEAD_RATIO * os.path.getsize(dataset_path):
+            compact(dataset_path, conn)
+    finally:
+        conn.close()
+    if replace:
+        os.replace(dataset_path + INDEX_SUFFIX, target + INDEX_SUFFIX)
+        os.replace(dataset_path, target)
+    return counts
+
+
+def _input_path(name):
+    return name if os.path.exists(name) else os.path.join(DATASET_DIR, name)
+
+
+def combine_jsonl_files(input_files=None, full=False):
+    """
+    Merges the records of the input .jsonl files (spider outputs or crawl
+    deltas) into the combined output file in DATASET_DIR, keyed on
+    source_url + content_type + metadata.section. Upserts never remove a
+    record that is missing from the inputs (see merge_changes); with
+    full=True the combined file is rebuilt from the inputs instead.
     """
     print(f"Combining JSONL files into: {output_file_path}")
 
@@ -24,34 +291,21 @@ def combine_jsonl_files():
         print(f"Error: Dataset directory '{DATASET_DIR}' not found.")
         return
 
-    record_count = 0
-    with open(output_file_path, 'w', encoding='utf-8') as outfile:
-        for filename in INPUT_FILES_TO_COMBINE:
-            input_file_path = os.path.join(DATASET_DIR, filename)
-            print(f"Processing file: {input_file_path}...")
-            try:
-                with open(input_file_path, 'r', encoding='utf-8') as infile:
-                    for line_number, line in enumerate(infile, 1):
-                        line_content = line.strip()
-                        if not line_content: 
-                            continue
-                        try:
-                            
-                            json.loads(line_content) 
-                            outfile.write(line_content + '\n') 
-                            record_count += 1
-                        except json.JSONDecodeError as e:
-                            print(f"  Skipping invalid JSON line #{line_number} in {filename}: {e} - Content: '{line_content[:100]}...'")
-                print(f"  Finished processing {filename}.")
-            except FileNotFoundError:
-                print(f"  Warning: File {filename} not found in {DATASET_DIR}. Skipping.")
-            except Exception as e:
-                print(f"  An error occurred while processing {filename}: {e}")
-
-    if record_count > 0:
-        print(f"\nSuccessfully combined {record_count} records into {COMBINED_OUTPUT_FILE}.")
+    input_paths = [_input_path(name) for name in (input_files or INPUT_FILES_TO_COMBINE)]
+    counts = merge_changes(output_file_path, read_changes(input_paths), replace=full)
+
+    if sum(counts.values()) > 0:
+        print(f"\nMerged into {COMBINED_OUTPUT_FILE}: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['deleted']} deleted, {counts['unchanged']} unchanged.")
     else:
         print(f"\nNo records were combined. Check if input files exist and contain data.")
 
 if __name__ == "__main__":
-    combine_jsonl_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Merge spider outputs or crawl deltas into the combined dataset. Records missing from "
+                    "the inputs are kept; only removed delta lines or --full drop them.")
+    parser.add_argument("inputs", nargs="*", help=f"input .jsonl files (default: {', '.join(INPUT_FILES_TO_COMBINE)})")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild the combined file from the inputs, dropping records they no longer contain")
+    args = parser.parse_args()
+    combine_jsonl_files(args.inputs, full=args.full)
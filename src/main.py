@@ -1,96 +1,318 @@
-import os
+import asyncio
+import hmac
 import logging
+import math
+from contextlib import ExitStack, asynccontextmanager, suppress
 from pathlib import Path
+from typing import List, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, FastAPI, Header, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from openai import OpenAI
-import uvicorn
+from pydantic import BaseModel, Field
 
 #Custom services
-from .services.data_loader import load_and_process_rag_data
-from .services.prompt_builder import create_system_prompt
+from .services.app_state import AppServices, build_services, preload_knowledge
+from .services.chat_service import RATE_LIMITED_ERROR, UNAVAILABLE_ERROR
+from .services.config import KnowledgeSettings
+from .services.providers import UpstreamUnavailable
+from .services.rate_limiter import RateLimitExceeded
+from .services.streaming import SSE_HEADERS, format_sse
 
+logger = logging.getLogger(__name__)
 
-load_dotenv()
+BASE_DIR = Path(__file__).resolve().parent
+templates = Jinja2Templates(directory=BASE_DIR / "views" / "templates")
 
+router = APIRouter()
 
 
-print("Loading RAG data and building system prompt...")
-rag_data = load_and_process_rag_data()
-SYSTEM_INSTRUCTION = create_system_prompt(rag_data)
-print("System prompt created successfully.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the per-worker services (model client, caches, chat pipeline) on
+    startup and releases them on shutdown, so importing this module stays free
+    of I/O and does not need a GROQ key.
+    """
+    services = build_services()
+    app.state.services = services
+    logger.info("Chat service ready (knowledge base %s).", services.knowledge_store.current.version)
 
+    watcher = None
+    if services.knowledge_settings.watch_interval > 0:
+        watcher = asyncio.create_task(services.knowledge_store.watch(services.knowledge_settings.watch_interval))
+    yield
+    if watcher is not None:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+    await services.aclose()
 
-app = FastAPI(
-    title="Customer Service Bot",
-    description="A FastAPI-based chatbot for the RVNP website.",
-    version="1.0.0"
-)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    """
+    Application factory. Works with `uvicorn src.main:app` as well as
+    `uvicorn --factory src.main:create_app`.
+    """
+    load_dotenv()
+    if KnowledgeSettings.from_env().preload:
+        # Runs in the parent process under gunicorn --preload, so the workers
+        # fork with the knowledge base already in (shared) memory.
+        preload_knowledge(freeze=True)
+
+    app = FastAPI(
+        title="Customer Service Bot",
+        description="A FastAPI-based chatbot for the RVNP website.",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.mount("/static", StaticFiles(directory=BASE_DIR / "views" / "static"), name="static")
+    app.include_router(router)
+    return app
+
+
+def _services(request: Request) -> AppServices:
+    return request.app.state.services
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes an ExitStack once it has been sent, also
+    when the client disconnects before the body is iterated.
+    """
+
+    def __init__(self, content, exit_stack: ExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.exit_stack = exit_stack
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.exit_stack.close()
+
+
+def _retry_later(error: Exception) -> JSONResponse:
+    """
+    429 for a request shed by admission control, 503 while every model backend is down.
+    """
+    retry_after = max(1, math.ceil(error.retry_after))
+    if isinstance(error, UpstreamUnavailable):
+        status_code, message = 503, UNAVAILABLE_ERROR
+    else:
+        status_code, message = 429, RATE_LIMITED_ERROR
+    return JSONResponse(status_code=status_code, headers={"Retry-After": str(retry_after)},
+                        content={"error": message, "retry_after": retry_after})
 
-BASE_DIR = Path(__file__).resolve().parent
-app.mount("/static", StaticFiles(directory=BASE_DIR / "views" / "static"), name="static")
-templates = Jinja2Templates(directory=BASE_DIR / "views" / "templates")
 
 class ChatRequest(BaseModel):
     message: str
-# groq config
-groq_api_key = os.getenv('GROQ_API_KEY')
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable not set. Please add it to your .env file.")
-client = OpenAI(
-    api_key=groq_api_key,
-    base_url="https://api.groq.com/openai/v1", 
-)
-
-#In-memory Chat Sessions
-#chat_sessions = {}
+    # Client-generated conversation id; omit it for a stateless question.
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+
+class BatchChatRequest(BaseModel):
+    messages: List[str] = Field(min_length=1)
+    # Stream each result as it completes instead of returning them all in order.
+    stream: bool = False
 
 #Routes
-@app.get("/", response_class=HTMLResponse, tags=["Frontend"])
+@router.get("/", response_class=HTMLResponse, tags=["Frontend"])
 async def serve_frontend(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/chat", tags=["Chatbot"])
+@router.post("/chat", tags=["Chatbot"])
 async def chat(chat_request: ChatRequest, request: Request):
-    try:
-        user_message = chat_request.message
-        
-        messages = [
-            {"role": "system", "content": SYSTEM_INSTRUCTION},
-            {"role": "user", "content": user_message}
-        ]
-
-      
-
-       # API call
-        response = client.chat.completions.create(
-            model="llama3-8b-8192", 
-            messages=messages,
-            temperature=0.3,
-            max_tokens=1024
-        )
-        
-        bot_response = response.choices[0].message.content
-        return JSONResponse(content={'response': bot_response})
-
-    except Exception as e:
-        logging.exception("Chat error:")
-        return JSONResponse(status_code=500, content={"error": "Internal server error"})
-    
-    
+    services = _services(request)
+    with services.metrics.track("chat"):
+        try:
+            reply = await services.chat_service.reply(chat_request.message, chat_request.session_id)
+            return JSONResponse(content={'response': reply.text, 'source': reply.source})
+
+        except (RateLimitExceeded, UpstreamUnavailable) as e:
+            return _retry_later(e)
+        except Exception as e:
+            services.metrics.errors.labels("chat").inc()
+            logger.exception("Chat error:")
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+
+@router.post("/chat/stream", tags=["Chatbot"])
+async def chat_stream(chat_request: ChatRequest, request: Request):
+    """
+    Streams the reply as Server-Sent Events: a `meta` event naming the answer
+    source, one `delta` event per text chunk, then a final `done` event (or an
+    `error` event if the upstream call fails).
+
+    The response starts with the first chunk, so a request shed by admission
+    control is answered with a plain 429 (503 while every model backend is
+    down) rather than an event stream.
+    """
+    services = _services(request)
+    metrics = services.metrics
+    with ExitStack() as stack:
+        stack.enter_context(metrics.track("chat_stream"))
+        source, first, error = None, None, None
+        try:
+            source, deltas = await services.chat_service.stream_reply(chat_request.message, chat_request.session_id)
+            deltas = deltas.__aiter__()
+            first = await deltas.__anext__()
+        except StopAsyncIteration:
+            pass
+        except (RateLimitExceeded, UpstreamUnavailable) as e:
+            return _retry_later(e)
+        except Exception as e:
+            error = e
+
+        async def event_stream():
+            try:
+                if error is not None:
+                    raise error
+                yield format_sse({"source": source}, event="meta")
+                if first is not None:
+                    yield format_sse({"delta": first}, event="delta")
+                    async for delta in deltas:
+                        yield format_sse({"delta": delta}, event="delta")
+                yield format_sse({}, event="done")
+            except Exception:
+                metrics.errors.labels("chat_stream").inc()
+                logger.exception("Chat stream error:")
+                yield format_sse({"error": "Internal server error"}, event="error")
+
+        # From here on the response owns the request timer and stops it once sent.
+        return _ClosingStreamingResponse(event_stream(), stack.pop_all(),
+                                         media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/chat/batch", tags=["Chatbot"])
+async def chat_batch(batch_request: BatchChatRequest, request: Request):
+    """
+    Answers many stateless questions in one request. Repeated questions are
+    answered once, FAQ and cached answers are resolved locally and the rest
+    go to the model with bounded concurrency.
+
+    By default the results are returned in request order, each either
+    `{"response", "source"}` or `{"error"}`. With `"stream": true` they are
+    sent as Server-Sent Events as they complete: one `result` event per item
+    carrying its `index`, then a `done` event.
+    """
+    services = _services(request)
+    settings = services.batch_settings
+    metrics = services.metrics
+    messages = batch_request.messages
+    if len(messages) > settings.max_items:
+        return JSONResponse(status_code=413, content={"error": f"At most {settings.max_items} messages per batch"})
+
+    def item(result) -> dict:
+        # Called once per result; every question it answers counts as a failed item.
+        if result.error is not None:
+            metrics.errors.labels("chat_batch").inc(len(result.indices))
+            if result.retry_after is not None:
+                return {"error": result.error, "retry_after": math.ceil(result.retry_after)}
+            return {"error": result.error}
+        return {"response": result.reply.text, "source": result.reply.source}
+
+    if not batch_request.stream:
+        with metrics.track("chat_batch"):
+            results: List[Optional[dict]] = [None] * len(messages)
+            async for result in services.chat_service.reply_batch(messages, settings.max_concurrency):
+                payload = item(result)
+                for index in result.indices:
+                    results[index] = payload
+            return JSONResponse(content={"results": results})
+
+    async def event_stream():
+        with metrics.track("chat_batch"):
+            async for result in services.chat_service.reply_batch(messages, settings.max_concurrency):
+                payload = item(result)
+                for index in result.indices:
+                    yield format_sse({"index": index, **payload}, event="result")
+            yield format_sse({}, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/cache/stats", tags=["Chatbot"])
+async def cache_stats(request: Request):
+    services = _services(request)
+    sessions = services.sessions
+    if sessions is None:
+        session_stats = {"enabled": False}
+    elif sessions.blocking:
+        session_stats = await asyncio.to_thread(sessions.stats)
+    else:
+        session_stats = sessions.stats()
+    return JSONResponse(content={
+        "exact": services.response_cache.stats() if services.response_cache is not None else {"enabled": False},
+        "semantic": services.semantic_cache.stats() if services.semantic_cache is not None else {"enabled": False},
+        "coalescing": services.single_flight.stats() if services.single_flight is not None else {"enabled": False},
+        "sessions": session_stats,
+        "admission": services.client.limiter.stats(),
+        "backends": services.client.router.stats(),
+    })
+
+
+@router.get("/metrics", tags=["Monitoring"])
+async def prometheus_metrics(request: Request):
+    """
+    Prometheus text-format metrics of this worker.
+    """
+    services = _services(request)
+    registry = services.metrics.registry
+    # A sqlite session store is queried by the render, so keep it off the event loop.
+    if services.sessions is not None and services.sessions.blocking:
+        text = await asyncio.to_thread(registry.render)
+    else:
+        text = registry.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+def _admin_allowed(services: AppServices, token: str) -> bool:
+    expected = services.knowledge_settings.admin_token
+    return bool(expected) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+@router.get("/admin/knowledge", tags=["Admin"])
+async def knowledge_status(request: Request, x_admin_token: str = Header(default="")):
+    services = _services(request)
+    if not _admin_allowed(services, x_admin_token):
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    return JSONResponse(content=services.knowledge_store.status())
+
+
+@router.post("/admin/knowledge/reload", tags=["Admin"])
+async def reload_knowledge(request: Request, x_admin_token: str = Header(default="")):
+    """
+    Rebuilds the knowledge base from the dataset off the request path and swaps
+    it in atomically. A failed rebuild leaves the current version serving.
+    """
+    services = _services(request)
+    if not _admin_allowed(services, x_admin_token):
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    knowledge_store = services.knowledge_store
+    reloaded = await knowledge_store.reload()
+    status = knowledge_store.status()
+    if status["last_error"]:
+        return JSONResponse(status_code=500, content={"reloaded": False, **status})
+    return JSONResponse(content={"reloaded": reloaded, **status})
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
     uvicorn.run(app, host="0.0.0.0", port=8000)
-        
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Refreshes the RAG dataset in one process.
+
+Runs every spider of the Scrapy project concurrently in a single reactor and
+streams their items straight into the combined dataset through a shared
+pipeline, instead of writing one file per spider and combining them with
+combine_files.py afterwards. Optionally compiles the knowledge bundle from
+the new dataset in the same run, then prints the time and record count of
+every stage.
+
+The existing dataset is only replaced when every spider finished normally
+and scraped at least one record, so a site that is down never empties its
+part of the dataset.
+
+Usage:
+    python -m src.refresh_dataset [--output PATH] [--spiders NAME,...] [-a SPIDER:NAME=VALUE] [--bundle]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from .services.data_loader import DATASET_FILE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPY_PROJECT_DIR = os.path.join(BASE_DIR, "services", "scraper", "site_scraper")
+SCRAPY_SETTINGS_MODULE = "site_scraper.settings"
+# Where `scrapy crawl` keeps the HTTP cache and crawl state (the project's .scrapy dir).
+SCRAPY_DATA_DIR = os.path.join(SCRAPY_PROJECT_DIR, ".scrapy")
+SPIDERS = ("site_explorer_for_rag", "hef_faqs")
+
+
+def _under(directory: str, path: Optional[str]) -> Optional[str]:
+    return os.path.join(directory, path) if path and not os.path.isabs(path) else path
+
+
+def project_settings():
+    """
+    The Scrapy project's settings, with the paths that `scrapy crawl` would
+    resolve against the project directory made absolute, so a crawl reads and
+    writes the same cache and state from any working directory.
+    """
+    if SCRAPY_PROJECT_DIR not in sys.path:
+        sys.path.insert(0, SCRAPY_PROJECT_DIR)
+    from scrapy.settings import Settings
+
+    settings = Settings()
+    settings.setmodule(SCRAPY_SETTINGS_MODULE, priority="project")
+    settings.set("HTTPCACHE_DIR", _under(SCRAPY_DATA_DIR, settings.get("HTTPCACHE_DIR")), priority="project")
+    settings.set("INCREMENTAL_STATE_DIR", settings.get("INCREMENTAL_STATE_DIR")
+                 or os.path.join(SCRAPY_DATA_DIR, "crawl_state"), priority="project")
+    for name in ("INCREMENTAL_DELTA_FILE", "SHARD_DIR"):
+        settings.set(name, _under(SCRAPY_PROJECT_DIR, settings.get(name)), priority="project")
+    return settings
+
+
+def crawl_into_dataset(output_file: str, spiders: Sequence[str] = SPIDERS,
+                       spider_args: Optional[Dict[str, Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+    """
+    Crawls all spiders into output_file and returns the per-spider crawl stats.
+    spider_args maps a spider name to the arguments it is started with.
+    """
+    spider_args = spider_args or {}
+    output_file = os.path.abspath(output_file)
+    settings = project_settings()
+
+    from scrapy.crawler import CrawlerProcess
+    from site_scraper.pipelines import DatasetWriter
+
+    settings.set("COMBINED_DATASET_FILE", output_file)
+    # The whole dataset is rewritten, so every page is extracted; unchanged
+    # pages still come back as 304s from the conditional requests.
+    settings.set("INCREMENTAL_FULL", True)
+    pipelines = dict(settings.getdict("ITEM_PIPELINES"))
+    pipelines["site_scraper.pipelines.CombinedDatasetPipeline"] = 900
+    settings.set("ITEM_PIPELINES", pipelines)
+
+    writer = DatasetWriter.shared(output_file)
+    try:
+        process = CrawlerProcess(settings)
+        crawlers = [process.create_crawler(name) for name in spiders]
+        for crawler in crawlers:
+            process.crawl(crawler, **spider_args.get(crawler.spidercls.name, {}))
+        process.start()
+    except BaseException:
+        writer.discard()
+        raise
+
+    results = []
+    for crawler in crawlers:
+        stats = crawler.stats.get_stats()
+        results.append({
+            "spider": crawler.spidercls.name,
+            "reason": stats.get("finish_reason", "unknown"),
+            "pages": stats.get("response_received_count", 0),
+            "records": writer.counts.get(crawler.spidercls.name, 0),
+            "seconds": stats.get("elapsed_time_seconds", 0.0),
+        })
+    if crawl_succeeded(results):
+        writer.commit()
+    else:
+        writer.discard()
+    return results
+
+
+def crawl_succeeded(results: List[Dict[str, Any]]) -> bool:
+    return all(result["reason"] == "finished" and result["records"] > 0 for result in results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Crawl all sites into the combined RAG dataset.")
+    parser.add_argument("--output", default=DATASET_FILE, help="combined JSONL dataset to write")
+    parser.add_argument("--spiders", default=",".join(SPIDERS), help="comma-separated spider names")
+    parser.add_argument("-a", "--spider-arg", action="append", default=[], metavar="SPIDER:NAME=VALUE",
+                        help="argument for one spider, e.g. site_explorer_for_rag:site_url=https://rvnp.ac.ke/")
+    parser.add_argument("--bundle", action="store_true", help="also compile the knowledge bundle")
+    args = parser.parse_args()
+
+    spider_args: Dict[str, Dict[str, str]] = {}
+    for arg in args.spider_arg:
+        spider, _, assignment = arg.partition(":")
+        name, _, value = assignment.partition("=")
+        spider_args.setdefault(spider, {})[name] = value
+
+    output_file = os.path.abspath(args.output)
+    started = time.perf_counter()
+    spiders = [name.strip() for name in args.spiders.split(",") if name.strip()]
+    results = crawl_into_dataset(output_file, spiders, spider_args)
+    crawl_seconds = time.perf_counter() - started
+
+    print(f"{'spider':<24} {'status':<12} {'pages':>6} {'records':>8} {'seconds':>8}")
+    for result in results:
+        print(f"{result['spider']:<24} {result['reason']:<12} {result['pages']:>6} "
+              f"{result['records']:>8} {result['seconds']:>8.2f}")
+    total = sum(result["records"] for result in results)
+    if not crawl_succeeded(results):
+        print(f"Crawl incomplete after {crawl_seconds:.2f}s; kept the existing {output_file}.")
+        sys.exit(1)
+    print(f"Wrote {total} records to {output_file} in {crawl_seconds:.2f}s")
+
+    if args.bundle:
+        from .services.knowledge_bundle import BUNDLE_FILE, compile_bundle
+
+        bundle_file = os.path.join(os.path.dirname(output_file), os.path.basename(BUNDLE_FILE))
+        bundle_started = time.perf_counter()
+        kb, source_hash = compile_bundle(output_file, bundle_file)
+        print(f"Compiled {bundle_file} ({len(kb.documents)} sections, hash {source_hash[:12]}) "
+              f"in {time.perf_counter() - bundle_started:.2f}s")
+    print(f"Refresh finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
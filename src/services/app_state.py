@@ -0,0 +1,166 @@
+import gc
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .chat_service import ChatService
+from .config import (
+    BatchSettings, CacheSettings, CatalogSettings, CoalescingSettings, FaqSettings, KnowledgeSettings, LLMSettings,
+    PromptSettings, RetrievalSettings, RoutingSettings, SemanticCacheSettings, SessionSettings,
+)
+from .knowledge import KnowledgeBase
+from .knowledge_bundle import load_knowledge_base
+from .knowledge_store import KnowledgeStore
+from .llm_client import LLMClient
+from .metrics import ChatMetrics
+from .response_cache import DiskCacheBackend, ResponseCache
+from .semantic_cache import SemanticCache
+from .sessions import InMemorySessionBackend, SessionBackend, SqliteSessionBackend
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_preloaded: Optional[KnowledgeBase] = None
+
+
+def preload_knowledge(freeze: bool = False) -> KnowledgeBase:
+    """
+    Loads the knowledge base once per process and returns the shared instance.
+
+    Call this in a pre-forking parent (e.g. gunicorn --preload) so every worker
+    inherits the already-built, read-only KnowledgeBase instead of loading it
+    again. With freeze=True the loaded objects are moved out of the garbage
+    collector's reach so collections in the workers do not touch (and copy)
+    the shared pages.
+    """
+    global _preloaded
+    if _preloaded is None:
+        started = time.perf_counter()
+        _preloaded = load_knowledge_base()
+        logger.info("Knowledge base %s loaded in %.0f ms (%d sections).",
+                    _preloaded.version, (time.perf_counter() - started) * 1000, len(_preloaded.documents))
+        if freeze:
+            gc.freeze()
+    return _preloaded
+
+
+@dataclass
+class AppServices:
+    """
+    Per-worker runtime state, created in the app lifespan.
+    """
+    knowledge_settings: KnowledgeSettings
+    batch_settings: BatchSettings
+    knowledge_store: KnowledgeStore
+    client: LLMClient
+    response_cache: Optional[ResponseCache]
+    semantic_cache: Optional[SemanticCache]
+    single_flight: Optional[SingleFlight]
+    sessions: Optional[SessionBackend]
+    metrics: ChatMetrics
+    chat_service: ChatService
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        if self.sessions is not None:
+            self.sessions.close()
+
+
+def build_session_backend(settings: SessionSettings) -> Optional[SessionBackend]:
+    if not settings.enabled:
+        return None
+    if settings.backend == "sqlite":
+        return SqliteSessionBackend(settings.sqlite_path, settings.idle_seconds, settings.max_turns)
+    if settings.backend != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND {settings.backend!r}; expected 'memory' or 'sqlite'.")
+    return InMemorySessionBackend(
+        max_sessions=settings.max_sessions,
+        max_bytes=settings.max_memory_mb * 2**20,
+        idle_seconds=settings.idle_seconds,
+        max_turns=settings.max_turns,
+    )
+
+
+def build_services() -> AppServices:
+    """
+    Reads the settings from the environment and wires up the chat pipeline.
+
+    Raises:
+        ValueError: if GROQ_API_KEY is not set, or a backend in LLM_BACKENDS has no API key.
+    """
+    llm_settings = LLMSettings.from_env()
+    routing_settings = RoutingSettings.from_env()
+    if not routing_settings.backends and not llm_settings.api_key:
+        raise ValueError("GROQ_API_KEY environment variable not set. Please add it to your .env file.")
+    for backend in routing_settings.backends:
+        if not backend.api_key:
+            raise ValueError(f"No API key for model backend {backend.name!r}; set its api_key_env variable.")
+
+    knowledge_store = KnowledgeStore(preload_knowledge())
+    metrics = ChatMetrics()
+    client = LLMClient(llm_settings, metrics, routing_settings)
+
+    cache_settings = CacheSettings.from_env()
+    response_cache = None
+    if cache_settings.enabled:
+        response_cache = ResponseCache(
+            max_entries=cache_settings.max_entries,
+            ttl_seconds=cache_settings.ttl_seconds,
+            backend=(DiskCacheBackend(cache_settings.disk_path, cache_settings.disk_max_entries)
+                     if cache_settings.disk_path else None),
+        )
+
+    semantic_cache_settings = SemanticCacheSettings.from_env()
+    semantic_cache = None
+    if semantic_cache_settings.enabled:
+        semantic_cache = SemanticCache(
+            knowledge_store.current.vectorizer,
+            capacity=semantic_cache_settings.capacity,
+            threshold=semantic_cache_settings.threshold,
+            ttl_seconds=semantic_cache_settings.ttl_seconds,
+        )
+
+    single_flight = SingleFlight() if CoalescingSettings.from_env().enabled else None
+    session_settings = SessionSettings.from_env()
+    sessions = build_session_backend(session_settings)
+
+    chat_service = ChatService(knowledge_store, client, RetrievalSettings.from_env(), FaqSettings.from_env(),
+                               CatalogSettings.from_env(), response_cache, semantic_cache, single_flight,
+                               sessions, session_settings, PromptSettings.from_env(), metrics)
+
+    registry = metrics.registry
+    registry.add_stats_source("knowledge", knowledge_store.status, counters=("reloads", "failed_reloads"),
+                              gauges=("sections", "chunks"))
+    if response_cache is not None:
+        disk = response_cache.backend is not None
+        registry.add_stats_source("response_cache", response_cache.stats,
+                                  counters=("hits", "misses", "evictions") + (("disk_evictions",) if disk else ()),
+                                  gauges=("size",) + (("disk_size",) if disk else ()))
+    if semantic_cache is not None:
+        registry.add_stats_source("semantic_cache", semantic_cache.stats,
+                                  counters=("hits", "misses", "evictions"), gauges=("size",))
+    if single_flight is not None:
+        registry.add_stats_source("coalescing", single_flight.stats,
+                                  counters=("upstream_calls", "coalesced"), gauges=("in_flight",))
+    if sessions is not None:
+        # Register only the fields the configured backend reports; the sqlite store never evicts.
+        fields = sessions.stats()
+        registry.add_stats_source("session_store", sessions.stats,
+                                  counters=tuple(f for f in ("evictions", "expirations") if f in fields),
+                                  gauges=tuple(f for f in ("sessions", "bytes") if f in fields))
+
+    return AppServices(
+        knowledge_settings=KnowledgeSettings.from_env(),
+        batch_settings=BatchSettings.from_env(),
+        knowledge_store=knowledge_store,
+        client=client,
+        response_cache=response_cache,
+        semantic_cache=semantic_cache,
+        single_flight=single_flight,
+        sessions=sessions,
+        metrics=metrics,
+        chat_service=chat_service,
+    )
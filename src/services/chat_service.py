@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .config import CatalogSettings, FaqSettings, PromptSettings, RetrievalSettings, SessionSettings
+from .knowledge import KnowledgeBase
+from .knowledge_store import KnowledgeStore
+from .llm_client import LLMClient
+from .metrics import ChatMetrics
+from .providers import UpstreamUnavailable
+from .rate_limiter import RateLimitExceeded
+from .response_cache import ResponseCache, normalize_message
+from .retrieval import Document
+from .semantic_cache import SemanticCache
+from .sessions import SessionBackend, history_messages
+from .single_flight import SingleFlight
+from .tokens import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Where an answer came from; reported to the client as "source".
+SOURCE_FAQ = "faq"
+SOURCE_CATALOG = "catalog"
+SOURCE_CACHE = "cache"
+SOURCE_MODEL = "model"
+
+# Errors reported for a question that could not be sent upstream: shed by
+# admission control (HTTP 429) or with every model backend down (HTTP 503).
+RATE_LIMITED_ERROR = "Too many requests, please retry later"
+UNAVAILABLE_ERROR = "The assistant is temporarily unavailable, please retry later"
+
+
+@dataclass(frozen=True)
+class ChatReply:
+    text: str
+    source: str
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+    The reply (or error) for one distinct question of a batch, with the
+    positions of all the batch items that asked it.
+    """
+    indices: List[int]
+    reply: Optional[ChatReply] = None
+    error: Optional[str] = None
+    # Set when the question was shed by admission control or no backend was available.
+    retry_after: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class PromptContext:
+    """
+    What a stateless question that reaches the cache lookup needs for its
+    model call: the documents retrieved for it (None with retrieval
+    disabled), so the prompt reuses them, and its exact-match cache key.
+    """
+    documents: Optional[List[Document]]
+    cache_key: Optional[str]
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+class ChatService:
+    """
+    The /chat request pipeline: FAQ and course-catalog matching, cache lookups,
+    prompt assembly and the model call.
+
+    A message that closely matches a curated FAQ, or asks about a clearly named
+    course, is answered directly. Otherwise it is looked up in the exact-match
+    cache, then in the paraphrase-tolerant semantic cache; only a miss in all
+    of them reaches the model. Concurrent misses for the same question and
+    knowledge-base version share one upstream call when single-flight
+    coalescing is enabled.
+
+    Each request reads the active KnowledgeBase from the store once and uses
+    that snapshot throughout, so a hot reload never mixes two versions.
+
+    Requests carrying a session_id with earlier turns are follow-ups whose
+    meaning depends on the conversation: they still get FAQ and catalog
+    answers, but bypass the shared caches and coalescing, and the model sees
+    as much recent history as fits the token budget.
+    """
+
+    def __init__(self, knowledge_store: KnowledgeStore, client: LLMClient,
+                 retrieval_settings: RetrievalSettings,
+                 faq_settings: FaqSettings,
+                 catalog_settings: CatalogSettings,
+                 response_cache: Optional[ResponseCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 sessions: Optional[SessionBackend] = None,
+                 session_settings: SessionSettings = SessionSettings(),
+                 prompt_settings: PromptSettings = PromptSettings(),
+                 metrics: Optional[ChatMetrics] = None):
+        self.knowledge_store = knowledge_store
+        self.client = client
+        self.retrieval_settings = retrieval_settings
+        self.faq_settings = faq_settings
+        self.catalog_settings = catalog_settings
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight
+        self.sessions = sessions
+        self.session_settings = session_settings
+        self.prompt_settings = prompt_settings
+        self.metrics = metrics if metrics is not None else client.metrics
+
+    def build_messages(self, kb: KnowledgeBase, user_message: str, history: Optional[List[str]] = None,
+                       documents: Optional[List[Document]] = None) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """
+        Builds the model input: only the sections relevant to the question plus the
+        persona header, or the full system prompt when retrieval is disabled,
+        followed by the conversation history that fits the token budget. The
+        documents, when given, were already retrieved for the question.
+
+        The context window left after the completion budget and the question is
+        shared by the system prompt (capped at max_system_tokens) and then the
+        history. Returns the messages and their estimated tokens per section.
+        """
+        settings = self.client.settings
+        user_tokens = estimate_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+        available = settings.context_window - settings.max_tokens - user_tokens - MESSAGE_OVERHEAD_TOKENS
+        system_budget = min(self.prompt_settings.max_system_tokens, available)
+
+        if self.retrieval_settings.enabled:
+            # A follow-up such as "and the fees?" is retrieved together with the previous question.
+            query = f"{history[-2]} {user_message}" if history else user_message
+            system_prompt, report = kb.system_prompt_for(query, self.retrieval_settings.top_k, system_budget,
+                                                         documents)
+        else:
+            system_prompt, report = kb.full_system_prompt(system_budget)
+        system_tokens = sum(tokens for section, tokens in report.items() if section != "dropped_sections")
+
+        messages = [{"role": "system", "content": system_prompt}]
+        history_tokens = 0
+        if history:
+            budget = min(self.session_settings.history_max_tokens, available - system_tokens)
+            past = history_messages(history, budget)
+            history_tokens = estimate_message_tokens(past)
+            messages.extend(past)
+        messages.append({"role": "user", "content": user_message})
+
+        report["history"] = history_tokens
+        report["user"] = user_tokens
+        report["total"] = system_tokens + MESSAGE_OVERHEAD_TOKENS + history_tokens + user_tokens
+        return messages, report
+
+    def _prompt(self, kb: KnowledgeBase, user_message: str, history: Optional[List[str]] = None,
+                documents: Optional[List[Document]] = None) -> List[Dict[str, str]]:
+        started = time.perf_counter()
+        messages, report = self.build_messages(kb, user_message, history, documents)
+        self.metrics.prompt_seconds.observe(time.perf_counter() - started)
+        if self.prompt_settings.log_token_counts:
+            logger.info("Prompt tokens: %s", " ".join(f"{section}={tokens}" for section, tokens in report.items()))
+        return messages
+
+    async def _history(self, session_id: Optional[str]) -> List[str]:
+        if self.sessions is None or not session_id:
+            return []
+        if self.sessions.blocking:
+            return await asyncio.to_thread(self.sessions.load, session_id)
+        return self.sessions.load(session_id)
+
+    async def _record(self, session_id: Optional[str], user_message: str, answer: str) -> None:
+        if self.sessions is None or not session_id or not answer:
+            return
+        if self.sessions.blocking:
+            await asyncio.to_thread(self.sessions.append, session_id, user_message, answer)
+        else:
+            self.sessions.append(session_id, user_message, answer)
+
+    def _context(self, kb: KnowledgeBase, user_message: str) -> PromptContext:
+        documents = kb.retrieve(user_message, self.retrieval_settings.top_k) if self.retrieval_settings.enabled else None
+        if self.response_cache is None:
+            return PromptContext(documents, None)
+        if documents is not None:
+            # Keyed on the retrieved chunks, so an answer stays cached across
+            # reloads that only changed other records.
+            return PromptContext(documents, self.response_cache.make_key(user_message, kb.context_version(documents)))
+        return PromptContext(documents, self.response_cache.make_key(user_message, kb.version))
+
+    def _faq_answer(self, kb: KnowledgeBase, user_message: str) -> Optional[str]:
+        if not self.faq_settings.enabled:
+            return None
+        match = kb.faq_matcher.match(user_message)
+        if match is None or match.confidence < self.faq_settings.threshold:
+            return None
+        return match.answer
+
+    def _catalog_answer(self, kb: KnowledgeBase, user_message: str) -> Optional[str]:
+        if not self.catalog_settings.enabled:
+            return None
+        answer = kb.catalog.answer(user_message, self.catalog_settings.threshold)
+        return answer.text if answer is not None else None
+
+    def _direct_reply(self, kb: KnowledgeBase, user_message: str) -> Optional[ChatReply]:
+        faq_answer = self._faq_answer(kb, user_message)
+        if faq_answer is not None:
+            return ChatReply(faq_answer, SOURCE_FAQ)
+        catalog_answer = self._catalog_answer(kb, user_message)
+        if catalog_answer is not None:
+            return ChatReply(catalog_answer, SOURCE_CATALOG)
+        return None
+
+    async def _local_reply(self, kb: KnowledgeBase, user_message: str,
+                           use_caches: bool = True) -> Tuple[Optional[ChatReply], Optional[PromptContext]]:
+        """
+        The FAQ, catalog or (with use_caches) cached answer to the question, if
+        any. Documents are only retrieved once the FAQ and catalog missed; the
+        context is returned for the model call, or None when no lookup needed it.
+        """
+        started = time.perf_counter()
+        reply = self._direct_reply(kb, user_message)
+        context = None
+        if reply is None and use_caches:
+            context = self._context(kb, user_message)
+            cached = await self._cached_answer(kb, user_message, context.cache_key)
+            if cached is not None:
+                reply = ChatReply(cached, SOURCE_CACHE)
+        self.metrics.lookup_seconds.observe(time.perf_counter() - started)
+        return reply, context
+
+    async def _cached_answer(self, kb: KnowledgeBase, user_message: str, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is not None:
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if self.semantic_cache is not None:
+            match = self.semantic_cache.lookup(user_message, kb.version, kb.vectorizer)
+            if match is not None:
+                answer, _ = match
+                # Promote to the exact tier so repeats of this wording skip the vector search.
+                if cache_key is not None:
+                    await self.response_cache.set(cache_key, answer)
+                return answer
+        return None
+
+    async def _remember(self, kb: KnowledgeBase, user_message: str, cache_key: Optional[str], answer: str) -> None:
+        if not answer:
+            return
+        if cache_key is not None:
+            await self.response_cache.set(cache_key, answer)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(user_message, answer, kb.version, kb.vectorizer)
+
+    async def reply(self, user_message: str, session_id: Optional[str] = None) -> ChatReply:
+        kb = self.knowledge_store.current
+        history = await self._history(session_id)
+        if history:
+            reply, _ = await self._local_reply(kb, user_message, use_caches=False)
+            if reply is None:
+                text = await self.client.complete(self._prompt(kb, user_message, history))
+                reply = ChatReply(text, SOURCE_MODEL)
+        else:
+            reply = await self._stateless_reply(kb, user_message)
+        self.metrics.replies.labels(reply.source).inc()
+        await self._record(session_id, user_message, reply.text)
+        return reply
+
+    async def _stateless_reply(self, kb: KnowledgeBase, user_message: str) -> ChatReply:
+        local, context = await self._local_reply(kb, user_message)
+        if local is not None:
+            return local
+        return await self._model_reply(kb, user_message, context)
+
+    async def _model_reply(self, kb: KnowledgeBase, user_message: str, context: PromptContext) -> ChatReply:
+        if self.single_flight is not None:
+            flight, _ = self.single_flight.join(
+                ResponseCache.make_key(user_message, kb.version),
+                lambda: self._complete_from_model(kb, user_message, context),
+            )
+            return ChatReply(await flight.result(), SOURCE_MODEL)
+
+        bot_response = await self.client.complete(self._prompt(kb, user_message, documents=context.documents))
+        await self._remember(kb, user_message, context.cache_key, bot_response)
+        return ChatReply(bot_response, SOURCE_MODEL)
+
+    async def reply_batch(self, user_messages: List[str], max_concurrency: int) -> AsyncIterator[BatchResult]:
+        """
+        Answers a batch of stateless questions, yielding results as they complete.
+
+        Questions that are identical after normalisation are answered once. FAQ,
+        catalog and cached answers come first, straight from the lookup; the
+        rest go to the model with at most max_concurrency calls in flight (still
+        coalesced with concurrent /chat requests). A failed question yields an
+        error result and does not affect the others.
+        """
+        kb = self.knowledge_store.current
+        groups: Dict[str, List[int]] = {}
+        for index, user_message in enumerate(user_messages):
+            groups.setdefault(normalize_message(user_message), []).append(index)
+
+        pending = []
+        for indices in groups.values():
+            user_message = user_messages[indices[0]]
+            local, context = await self._local_reply(kb, user_message)
+            if local is not None:
+                self.metrics.replies.labels(local.source).inc(len(indices))
+                yield BatchResult(indices, local)
+            else:
+                pending.append((indices, user_message, context))
+        if not pending:
+            return
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def answer(indices: List[int], user_message: str, context: PromptContext) -> BatchResult:
+            async with semaphore:
+                try:
+                    reply = await self._model_reply(kb, user_message, context)
+                except RateLimitExceeded as e:
+                    return BatchResult(indices, error=RATE_LIMITED_ERROR, retry_after=e.retry_after)
+                except UpstreamUnavailable as e:
+                    return BatchResult(indices, error=UNAVAILABLE_ERROR, retry_after=e.retry_after)
+                except Exception:
+                    logger.exception("Batch item error:")
+                    return BatchResult(indices, error="Internal server error")
+            self.metrics.replies.labels(reply.source).inc(len(indices))
+            return BatchResult(indices, reply)
+
+        tasks = [asyncio.create_task(answer(*item)) for item in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client may stop reading a streamed batch; drop the questions not yet answered.
+            for task in tasks:
+                task.cancel()
+
+    async def stream_reply(self, user_message: str, session_id: Optional[str] = None) -> Tuple[str, AsyncIterator[str]]:
+        """
+        Returns the answer source and an iterator of text deltas. FAQ and cached
+        answers arrive as a single delta; a fresh model answer is cached only
+        once its stream has completed. With coalescing, every concurrent
+        request for the same question receives the deltas of one upstream stream.
+        """
+        kb = self.knowledge_store.current
+        history = await self._history(session_id)
+        if history:
+            direct, _ = await self._local_reply(kb, user_message, use_caches=False)
+            if direct is not None:
+                source, deltas = direct.source, _single_chunk(direct.text)
+            else:
+                source, deltas = SOURCE_MODEL, self.client.stream(self._prompt(kb, user_message, history))
+        else:
+            source, deltas = await self._stateless_stream(kb, user_message)
+        self.metrics.replies.labels(source).inc()
+        if self.sessions is None or not session_id:
+            return source, deltas
+        return source, self._recording(session_id, user_message, deltas)
+
+    async def _recording(self, session_id: str, user_message: str, deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+        parts = []
+        async for delta in deltas:
+            parts.append(delta)
+            yield delta
+        await self._record(session_id, user_message, "".join(parts))
+
+    async def _stateless_stream(self, kb: KnowledgeBase, user_message: str) -> Tuple[str, AsyncIterator[str]]:
+        local, context = await self._local_reply(kb, user_message)
+        if local is not None:
+            return local.source, _single_chunk(local.text)
+        if self.single_flight is not None:
+            flight, _ = self.single_flight.join(
+                ResponseCache.make_key(user_message, kb.version),
+                lambda: self._stream_from_model(kb, user_message, context),
+            )
+            return SOURCE_MODEL, flight.subscribe()
+        return SOURCE_MODEL, self._stream_from_model(kb, user_message, context)
+
+    async def _complete_from_model(self, kb: KnowledgeBase, user_message: str,
+                                   context: PromptContext) -> AsyncIterator[str]:
+        bot_response = await self.client.complete(self._prompt(kb, user_message, documents=context.documents))
+        await self._remember(kb, user_message, context.cache_key, bot_response)
+        yield bot_response
+
+    async def _stream_from_model(self, kb: KnowledgeBase, user_message: str,
+                                 context: PromptContext) -> AsyncIterator[str]:
+        parts = []
+        async for delta in self.client.stream(self._prompt(kb, user_message, documents=context.documents)):
+            parts.append(delta)
+            yield delta
+
+        await self._remember(kb, user_message, context.cache_key, "".join(parts))
@@ -0,0 +1,130 @@
+import hashlib
+import re
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .retrieval import Document
+from .tokens import estimate_tokens
+
+# Target size of a chunk's text and how much of the previous chunk it repeats,
+# in estimated tokens. A sentence that alone exceeds the size is cut between words.
+CHUNK_MAX_TOKENS = 128
+CHUNK_OVERLAP_TOKENS = 24
+# Section kinds split into chunks. Course tables and the fee structure stay
+# whole (the course catalog already answers single rows), and so do the
+# small pinned contact sections.
+CHUNKED_KINDS = ("general_info", "announcement", "course", "department", "faq")
+
+# A sentence (up to ., ! or ? followed by whitespace) or the rest of a line.
+_UNIT_RE = re.compile(r"[^\n]*?(?:[.!?](?=\s)|\n|$)")
+_WORD_RE = re.compile(r"\S+\s*")
+
+
+def content_id(*parts: str) -> str:
+    """
+    Short, stable hash of the given strings; equal content always gets the same ID.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def section_key(doc: Document) -> str:
+    """
+    Content-derived ID of a whole section; the parent_id of its chunks.
+    """
+    return content_id(doc.kind, doc.title, doc.text)
+
+
+def _units(text: str, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    # (start, end, tokens) of each sentence or line, with oversized ones cut into word runs.
+    for match in _UNIT_RE.finditer(text):
+        piece = match.group()
+        if not piece.strip():
+            continue
+        tokens = estimate_tokens(piece)
+        if tokens <= max_tokens:
+            yield match.start(), match.end(), tokens
+            continue
+        start = end = match.start()
+        used = 0
+        for word in _WORD_RE.finditer(piece):
+            cost = estimate_tokens(word.group())
+            if used and used + cost > max_tokens:
+                yield start, end, used
+                start, used = end, 0
+            end = match.start() + word.end()
+            used += cost
+        if used:
+            yield start, end, used
+
+
+def split_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+               overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Splits text into chunks of whole sentences of up to max_tokens each. Every
+    chunk after the first starts with the last sentences of the previous one,
+    up to overlap_tokens, so a fact on a boundary is found in either chunk.
+    Boundaries depend only on the text, so the same text always gives the
+    same chunks.
+    """
+    units = list(_units(text, max_tokens))
+    chunks = []
+    start = 0
+    while start < len(units):
+        end, used = start, 0
+        while end < len(units) and (end == start or used + units[end][2] <= max_tokens):
+            used += units[end][2]
+            end += 1
+        chunks.append(text[units[start][0]:units[end - 1][1]].strip())
+        if end == len(units):
+            break
+        # Step back over the trailing sentences that fit in the overlap, but always move forward.
+        next_start, carried = end, 0
+        while next_start - 1 > start and carried + units[next_start - 1][2] <= overlap_tokens:
+            next_start -= 1
+            carried += units[next_start][2]
+        start = next_start
+    return chunks
+
+
+def chunk_section(doc: Document) -> List[Document]:
+    """
+    The chunks of one section, as Documents whose doc_id is derived from their
+    content and whose parent_id is the section's key. A section of a kind
+    that is not chunked, or short enough, is one chunk.
+    """
+    parent_id = section_key(doc)
+    texts = split_text(doc.text) if doc.kind in CHUNKED_KINDS else [doc.text]
+    chunks = []
+    for ordinal, text in enumerate(texts):
+        if ordinal:
+            # Later chunks carry the section title, so they read on their own in the prompt.
+            text = f"{doc.title} (continued):\n{text}"
+        chunks.append(Document(content_id(doc.kind, doc.title, text), doc.kind, doc.title, text, parent_id))
+    return chunks
+
+
+def chunk_sections(sections: List[Document],
+                   previous: Optional[Dict[str, List[Document]]] = None) -> Dict[str, List[Document]]:
+    """
+    Chunks every section, keyed by section key in section order. Sections
+    whose key is in previous (the chunks of an earlier build) are unchanged
+    and reuse those chunks instead of being split again.
+    """
+    previous = previous or {}
+    chunks: Dict[str, List[Document]] = {}
+    for doc in sections:
+        key = section_key(doc)
+        if key not in chunks:
+            chunks[key] = previous[key] if key in previous else chunk_section(doc)
+    return chunks
+
+
+def as_parent(doc: Document) -> Document:
+    """
+    The section under its content-derived key, as returned in place of its chunks.
+    """
+    return replace(doc, doc_id=section_key(doc))
@@ -0,0 +1,343 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+def _env_str(name: str, default: str) -> str:
+    value = os.getenv(name)
+    return value if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    """
+    Connection and generation settings for the upstream OpenAI-compatible model API.
+
+    Every field can be overridden through an environment variable so deployments
+    can tune timeouts and concurrency without code changes.
+    """
+    api_key: Optional[str]
+    base_url: str = "https://api.groq.com/openai/v1"
+    model: str = "llama3-8b-8192"
+    temperature: float = 0.3
+    max_tokens: int = 1024
+    # Model context length in tokens (prompt plus completion); 8192 for llama3-8b-8192.
+    context_window: int = 8192
+    # Seconds to wait for the whole upstream response / for the TCP+TLS handshake.
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+    # HTTP connection pool; keep-alive connections are reused across requests.
+    max_connections: int = 200
+    max_keepalive_connections: int = 50
+    keepalive_expiry: float = 30.0
+    # Upper bound on completions in flight at once from this worker.
+    max_concurrency: int = 128
+    max_retries: int = 2
+    # Provider quotas enforced before calling upstream; 0 disables the limit.
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    # Calls waiting for a quota or a concurrency slot, and how long each may
+    # wait before it is rejected with a 429.
+    max_queue: int = 256
+    queue_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "LLMSettings":
+        return cls(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=_env_str("LLM_BASE_URL", cls.base_url),
+            model=_env_str("LLM_MODEL", cls.model),
+            temperature=_env_float("LLM_TEMPERATURE", cls.temperature),
+            max_tokens=_env_int("LLM_MAX_TOKENS", cls.max_tokens),
+            context_window=_env_int("LLM_CONTEXT_WINDOW", cls.context_window),
+            timeout=_env_float("LLM_TIMEOUT_SECONDS", cls.timeout),
+            connect_timeout=_env_float("LLM_CONNECT_TIMEOUT_SECONDS", cls.connect_timeout),
+            max_connections=_env_int("LLM_MAX_CONNECTIONS", cls.max_connections),
+            max_keepalive_connections=_env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", cls.max_keepalive_connections),
+            keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY_SECONDS", cls.keepalive_expiry),
+            max_concurrency=_env_int("LLM_MAX_CONCURRENCY", cls.max_concurrency),
+            max_retries=_env_int("LLM_MAX_RETRIES", cls.max_retries),
+            requests_per_minute=_env_int("LLM_REQUESTS_PER_MINUTE", cls.requests_per_minute),
+            tokens_per_minute=_env_int("LLM_TOKENS_PER_MINUTE", cls.tokens_per_minute),
+            max_queue=_env_int("LLM_MAX_QUEUE", cls.max_queue),
+            queue_timeout=_env_float("LLM_QUEUE_TIMEOUT_SECONDS", cls.queue_timeout),
+        )
+
+
+@dataclass(frozen=True)
+class BackendSettings:
+    """
+    One OpenAI-compatible model backend (Groq, OpenAI, Gemini's OpenAI endpoint, a local server...).
+    """
+    name: str
+    base_url: str
+    model: str
+    api_key: Optional[str]
+
+
+def _env_backends(name: str) -> Tuple[BackendSettings, ...]:
+    """
+    Parses a JSON list of backends such as
+    [{"name": "groq", "base_url": "https://api.groq.com/openai/v1", "model": "llama3-8b-8192",
+      "api_key_env": "GROQ_API_KEY"}]. api_key may be given inline instead of api_key_env.
+    """
+    value = os.getenv(name)
+    if not value:
+        return ()
+    backends = []
+    for entry in json.loads(value):
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env", "GROQ_API_KEY"))
+        backends.append(BackendSettings(
+            name=entry.get("name") or entry["base_url"],
+            base_url=entry["base_url"],
+            model=entry.get("model") or LLMSettings.model,
+            api_key=api_key,
+        ))
+    return tuple(backends)
+
+
+@dataclass(frozen=True)
+class RoutingSettings:
+    """
+    Failover, hedging and retries across the model backends.
+    """
+    # In order of preference; empty means the single backend of LLMSettings.
+    backends: Tuple[BackendSettings, ...] = ()
+    # Start the same call on the next backend once the first is slower than its usual p95.
+    hedging: bool = True
+    hedge_percentile: float = 95.0
+    # Hedge delay used until a backend has enough latency samples of its own.
+    hedge_delay: float = 3.0
+    # Consecutive failures that open a backend's circuit, and how long it stays open.
+    breaker_failures: int = 5
+    breaker_reset_seconds: float = 30.0
+    # Full-jitter exponential backoff between retries, within LLM_TIMEOUT_SECONDS.
+    retry_base_delay: float = 0.25
+    retry_max_delay: float = 4.0
+
+    @classmethod
+    def from_env(cls) -> "RoutingSettings":
+        return cls(
+            backends=_env_backends("LLM_BACKENDS"),
+            hedging=_env_bool("LLM_HEDGING_ENABLED", cls.hedging),
+            hedge_percentile=_env_float("LLM_HEDGE_PERCENTILE", cls.hedge_percentile),
+            hedge_delay=_env_float("LLM_HEDGE_DELAY_SECONDS", cls.hedge_delay),
+            breaker_failures=_env_int("LLM_BREAKER_FAILURES", cls.breaker_failures),
+            breaker_reset_seconds=_env_float("LLM_BREAKER_RESET_SECONDS", cls.breaker_reset_seconds),
+            retry_base_delay=_env_float("LLM_RETRY_BASE_DELAY_SECONDS", cls.retry_base_delay),
+            retry_max_delay=_env_float("LLM_RETRY_MAX_DELAY_SECONDS", cls.retry_max_delay),
+        )
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    """
+    Controls how much of the knowledge base is sent with each request.
+    """
+    # When disabled, every request carries the full system prompt.
+    enabled: bool = True
+    top_k: int = 6
+
+    @classmethod
+    def from_env(cls) -> "RetrievalSettings":
+        return cls(
+            enabled=_env_bool("RETRIEVAL_ENABLED", cls.enabled),
+            top_k=_env_int("RETRIEVAL_TOP_K", cls.top_k),
+        )
+
+
+@dataclass(frozen=True)
+class PromptSettings:
+    """
+    Token budget of the system prompt and per-request token logging.
+    """
+    # Most tokens the system prompt may use; the context window left after the
+    # question and the completion budget may lower it further.
+    max_system_tokens: int = 4096
+    log_token_counts: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PromptSettings":
+        return cls(
+            max_system_tokens=_env_int("PROMPT_MAX_SYSTEM_TOKENS", cls.max_system_tokens),
+            log_token_counts=_env_bool("PROMPT_LOG_TOKEN_COUNTS", cls.log_token_counts),
+        )
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    """
+    Exact-match response cache placed in front of the model.
+    """
+    enabled: bool = True
+    max_entries: int = 2048
+    ttl_seconds: float = 6 * 3600.0
+    # Optional SQLite file so warm answers survive restarts; empty disables it.
+    disk_path: str = ""
+    # Most answers kept in the SQLite file; the oldest are deleted beyond it.
+    disk_max_entries: int = 100_000
+
+    @classmethod
+    def from_env(cls) -> "CacheSettings":
+        return cls(
+            enabled=_env_bool("RESPONSE_CACHE_ENABLED", cls.enabled),
+            max_entries=_env_int("RESPONSE_CACHE_MAX_ENTRIES", cls.max_entries),
+            ttl_seconds=_env_float("RESPONSE_CACHE_TTL_SECONDS", cls.ttl_seconds),
+            disk_path=_env_str("RESPONSE_CACHE_DISK_PATH", cls.disk_path),
+            disk_max_entries=_env_int("RESPONSE_CACHE_DISK_MAX_ENTRIES", cls.disk_max_entries),
+        )
+
+
+@dataclass(frozen=True)
+class SemanticCacheSettings:
+    """
+    Second-tier cache that matches paraphrased questions by n-gram similarity.
+    """
+    enabled: bool = True
+    capacity: int = 10000
+    # Minimum cosine similarity between questions to reuse an answer.
+    threshold: float = 0.8
+    ttl_seconds: float = 6 * 3600.0
+
+    @classmethod
+    def from_env(cls) -> "SemanticCacheSettings":
+        return cls(
+            enabled=_env_bool("SEMANTIC_CACHE_ENABLED", cls.enabled),
+            capacity=_env_int("SEMANTIC_CACHE_CAPACITY", cls.capacity),
+            threshold=_env_float("SEMANTIC_CACHE_THRESHOLD", cls.threshold),
+            ttl_seconds=_env_float("SEMANTIC_CACHE_TTL_SECONDS", cls.ttl_seconds),
+        )
+
+
+@dataclass(frozen=True)
+class CoalescingSettings:
+    """
+    Single-flight deduplication of identical questions that are in flight at the same time.
+    """
+    enabled: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CoalescingSettings":
+        return cls(enabled=_env_bool("REQUEST_COALESCING_ENABLED", cls.enabled))
+
+
+@dataclass(frozen=True)
+class BatchSettings:
+    """
+    Limits of the /chat/batch endpoint.
+    """
+    max_items: int = 500
+    # Model calls one batch may have in flight; local answers are not limited.
+    max_concurrency: int = 16
+
+    @classmethod
+    def from_env(cls) -> "BatchSettings":
+        return cls(
+            max_items=_env_int("BATCH_MAX_ITEMS", cls.max_items),
+            max_concurrency=_env_int("BATCH_MAX_CONCURRENCY", cls.max_concurrency),
+        )
+
+
+@dataclass(frozen=True)
+class FaqSettings:
+    """
+    Direct answering from the curated FAQ list, without calling the model.
+    """
+    enabled: bool = True
+    # Minimum match confidence (cosine similarity of the questions) to answer directly.
+    threshold: float = 0.85
+
+    @classmethod
+    def from_env(cls) -> "FaqSettings":
+        return cls(
+            enabled=_env_bool("FAQ_DIRECT_ANSWER_ENABLED", cls.enabled),
+            threshold=_env_float("FAQ_MATCH_THRESHOLD", cls.threshold),
+        )
+
+
+@dataclass(frozen=True)
+class CatalogSettings:
+    """
+    Deterministic answers to course requirement, duration and fee questions.
+    """
+    enabled: bool = True
+    # Share of a course name that must be mentioned to answer directly.
+    threshold: float = 0.75
+
+    @classmethod
+    def from_env(cls) -> "CatalogSettings":
+        return cls(
+            enabled=_env_bool("CATALOG_DIRECT_ANSWER_ENABLED", cls.enabled),
+            threshold=_env_float("CATALOG_MATCH_THRESHOLD", cls.threshold),
+        )
+
+
+@dataclass(frozen=True)
+class KnowledgeSettings:
+    """
+    Loading and hot reloading of the knowledge base.
+    """
+    # Seconds between dataset modification checks; 0 disables the watcher.
+    watch_interval: float = 30.0
+    # Token required by the admin endpoints in the X-Admin-Token header; empty disables them.
+    admin_token: str = ""
+    # Load the knowledge base when the app is created instead of in each
+    # worker's lifespan, so a preforking server (gunicorn --preload) shares it.
+    preload: bool = False
+
+    @classmethod
+    def from_env(cls) -> "KnowledgeSettings":
+        return cls(
+            watch_interval=_env_float("KNOWLEDGE_WATCH_INTERVAL_SECONDS", cls.watch_interval),
+            admin_token=_env_str("ADMIN_TOKEN", cls.admin_token),
+            preload=_env_bool("PRELOAD_KNOWLEDGE", cls.preload),
+        )
+
+
+@dataclass(frozen=True)
+class SessionSettings:
+    """
+    Multi-turn conversation history, keyed on the client-supplied session_id.
+    """
+    enabled: bool = True
+    # "memory" (per worker) or "sqlite" (shared by the workers on one host).
+    backend: str = "memory"
+    sqlite_path: str = "sessions.sqlite3"
+    max_sessions: int = 50000
+    max_memory_mb: int = 64
+    idle_seconds: float = 1800.0
+    # Question/answer pairs kept per session.
+    max_turns: int = 10
+    # Upper bound on history tokens sent with a question; the context window may lower it further.
+    history_max_tokens: int = 2048
+
+    @classmethod
+    def from_env(cls) -> "SessionSettings":
+        return cls(
+            enabled=_env_bool("SESSIONS_ENABLED", cls.enabled),
+            backend=_env_str("SESSION_BACKEND", cls.backend).lower(),
+            sqlite_path=_env_str("SESSION_SQLITE_PATH", cls.sqlite_path),
+            max_sessions=_env_int("SESSION_MAX_SESSIONS", cls.max_sessions),
+            max_memory_mb=_env_int("SESSION_MAX_MEMORY_MB", cls.max_memory_mb),
+            idle_seconds=_env_float("SESSION_IDLE_SECONDS", cls.idle_seconds),
+            max_turns=_env_int("SESSION_MAX_TURNS", cls.max_turns),
+            history_max_tokens=_env_int("SESSION_HISTORY_MAX_TOKENS", cls.history_max_tokens),
+        )
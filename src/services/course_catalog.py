@@ -0,0 +1,206 @@
+import difflib
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .retrieval import tokenize
+
+# Words that signal which course attribute a question is about.
+INTENT_KEYWORDS = {
+    "requirements": {"requirement", "require", "qualify", "qualification", "entry", "grade", "kcse", "minimum", "need"},
+    "duration": {"long", "duration", "year", "month", "term", "take", "last"},
+    "fees": {"fee", "cost", "pay", "much", "price", "tuition", "charge", "kes", "ksh"},
+    "level": {"level"},
+}
+
+# Qualification words that tie a course to a new-student fee band.
+QUALIFICATION_WORDS = ("diploma", "certificate", "artisan", "craft", "degree")
+# Unless the question names a qualification or level, a runner-up course
+# scoring within this margin of the best match makes the question ambiguous
+# (e.g. the Diploma and the Certificate in the same subject).
+AMBIGUITY_MARGIN = 0.15
+
+
+def _kes(value: Any) -> str:
+    return f"{float(value):,.2f}" if value is not None else "N/A"
+
+
+@dataclass(frozen=True)
+class Course:
+    name: str
+    department: str
+    level: str
+    duration: str
+    requirements: str
+
+
+@dataclass(frozen=True)
+class CatalogAnswer:
+    text: str
+    course: Course
+    score: float
+
+
+class CourseCatalog:
+    """
+    Indexed, in-memory view of the official course list and fee structure.
+
+    Courses are indexed by exact normalised name, by name token (weighted by
+    how rare the token is across course names), by department and by level,
+    so the common "requirements / duration / fees for X" questions can be
+    answered deterministically or narrowed down to a few table rows.
+    """
+
+    def __init__(self, courses_detailed: List[Dict[str, Any]], fees_structure: Optional[Dict[str, Any]] = None):
+        self.courses: List[Course] = []
+        for dept_data in courses_detailed or []:
+            department = dept_data.get('department', 'Unknown Department')
+            for course in dept_data.get('courses', []):
+                name = (course.get('curricula') or '').strip()
+                if not name:
+                    continue
+                level = course.get('level')
+                self.courses.append(Course(
+                    name=name,
+                    department=department,
+                    level=str(level) if level is not None else '',
+                    duration=str(course.get('duration') or ''),
+                    requirements=str(course.get('requirements') or ''),
+                ))
+        self.fees_structure = fees_structure or {}
+
+        self._by_name: Dict[str, int] = {}
+        self._by_token: Dict[str, Set[int]] = defaultdict(set)
+        self._by_department: Dict[str, List[int]] = defaultdict(list)
+        self._by_level: Dict[str, List[int]] = defaultdict(list)
+        self._name_tokens: List[Set[str]] = []
+        for idx, course in enumerate(self.courses):
+            tokens = set(tokenize(course.name))
+            self._name_tokens.append(tokens)
+            self._by_name.setdefault(" ".join(tokenize(course.name)), idx)
+            for token in tokens:
+                self._by_token[token].add(idx)
+            self._by_department[" ".join(tokenize(course.department))].append(idx)
+            if course.level:
+                self._by_level[course.level.lower()].append(idx)
+
+        n_courses = len(self.courses)
+        self._token_weight = {
+            token: math.log(1 + n_courses / len(rows)) for token, rows in self._by_token.items()
+        }
+        self._vocabulary = list(self._by_token)
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def _query_tokens(self, text: str) -> Set[str]:
+        # Unknown words are mapped to the closest course-name token, which
+        # absorbs typos such as "agricultral".
+        tokens = set()
+        for token in tokenize(text):
+            if token in self._by_token:
+                tokens.add(token)
+            elif len(token) >= 5:
+                close = difflib.get_close_matches(token, self._vocabulary, n=1, cutoff=0.85)
+                if close:
+                    tokens.add(close[0])
+        return tokens
+
+    def find(self, text: str, limit: int = 5) -> List[Tuple[Course, float]]:
+        """
+        Fuzzy course lookup. The score is the share of a course name's token
+        weight mentioned in the text (1.0 when every name word is present).
+        """
+        exact = self._by_name.get(" ".join(tokenize(text)))
+        if exact is not None:
+            return [(self.courses[exact], 1.0)]
+
+        query = self._query_tokens(text)
+        candidates: Set[int] = set()
+        for token in query:
+            candidates |= self._by_token[token]
+
+        scored = []
+        for idx in candidates:
+            name_tokens = self._name_tokens[idx]
+            total = sum(self._token_weight[t] for t in name_tokens)
+            matched = sum(self._token_weight[t] for t in name_tokens & query)
+            if total:
+                scored.append((matched / total, idx))
+        scored.sort(key=lambda item: (-item[0], len(self.courses[item[1]].name)))
+        return [(self.courses[idx], score) for score, idx in scored[:limit]]
+
+    def by_department(self, department: str) -> List[Course]:
+        return [self.courses[idx] for idx in self._by_department.get(" ".join(tokenize(department)), [])]
+
+    def by_level(self, level: Any) -> List[Course]:
+        return [self.courses[idx] for idx in self._by_level.get(str(level).lower(), [])]
+
+    def fees_for(self, course: Course) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Finds the one-time new-student fee band for a course by its level or
+        qualification word (e.g. a "diploma_level_6" key for a level 6 diploma).
+        """
+        name_words = set(course.name.lower().split())
+        for key, fees in self.fees_structure.get("new_student_fees", {}).items():
+            key_words = set(key.lower().replace('_', ' ').split())
+            if (course.level and course.level.lower() in key_words) or (key_words & name_words & set(QUALIFICATION_WORDS)):
+                return key, fees
+        return None
+
+    def _describe_fees(self, course: Course) -> str:
+        lines = []
+        annual = self.fees_structure.get("annual_fees", [])
+        if annual:
+            lines.append("Annual fees (per academic year):")
+            lines.extend(f"  - {item.get('item')}: {_kes(item.get('cost'))} KES" for item in annual)
+        band = self.fees_for(course)
+        if band:
+            key, fees = band
+            lines.append(
+                f"One-time fees for new {key.replace('_', ' ').title()} students: Total {_kes(fees.get('total'))} KES "
+                f"(Registration: {_kes(fees.get('registration'))}, Student ID: {_kes(fees.get('student_id'))}, "
+                f"Student Union: {_kes(fees.get('student_union'))})"
+            )
+        return "\n".join(lines)
+
+    def answer(self, message: str, threshold: float = 0.75) -> Optional[CatalogAnswer]:
+        """
+        Answers "requirements / duration / fees / level of X" directly when the
+        message names one course clearly and asks for at least one attribute.
+        """
+        matches = self.find(message, limit=2)
+        if not matches:
+            return None
+        course, score = matches[0]
+        words = set(tokenize(message))
+        names_level = "level" in words or bool(words & set(QUALIFICATION_WORDS))
+        margin = 0.0 if names_level else AMBIGUITY_MARGIN
+        if score < threshold or (len(matches) > 1 and matches[1][1] >= score - margin):
+            return None
+
+        intents = [intent for intent, keywords in INTENT_KEYWORDS.items() if words & keywords]
+        if not intents:
+            return None
+
+        lines = [f"**{course.name}** ({course.department})"]
+        if "level" in intents or "fees" in intents:
+            lines.append(f"- **Level:** {course.level or 'N/A'}")
+        if "duration" in intents:
+            lines.append(f"- **Duration:** {course.duration or 'Not specified'}")
+        if "requirements" in intents:
+            lines.append(f"- **Minimum requirements:** {course.requirements or 'Not specified'}")
+        if "fees" in intents:
+            fees_text = self._describe_fees(course)
+            if not fees_text:
+                return None
+            lines.append("- **Fees:**")
+            lines.extend(f"  {line}" for line in fees_text.splitlines())
+        return CatalogAnswer("\n".join(lines), course, score)
+
+    def rows_for(self, message: str, min_score: float = 0.5, limit: int = 5) -> List[Course]:
+        """
+        Courses worth injecting into the prompt for a question, best first.
+        """
+        return [course for course, score in self.find(message, limit=limit) if score >= min_score]
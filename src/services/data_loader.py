@@ -1,15 +1,44 @@
 import os
 import json
-from typing import Dict, List, Any
+import logging
+from typing import Any, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATASET_FILE = os.path.join(BASE_DIR, "dataset", "combined_rag_data.jsonl")
 
-def load_and_process_rag_data() -> Dict[str, List[Any]]:
+def _live_records(dataset_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of the dataset in file order, leaving out the lines
+    that a later tombstone ({"op": "removed", "offset": N}, appended by
+    combine_files.py when it updates or deletes a record) supersedes.
+    """
+    records = {}
+    offset = 0
+    with open(dataset_file, 'rb') as f:
+        for line in f:
+            line_offset, offset = offset, offset + len(line)
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning("Skipping malformed line in %s", dataset_file)
+                continue
+            if record.get("op") == "removed" and "offset" in record:
+                records.pop(record["offset"], None)
+            else:
+                records[line_offset] = record
+    yield from records.values()
+
+
+def load_and_process_rag_data(dataset_file: str = DATASET_FILE) -> Dict[str, List[Any]]:
     """
     Loads and processes the combined RAG data from the JSONL file.
 
+    Args:
+        dataset_file: Path of the combined JSONL dataset.
+
     Returns:
         A dictionary with categorized data.
     """
@@ -22,42 +51,31 @@ def load_and_process_rag_data() -> Dict[str, List[Any]]:
         "faqs": []
     }
 
-    if not os.path.exists(DATASET_FILE):
-        print(f"Warning: Data file not found at {DATASET_FILE}. Prompt will be basic.")
+    if not os.path.exists(dataset_file):
+        logger.warning("Data file not found at %s. Prompt will be basic.", dataset_file)
         return categorized_data
 
-    with open(DATASET_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                record = json.loads(line)
-                
-               
-                content_type = record.get("content_type")
-                if content_type == "general_info":
-                    categorized_data["general_info"].append(record)
-                elif content_type == "contact_info":
-                    categorized_data["contact_info"].append(record)
-                elif content_type == "announcement":
-                    categorized_data["announcements"].append(record)
-                elif content_type == "course_info":
-                    categorized_data["courses"].append(record)
-                elif content_type == "department_page_no_courses_itemized":
-                     categorized_data["departments"].append(record)
+    for record in _live_records(dataset_file):
+        content_type = record.get("content_type")
+        if content_type in ("general_info", "general_summary"):
+            categorized_data["general_info"].append(record)
+        elif content_type == "contact_info":
+            categorized_data["contact_info"].append(record)
+        elif content_type == "announcement":
+            categorized_data["announcements"].append(record)
+        elif content_type == "course_info":
+            categorized_data["courses"].append(record)
+        elif content_type in ("department_description", "department_page_no_courses_itemized"):
+            categorized_data["departments"].append(record)
 
-                
-                if "faq_list" in record and isinstance(record["faq_list"], list):
-                    categorized_data["faqs"].extend(record["faq_list"])
-                    
-                elif content_type == "courses_detailed":
-                        categorized_data["courses_detailed"] = record.get("data", [])
-                elif content_type == "fees_structure":
-                        categorized_data["fees_structure"] = record  
+        if "faq_list" in record and isinstance(record["faq_list"], list):
+            categorized_data["faqs"].extend(record["faq_list"])
+
+        elif content_type == "courses_detailed":
+            categorized_data["courses_detailed"] = record.get("data", [])
+        elif content_type == "fees_structure":
+            categorized_data["fees_structure"] = record
 
-            except json.JSONDecodeError:
-                print(f"Warning: Skipping malformed line in {DATASET_FILE}")
-                continue
-    
-    
     unique_faqs = {item['question'].strip(): item for item in categorized_data['faqs']}.values()
     categorized_data['faqs'] = list(unique_faqs)
     
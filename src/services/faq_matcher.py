@@ -0,0 +1,75 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from .response_cache import normalize_message
+from .semantic_cache import NgramVectorizer, anchor_terms
+
+# Scraped FAQ lists are sometimes numbered ("7.\tHow much will I receive...").
+_LEADING_NUMBER_RE = re.compile(r"^\s*\d+[.)]\s*")
+
+
+@dataclass(frozen=True)
+class FaqMatch:
+    question: str
+    answer: str
+    # 1.0 for an exact (normalised) question match, else cosine similarity.
+    confidence: float
+
+
+class FaqMatcher:
+    """
+    Matches user messages against the curated FAQ questions.
+
+    The normalised question text is indexed twice at build time: a dict for
+    exact matches and a matrix of n-gram vectors for near matches, so a lookup
+    is one dict probe plus one matrix-vector product. Like the semantic cache,
+    a near match must also ask about the same things: every anchor term of the
+    message has to appear in the FAQ question, so "is the application for
+    funds mandatory?" does not get the answer about applying for funding.
+    """
+
+    def __init__(self, faqs: List[Dict[str, Any]], vectorizer: NgramVectorizer):
+        self.vectorizer = vectorizer
+        self._faqs: List[Dict[str, str]] = []
+        self._exact: Dict[str, int] = {}
+        self._anchors: List[FrozenSet[str]] = []
+        for faq in faqs:
+            question = _LEADING_NUMBER_RE.sub("", faq.get('question') or "").strip()
+            answer = (faq.get('answer') or "").strip()
+            key = normalize_message(question)
+            if key and answer and key not in self._exact:
+                self._exact[key] = len(self._faqs)
+                self._faqs.append({'question': question, 'answer': answer})
+                self._anchors.append(anchor_terms(question))
+        self._matrix = vectorizer.transform([faq['question'] for faq in self._faqs])
+
+    def __len__(self) -> int:
+        return len(self._faqs)
+
+    def match(self, message: str) -> Optional[FaqMatch]:
+        """
+        Returns the closest FAQ whose question contains every anchor term of
+        the message, or None if there is none.
+        """
+        if not self._faqs:
+            return None
+
+        idx = self._exact.get(normalize_message(message))
+        if idx is not None:
+            return self._to_match(idx, 1.0)
+
+        scores = self._matrix @ self.vectorizer.transform_one(message)
+        anchors = anchor_terms(message)
+        for idx in np.argsort(scores)[::-1]:
+            if scores[idx] <= 0:
+                break
+            if anchors <= self._anchors[idx]:
+                return self._to_match(int(idx), float(scores[idx]))
+        return None
+
+    def _to_match(self, idx: int, confidence: float) -> FaqMatch:
+        faq = self._faqs[idx]
+        return FaqMatch(faq['question'], faq['answer'], confidence)
@@ -0,0 +1,177 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+
+from .chunking import as_parent, chunk_sections, content_id
+from .course_catalog import CourseCatalog
+from .faq_matcher import FaqMatcher
+from .prompt_builder import (
+    FULL_PROMPT_KINDS, GROUP_PRIORITY, build_prompt_documents, compaction_report, count_section_tokens,
+    create_retrieval_prompt, create_system_prompt, fit_documents, format_course_rows, section_group,
+)
+from .response_cache import prompt_version
+from .retrieval import BM25Index, Document
+from .semantic_cache import NgramVectorizer
+from .tokens import estimate_tokens
+
+# Small sections that are always sent, so the bot can point students to the
+# administration even when nothing else matches.
+PINNED_KINDS = ("contact_info",)
+
+
+@dataclass(frozen=True)
+class KnowledgeBase:
+    """
+    Everything derived from the RAG dataset that a chat request needs.
+    """
+    rag_data: Dict[str, List[Any]]
+    system_instruction: str
+    # Content hash of the full and per-section prompt text; part of the cache keys
+    # (the exact-match cache uses context_version when retrieval is enabled).
+    version: str
+    # Content hash of the retrieval prompt's persona header and guidelines.
+    retrieval_prompt_version: str
+    documents: List[Document]
+    pinned: List[Document]
+    # Chunks of every section by section key (see chunking.py); the index is built over these.
+    chunks: Dict[str, List[Document]]
+    # Every section under its section key, sent instead of its chunks when several of them match.
+    parents: Dict[str, Document]
+    index: BM25Index
+    # N-gram vectoriser with IDF fitted on the documents; shared by the FAQ
+    # matcher and the semantic cache.
+    vectorizer: NgramVectorizer
+    faq_matcher: FaqMatcher
+    catalog: CourseCatalog
+    # Estimated tokens of each section and chunk as rendered in the prompt, by doc_id.
+    section_tokens: Dict[str, int]
+    # Persona header and guidelines of the retrieval prompt, without sections.
+    prompt_overhead_tokens: int
+    system_instruction_tokens: int
+    # Token report of the full system prompt, whose sections carry no labels.
+    full_prompt_report: Dict[str, int]
+    # Estimated tokens per section group before and after prompt compaction.
+    compaction: Dict[str, Dict[str, int]]
+
+    def retrieve(self, question: str, top_k: int) -> List[Document]:
+        """
+        Returns the top_k chunks most relevant to the question, followed by the pinned sections.
+
+        When two or more chunks of the same section match, the whole section is
+        sent once in their place. When the question names specific courses,
+        only their catalog rows are sent instead of whole department course
+        tables. Every returned document has a content-derived doc_id.
+        """
+        hits = [doc for doc, _ in self.index.search(question, top_k) if doc.kind not in PINNED_KINDS]
+        hits_per_parent = Counter(doc.parent_id for doc in hits)
+        retrieved = []
+        for doc in hits:
+            if hits_per_parent[doc.parent_id] > 1:
+                doc = self.parents[doc.parent_id]
+                if doc in retrieved:
+                    continue
+            retrieved.append(doc)
+        courses = self.catalog.rows_for(question)
+        if courses:
+            text = format_course_rows(courses)
+            rows = Document(content_id("course_rows", text), "course_rows", "Matching courses", text)
+            retrieved = [rows] + [doc for doc in retrieved if doc.kind != "course_table"]
+        return retrieved + self.pinned
+
+    def context_version(self, documents: List[Document]) -> str:
+        """
+        Hash of the retrieval prompt template and the IDs of the documents
+        retrieved for a question. Unlike version, it only changes when the
+        prompt instructions change or the dataset changes in a way that alters
+        this question's prompt, so caches keyed on it survive unrelated updates.
+        """
+        return prompt_version("\n".join([self.retrieval_prompt_version] + [doc.doc_id for doc in documents]))
+
+    def _token_report(self, documents: List[Document], dropped: int, instructions: int) -> Dict[str, int]:
+        report = {"instructions": instructions, "courses": 0, "fees": 0, "general_info": 0, "faqs": 0}
+        for doc in documents:
+            tokens = self.section_tokens.get(doc.doc_id)
+            report[section_group(doc.kind)] += tokens if tokens is not None else count_section_tokens(doc)
+        report["dropped_sections"] = dropped
+        return report
+
+    def system_prompt_for(self, question: str, top_k: int, max_tokens: Optional[int] = None,
+                          documents: Optional[List[Document]] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Retrieval prompt for the question, cut to max_tokens by dropping or
+        truncating the least relevant sections. Pass the documents when they
+        were already retrieved for the question. Returns the prompt and its
+        estimated tokens per section group.
+        """
+        if documents is None:
+            documents = self.retrieve(question, top_k)
+        dropped = 0
+        if max_tokens is not None:
+            documents, dropped = fit_documents(documents, max_tokens - self.prompt_overhead_tokens, self.section_tokens)
+        return create_retrieval_prompt(documents), self._token_report(documents, dropped, self.prompt_overhead_tokens)
+
+    def full_system_prompt(self, max_tokens: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        The whole knowledge base as one prompt. When it exceeds max_tokens, the
+        sections are kept by group priority (courses, fees, general information,
+        FAQs) until the budget is used up.
+        """
+        if max_tokens is None or self.system_instruction_tokens <= max_tokens:
+            return self.system_instruction, dict(self.full_prompt_report)
+
+        ordered = sorted(self.documents, key=lambda doc: GROUP_PRIORITY.index(section_group(doc.kind)))
+        documents, dropped = fit_documents(ordered, max_tokens - self.prompt_overhead_tokens, self.section_tokens)
+        return create_retrieval_prompt(documents), self._token_report(documents, dropped, self.prompt_overhead_tokens)
+
+
+def _full_prompt_report(documents: List[Document], system_instruction_tokens: int) -> Dict[str, int]:
+    report = {"instructions": 0, "courses": 0, "fees": 0, "general_info": 0, "faqs": 0}
+    for doc in documents:
+        if doc.kind in FULL_PROMPT_KINDS:
+            report[section_group(doc.kind)] += estimate_tokens(doc.text)
+    report["instructions"] = max(0, system_instruction_tokens - sum(report.values()))
+    report["dropped_sections"] = 0
+    return report
+
+
+def _unique(documents: Iterable[Document]) -> List[Document]:
+    # Identical chunks of different sections are indexed once.
+    seen: Dict[str, Document] = {}
+    for doc in documents:
+        seen.setdefault(doc.doc_id, doc)
+    return list(seen.values())
+
+
+def build_knowledge_base(rag_data: Dict[str, List[Any]], previous: Optional[KnowledgeBase] = None) -> KnowledgeBase:
+    """
+    Builds the knowledge base from the processed RAG data. Given the previous
+    knowledge base, only the sections that changed since are chunked again.
+    """
+    documents = build_prompt_documents(rag_data)
+    system_instruction = create_system_prompt(rag_data)
+    system_instruction_tokens = estimate_tokens(system_instruction)
+    vectorizer = NgramVectorizer().fit(f"{doc.title} {doc.text}" for doc in documents)
+    chunks = chunk_sections(documents, previous.chunks if previous is not None else None)
+    parents = {section.doc_id: section for section in map(as_parent, documents)}
+    retrievable = _unique(chunk for section_chunks in chunks.values() for chunk in section_chunks)
+    empty_retrieval_prompt = create_retrieval_prompt([])
+    return KnowledgeBase(
+        rag_data=rag_data,
+        system_instruction=system_instruction,
+        version=prompt_version("\n".join([system_instruction] + [doc.text for doc in documents])),
+        retrieval_prompt_version=prompt_version(empty_retrieval_prompt),
+        documents=documents,
+        pinned=[doc for doc in parents.values() if doc.kind in PINNED_KINDS],
+        chunks=chunks,
+        parents=parents,
+        index=BM25Index(retrievable),
+        vectorizer=vectorizer,
+        faq_matcher=FaqMatcher(rag_data.get("faqs", []), vectorizer),
+        catalog=CourseCatalog(rag_data.get("courses_detailed", []), rag_data.get("fees_structure")),
+        section_tokens={doc.doc_id: count_section_tokens(doc)
+                        for doc in documents + list(parents.values()) + retrievable},
+        prompt_overhead_tokens=estimate_tokens(empty_retrieval_prompt),
+        system_instruction_tokens=system_instruction_tokens,
+        full_prompt_report=_full_prompt_report(documents, system_instruction_tokens),
+        compaction=compaction_report(rag_data, documents, system_instruction),
+    )
@@ -0,0 +1,166 @@
+"""
+Precompiled knowledge bundle.
+
+Compiles the combined JSONL dataset into one binary artifact holding the
+categorised records, the rendered prompt sections and every search index
+(the whole KnowledgeBase), so a server start is a single file read instead
+of re-parsing the dataset and rebuilding the indexes.
+
+The file starts with a one-line text header, followed by a pickle payload:
+
+    RVNPKB <format version> <content hash>\\n<pickle bytes>
+
+The content hash covers the dataset bytes and the source of the modules that
+build the KnowledgeBase, so editing either makes the bundle stale. A stale,
+missing or unreadable bundle is never fatal: the loader falls back to
+building from the JSONL file and rewrites the bundle.
+
+Bundles are trusted local build artifacts (they are unpickled); never load
+one from an untrusted source.
+
+Usage:
+    python -m src.services.knowledge_bundle [--dataset PATH] [--output PATH]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+from typing import Optional, Tuple
+
+from . import (chunking, course_catalog, data_loader, faq_matcher, knowledge, prompt_builder, response_cache, retrieval,
+               semantic_cache, tokens)
+from .data_loader import DATASET_FILE, load_and_process_rag_data
+from .knowledge import KnowledgeBase, build_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"RVNPKB"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILE = os.path.join(os.path.dirname(DATASET_FILE), "knowledge.bundle")
+
+# Modules whose code shapes the pickled KnowledgeBase.
+_BUILDER_MODULES = (data_loader, prompt_builder, tokens, chunking, retrieval, semantic_cache, response_cache, faq_matcher,
+                    course_catalog, knowledge)
+
+
+def content_hash(dataset_file: str = DATASET_FILE) -> str:
+    """
+    Hash of the dataset bytes plus the builder source code.
+    """
+    digest = hashlib.sha256()
+    for module in _BUILDER_MODULES:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    if os.path.exists(dataset_file):
+        with open(dataset_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _header(source_hash: str) -> bytes:
+    return BUNDLE_MAGIC + f" {BUNDLE_FORMAT_VERSION} {source_hash}\n".encode("ascii")
+
+
+def write_bundle(kb: KnowledgeBase, source_hash: str, bundle_file: str = BUNDLE_FILE) -> None:
+    """
+    Writes the bundle atomically (temp file + rename), so readers never see a partial file.
+    """
+    directory = os.path.dirname(bundle_file) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".knowledge-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_header(source_hash))
+            pickle.dump(kb, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, bundle_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_bundle(bundle_file: str = BUNDLE_FILE, expected_hash: Optional[str] = None) -> Optional[KnowledgeBase]:
+    """
+    Loads a bundle with a single read. Returns None when the file is missing,
+    was written by another format version, does not match expected_hash, or
+    cannot be unpickled.
+    """
+    try:
+        with open(bundle_file, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+
+    header_end = raw.find(b"\n")
+    parts = raw[:header_end].split(b" ") if header_end > 0 else []
+    if len(parts) != 3 or parts[0] != BUNDLE_MAGIC or parts[1] != str(BUNDLE_FORMAT_VERSION).encode("ascii"):
+        logger.warning("Ignoring knowledge bundle %s: unrecognised header.", bundle_file)
+        return None
+    if expected_hash is not None and parts[2].decode("ascii") != expected_hash:
+        logger.info("Knowledge bundle %s is stale.", bundle_file)
+        return None
+
+    try:
+        kb = pickle.loads(memoryview(raw)[header_end + 1:])
+    except Exception:
+        logger.warning("Ignoring unreadable knowledge bundle %s.", bundle_file, exc_info=True)
+        return None
+    return kb if isinstance(kb, KnowledgeBase) else None
+
+
+def compile_bundle(dataset_file: str = DATASET_FILE, bundle_file: str = BUNDLE_FILE) -> Tuple[KnowledgeBase, str]:
+    """
+    Builds the KnowledgeBase from the JSONL dataset and writes it as a bundle.
+    """
+    source_hash = content_hash(dataset_file)
+    kb = build_knowledge_base(load_and_process_rag_data(dataset_file))
+    write_bundle(kb, source_hash, bundle_file)
+    return kb, source_hash
+
+
+def load_knowledge_base(dataset_file: str = DATASET_FILE, bundle_file: str = BUNDLE_FILE,
+                        previous: Optional[KnowledgeBase] = None) -> KnowledgeBase:
+    """
+    Returns the KnowledgeBase from an up-to-date bundle, or rebuilds it from
+    the dataset (refreshing the bundle when the directory is writable). A
+    rebuild reuses the chunks of the sections unchanged since previous.
+    """
+    source_hash = content_hash(dataset_file)
+    kb = read_bundle(bundle_file, expected_hash=source_hash)
+    if kb is not None:
+        return kb
+
+    kb = build_knowledge_base(load_and_process_rag_data(dataset_file), previous)
+    try:
+        write_bundle(kb, source_hash, bundle_file)
+    except OSError:
+        logger.warning("Could not write knowledge bundle %s; continuing without it.", bundle_file, exc_info=True)
+    return kb
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile the RAG dataset into a knowledge bundle.")
+    parser.add_argument("--dataset", default=DATASET_FILE, help="combined JSONL dataset")
+    parser.add_argument("--output", default=BUNDLE_FILE, help="bundle file to write")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    kb, source_hash = compile_bundle(args.dataset, args.output)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(args.output)
+    print(f"Wrote {args.output} ({size / 1024:.1f} KiB, {len(kb.documents)} sections, "
+          f"{sum(map(len, kb.chunks.values()))} chunks, hash {source_hash[:12]}) in {elapsed * 1000:.0f} ms")
+    _, report = kb.full_system_prompt()
+    print(f"Full system prompt: ~{kb.system_instruction_tokens} tokens "
+          f"({', '.join(f'{group}={tokens}' for group, tokens in report.items() if group != 'dropped_sections')})")
+    print("Compaction (estimated tokens before -> after):")
+    for group, counts in kb.compaction.items():
+        saved = 1 - counts["after"] / counts["before"] if counts["before"] else 0.0
+        print(f"  {group:<12} {counts['before']:>7} -> {counts['after']:>7}  (-{saved:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from .data_loader import DATASET_FILE
+from .knowledge import KnowledgeBase
+from .knowledge_bundle import BUNDLE_FILE, load_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class KnowledgeStore:
+    """
+    Holds the active KnowledgeBase and replaces it without restarting the worker.
+
+    Rebuilds run in a worker thread, off the event loop. The new KnowledgeBase
+    is swapped in with a single reference assignment only after it has been
+    built successfully, so in-flight requests keep the snapshot they started
+    with and a failed rebuild leaves the current one serving traffic.
+    """
+
+    def __init__(self, knowledge: KnowledgeBase, dataset_file: str = DATASET_FILE, bundle_file: str = BUNDLE_FILE):
+        self.current = knowledge
+        self.dataset_file = dataset_file
+        self.bundle_file = bundle_file
+        self.loaded_at = time.time()
+        self.last_reload_seconds: Optional[float] = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self._dataset_mtime = _mtime(dataset_file)
+        self._lock = asyncio.Lock()
+
+    async def reload(self) -> bool:
+        """
+        Rebuilds the knowledge base from the dataset and swaps it in.
+
+        Returns True if a new version is now active, False if the data was
+        unchanged or the rebuild failed.
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            # Recorded up front so a broken dataset is retried on its next change,
+            # not on every watcher tick.
+            self._dataset_mtime = _mtime(self.dataset_file)
+            try:
+                knowledge = await asyncio.to_thread(load_knowledge_base, self.dataset_file, self.bundle_file,
+                                                   self.current)
+                if not knowledge.documents and self.current.documents:
+                    raise ValueError(f"{self.dataset_file} produced an empty knowledge base")
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("Knowledge base reload failed; keeping version %s.", self.current.version)
+                return False
+
+            self.last_reload_seconds = time.perf_counter() - started
+            self.last_error = None
+            if knowledge.version == self.current.version:
+                return False
+
+            previous = self.current.version
+            self.current = knowledge
+            self.loaded_at = time.time()
+            self.reloads += 1
+            logger.info("Knowledge base reloaded: %s -> %s in %.3fs.", previous, knowledge.version, self.last_reload_seconds)
+            return True
+
+    async def watch(self, interval: float) -> None:
+        """
+        Polls the dataset file's modification time and reloads when it changes.
+        Meant to run as a background task for the lifetime of the app.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if _mtime(self.dataset_file) != self._dataset_mtime:
+                await self.reload()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.current.version,
+            "sections": len(self.current.documents),
+            "chunks": sum(map(len, self.current.chunks.values())),
+            "loaded_at": self.loaded_at,
+            "last_reload_seconds": self.last_reload_seconds,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "compaction": self.current.compaction,
+        }
@@ -0,0 +1,107 @@
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from .config import LLMSettings, RoutingSettings
+from .metrics import ChatMetrics
+from .providers import ProviderRouter
+from .rate_limiter import RateLimitExceeded, UpstreamLimiter, retry_after_seconds
+from .tokens import estimate_message_tokens, estimate_tokens
+
+
+class LLMClient:
+    """
+    Async wrapper around the OpenAI-compatible chat completions API.
+
+    A single instance is shared by the whole worker: it owns one pooled,
+    keep-alive HTTP client, the admission control (provider quotas, a cap
+    on completions in flight and a bounded wait queue) and the router that
+    spreads calls over the configured backends, so a slow upstream never
+    blocks the event loop. Calls that are shed, or that the provider answers
+    with 429 after retries, raise RateLimitExceeded.
+    """
+
+    def __init__(self, settings: LLMSettings, metrics: Optional[ChatMetrics] = None,
+                 routing: RoutingSettings = RoutingSettings()):
+        self.settings = settings
+        self.metrics = metrics if metrics is not None else ChatMetrics()
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+        )
+        # Imported here: the openai package takes most of a second to import,
+        # and nothing needs it until the lifespan creates the client.
+        from openai import RateLimitError
+        self._rate_limit_error = RateLimitError
+        self.router = ProviderRouter(settings, routing, self._http_client, self.metrics)
+        self.limiter = UpstreamLimiter(settings, self.metrics)
+
+    def _estimated_tokens(self, messages: List[Dict[str, str]]) -> int:
+        # Providers count the completion against the quota too; reserve its upper bound.
+        return estimate_message_tokens(messages) + self.settings.max_tokens
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Sends the messages to the model and returns the generated text.
+        """
+        metrics = self.metrics
+        async with self.limiter.admit(self._estimated_tokens(messages)) as admission:
+            metrics.upstream_in_flight.inc()
+            started = time.perf_counter()
+            try:
+                response, _ = await self.router.complete(messages)
+            except self._rate_limit_error as e:
+                raise RateLimitExceeded(retry_after_seconds(e), "upstream") from e
+            finally:
+                metrics.upstream_in_flight.dec()
+                metrics.upstream_seconds.labels("complete").observe(time.perf_counter() - started)
+
+            text = response.choices[0].message.content
+            usage = response.usage
+            if usage is not None:
+                prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            else:
+                prompt_tokens, completion_tokens = estimate_message_tokens(messages), estimate_tokens(text or "")
+            metrics.prompt_tokens.inc(prompt_tokens)
+            metrics.completion_tokens.inc(completion_tokens)
+            admission.settle(prompt_tokens + completion_tokens)
+        return text
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Sends the messages to the model and yields text deltas as they are generated.
+
+        The concurrency slot is held until the stream is exhausted or closed.
+        Token counts of streamed calls are estimated.
+        """
+        metrics = self.metrics
+        async with self.limiter.admit(self._estimated_tokens(messages)) as admission:
+            metrics.upstream_in_flight.inc()
+            started = time.perf_counter()
+            parts = []
+            try:
+                try:
+                    async for delta in self.router.stream(messages):
+                        if not parts:
+                            metrics.first_token_seconds.observe(time.perf_counter() - started)
+                        parts.append(delta)
+                        yield delta
+                except self._rate_limit_error as e:
+                    raise RateLimitExceeded(retry_after_seconds(e), "upstream") from e
+            finally:
+                metrics.upstream_in_flight.dec()
+                metrics.upstream_seconds.labels("stream").observe(time.perf_counter() - started)
+                if parts:
+                    prompt_tokens = estimate_message_tokens(messages)
+                    completion_tokens = estimate_tokens("".join(parts))
+                    metrics.prompt_tokens.inc(prompt_tokens)
+                    metrics.completion_tokens.inc(completion_tokens)
+                    admission.settle(prompt_tokens + completion_tokens)
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
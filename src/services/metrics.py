@@ -0,0 +1,258 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans local answers (sub-millisecond) to slow upstream completions.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    @abstractmethod
+    def _new_child(self):
+        """
+        A new time series of this metric, for one combination of label values.
+        """
+
+    def labels(self, *values: str):
+        """
+        Returns the time series for these label values. Bind it once and keep
+        it on hot paths to skip the lookup.
+        """
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, values)} {_number(child.value)}"
+                for values, child in self._children.items()]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeValue:
+        return _GaugeValue()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(child.sum)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus text-format registry.
+
+    Recording is a plain attribute update on the event loop thread (no locks,
+    no formatting); all the formatting happens when /metrics is scraped.
+    Component statistics that are already counted elsewhere (cache hit
+    counters, session counts) are read through stats sources at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats_sources: List[Tuple[str, Callable[[], Dict[str, Any]], Tuple[str, ...], Tuple[str, ...]]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def add_stats_source(self, prefix: str, stats: Callable[[], Dict[str, Any]],
+                         counters: Iterable[str] = (), gauges: Iterable[str] = ()) -> None:
+        """
+        Exports numeric fields of a component's stats() dict, e.g. the "hits"
+        field of prefix "response_cache" as response_cache_hits_total.
+        """
+        self._stats_sources.append((prefix, stats, tuple(counters), tuple(gauges)))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats, counters, gauges in self._stats_sources:
+            values = stats()
+            for field in counters:
+                name = f"{prefix}_{field}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {_number(values.get(field) or 0)}"]
+            for field in gauges:
+                name = f"{prefix}_{field}"
+                lines += [f"# TYPE {name} gauge", f"{name} {_number(values.get(field) or 0)}"]
+        return "\n".join(lines) + "\n"
+
+
+class ChatMetrics:
+    """
+    The metrics recorded by the chat pipeline and the model client.
+
+    Frequently used label combinations are bound once here, so recording on
+    the request path is a few attribute updates.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        r = self.registry = registry if registry is not None else MetricsRegistry()
+
+        self.request_seconds = r.histogram(
+            "chat_request_duration_seconds", "Total time to answer a chat request.", ("endpoint",))
+        self.requests_in_flight = r.gauge(
+            "chat_requests_in_flight", "Chat requests currently being answered.", ("endpoint",))
+        self.errors = r.counter("chat_errors_total", "Chat requests that failed.", ("endpoint",))
+        self.replies = r.counter("chat_replies_total", "Answers by source (faq, catalog, cache, model).", ("source",))
+
+        self.stage_seconds = r.histogram(
+            "chat_stage_duration_seconds", "Time spent in each stage of a chat request.", ("stage",))
+        self.lookup_seconds = self.stage_seconds.labels("lookup")
+        self.prompt_seconds = self.stage_seconds.labels("prompt")
+
+        self.upstream_seconds = r.histogram(
+            "llm_upstream_duration_seconds", "Time of one upstream model call, until the last token.", ("mode",))
+        self.first_token_seconds = r.histogram(
+            "llm_time_to_first_token_seconds", "Time until the first streamed token arrives.").labels()
+        self.upstream_responses = r.counter(
+            "llm_upstream_responses_total", "Upstream model calls by backend and HTTP status (or timeout/error).",
+            ("backend", "status"))
+        self.backend_seconds = r.histogram(
+            "llm_backend_latency_seconds",
+            "Successful calls per backend, until the answer (completions) or the first token (streams).", ("backend",))
+        self.circuit_open = r.gauge("llm_circuit_open", "1 while a backend's circuit breaker is open.", ("backend",))
+        self.hedged_calls = r.counter(
+            "llm_hedged_requests_total", "Calls hedged on a second backend after the first exceeded its p95.",
+            ("backend",))
+        self.retries = r.counter("llm_retries_total", "Upstream calls retried after a retryable failure.").labels()
+        self.upstream_in_flight = r.gauge(
+            "llm_requests_in_flight", "Upstream model calls currently open.").labels()
+        self.upstream_queue_depth = r.gauge(
+            "llm_queue_depth", "Upstream model calls waiting for a rate-limit quota or a concurrency slot.").labels()
+        self.upstream_queue_seconds = r.histogram(
+            "llm_queue_wait_seconds", "Time an upstream model call waited before it was started or rejected.").labels()
+        self.upstream_shed = r.counter(
+            "llm_shed_total", "Upstream model calls rejected by admission control (queue_full, quota, timeout).",
+            ("reason",))
+        self.prompt_tokens = r.counter(
+            "llm_prompt_tokens_total", "Prompt tokens sent upstream (estimated for streamed calls).").labels()
+        self.completion_tokens = r.counter(
+            "llm_completion_tokens_total", "Completion tokens received (estimated for streamed calls).").labels()
+
+    def track(self, endpoint: str) -> "_RequestTimer":
+        """
+        Context manager counting one request of endpoint as in flight and
+        recording its total duration.
+        """
+        return _RequestTimer(self.requests_in_flight.labels(endpoint), self.request_seconds.labels(endpoint))
+
+
+class _RequestTimer:
+    __slots__ = ("in_flight", "duration", "started")
+
+    def __init__(self, in_flight: _GaugeValue, duration: _HistogramValue):
+        self.in_flight = in_flight
+        self.duration = duration
+
+    def __enter__(self) -> "_RequestTimer":
+        self.in_flight.inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.duration.observe(time.perf_counter() - self.started)
+        self.in_flight.dec()
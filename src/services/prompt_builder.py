@@ -1,65 +1,316 @@
+import re
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
 
-from typing import Dict, List, Any
+from .course_catalog import Course
+from .response_cache import normalize_message
+from .retrieval import Document
+from .tokens import estimate_tokens
 
-def create_system_prompt(rag_data: Dict[str, List[Any]]) -> str:
+PERSONA_HEADER = """
+You are "RNVP Bot," a professional and friendly Student Assistant for the Rift Valley National Polytechnic (RVNP). Your role is to provide accurate and clear information to prospective and current students.
+
+# Your Persona:
+- You are helpful, patient, and precise.
+- You MUST act like a human representative. NEVER mention that you are an AI or refer to the text below as "provided information" or "knowledge base."
+- Answer questions directly and conversationally. Use formatting like bullet points or bold text to improve readability.
+"""
+
+RETRIEVAL_GUIDELINES = """
+# How to Respond:
+1.  **Use the Reference Data:** Answer from the "REFERENCE DATA" above. Sections marked as official documents (course list, fee structure) are the most accurate source for courses and fees.
+2.  **Synthesize, Don't Just Copy:** Combine information logically, e.g. find a course's level in the course list and then the matching fee in the fee structure.
+3.  **Handle Unavailable Information:** If the answer is not in the reference data, politely say you don't have that specific detail and advise contacting the administration using the official contact information.
+4.  **External Knowledge:** If asked about a general Kenyan topic not covered here (e.g., "What is NTSA?"), use your general knowledge to provide a helpful, high-level summary.
+"""
+
+# Label shown above each retrieved section, keyed on Document.kind.
+SECTION_LABELS = {
+    "course_table": "RVNP - Detailed Course List and Requirements (official document)",
+    "course_rows": "RVNP - Courses Matching the Question (official document)",
+    "fees": "RVNP - Fee Structure (official document)",
+    "general_info": "General Information (from website)",
+    "contact_info": "Contacts (from website)",
+    "announcement": "Announcement (from website)",
+    "course": "Course (from website)",
+    "department": "Department (from website)",
+    "faq": "Frequently Asked Question about Higher Education Funding (from website)",
+}
+
+# Token accounting group of each Document.kind; every other kind counts as general_info.
+SECTION_GROUPS = {
+    "course_table": "courses",
+    "course_rows": "courses",
+    "fees": "fees",
+    "faq": "faqs",
+}
+# Groups in the order they are kept when the whole knowledge base must be cut to a budget.
+GROUP_PRIORITY = ("courses", "fees", "general_info", "faqs")
+
+# Below this many tokens of remaining budget a section is not worth truncating.
+MIN_TRUNCATED_SECTION_TOKENS = 48
+
+# A record is a near-duplicate of another when every one of its words and at
+# least this share of its word trigrams occur in the other, so merging them
+# loses no facts.
+NEAR_DUPLICATE_CONTAINMENT = 0.9
+# Website record lists that are deduplicated, each one within itself (a short
+# contact record repeated in a general_info page must stay a contact).
+RECORD_KEYS = ("general_info", "contact_info", "announcements", "courses", "departments")
+# Table cells that carry no information.
+EMPTY_CELLS = ("", "N/A", "None")
+
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_LIST_NUMBER_RE = re.compile(r"^\d+ ")
+
+
+def section_group(kind: str) -> str:
+    return SECTION_GROUPS.get(kind, "general_info")
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces, strips every line and keeps at most one blank line in a row.
+    """
+    text = str(text)
+    if "\n" not in text:
+        return " ".join(text.split())
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _merge_near_duplicates(items: List[Dict[str, Any]], text: Callable[[Dict[str, Any]], str],
+                           merge: Callable[[Dict[str, Any], Dict[str, Any]], None]) -> List[Dict[str, Any]]:
+    """
+    Drops every item whose text is a near-duplicate of a longer kept item,
+    after merge(kept, dropped) has folded the dropped item's labels into it.
+    Candidates come from an inverted word index (only kept items containing
+    the item's rarest word), so this stays close to linear on large datasets.
+    Kept items stay in their original order.
+    """
+    order = sorted(range(len(items)), key=lambda i: -len(text(items[i])))
+    word_sets: Dict[int, Set[str]] = {}
+    trigrams_of: Dict[int, Set[Tuple[str, ...]]] = {}
+    postings: Dict[str, List[int]] = {}
+    sizes: Dict[str, int] = {}
+    dropped: Set[int] = set()
+    for i in order:
+        words = normalize_message(text(items[i])).split()
+        if not words:
+            continue
+        unique = set(words)
+        grams = list(zip(words, words[1:], words[2:]))
+        # A word no kept item contains rules out every candidate.
+        candidates = postings[min(unique, key=sizes.__getitem__)] if unique <= sizes.keys() else ()
+        for j in candidates:
+            if unique <= word_sets[j] and (
+                    not grams or sum(gram in trigrams_of[j] for gram in grams) >= NEAR_DUPLICATE_CONTAINMENT * len(grams)):
+                merge(items[j], items[i])
+                dropped.add(i)
+                break
+        if i in dropped:
+            continue
+        word_sets[i] = unique
+        trigrams_of[i] = set(grams)
+        for word in unique:
+            postings.setdefault(word, []).append(i)
+            sizes[word] = len(postings[word])
+    return [item for i, item in enumerate(items) if i not in dropped]
+
+
+def _question_key(question: str) -> str:
+    # Ignores list numbering, so "1. What is MTI?" and "What is MTI?" are one question.
+    return _LIST_NUMBER_RE.sub("", normalize_message(question))
+
+
+def _merge_labels(kept: Dict[str, Any], dropped: Dict[str, Any]) -> None:
+    labels = kept['labels']
+    for key, label in dropped['labels'].items():
+        if key not in labels or len(label) < len(labels[key]):
+            labels[key] = label
+
+
+def compact_rag_data(rag_data: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Prompt-side copy of the RAG data with whitespace normalised and
+    near-duplicate records merged: a website record repeated inside another
+    of the same list (e.g. the institution name inside the page title) is
+    dropped and its title joined to the other's, and FAQs with the same answer are rendered
+    once with all their distinct questions. The input is not modified.
+    """
+    compacted = dict(rag_data)
+    for key in RECORD_KEYS:
+        if key not in rag_data:
+            continue
+        records = []
+        for item in rag_data[key]:
+            title = normalize_whitespace(item.get('title', ''))
+            records.append({'item': item, 'text': normalize_whitespace(item.get('text_content', '')),
+                            'labels': {title: title} if title else {}})
+        compacted[key] = [{**record['item'], 'title': " / ".join(record['labels'].values()),
+                           'text_content': record['text']}
+                          for record in _merge_near_duplicates(records, lambda record: record['text'], _merge_labels)]
+
+    faqs = []
+    for faq in rag_data.get("faqs", []):
+        question = normalize_whitespace(faq.get('question', ''))
+        faqs.append({'answer': normalize_whitespace(faq.get('answer', '')), 'labels': {_question_key(question): question}})
+    compacted["faqs"] = [{'question': " / ".join(faq['labels'].values()), 'answer': faq['answer']}
+                         for faq in _merge_near_duplicates(faqs, lambda faq: faq['answer'], _merge_labels)]
+
+    if rag_data.get("courses_detailed"):
+        compacted["courses_detailed"] = [
+            {**dept, 'courses': [{key: normalize_whitespace(value) if isinstance(value, str) else value
+                                  for key, value in course.items()} for course in dept.get('courses', [])]}
+            for dept in rag_data["courses_detailed"]
+        ]
+    return compacted
+
+
+def _format_info_item(item: Dict[str, Any]) -> str:
+    return f"- {item.get('title', '')}: {item.get('text_content', '')}"
+
+
+def _dense_table(header: List[str], rows: List[List[Any]], shared_label: str) -> List[str]:
+    """
+    Pipe-separated table without the markdown border and separator row.
+    Columns that are empty (or N/A) in every row are left out, and a column
+    with the same value in every row is stated once above the table.
+    """
+    cells = [[str(value).strip() if value is not None else "" for value in row] for row in rows]
+    columns = []
+    shared = []
+    for c, name in enumerate(header):
+        values = {row[c] for row in cells}
+        if values <= set(EMPTY_CELLS):
+            continue
+        if len(cells) > 1 and len(values) == 1:
+            shared.append(f"{name}: {values.pop()}")
+            continue
+        columns.append(c)
+    lines = [f"{shared_label}: " + "; ".join(shared)] if shared else []
+    lines.append(" | ".join(header[c] for c in columns))
+    for row in cells:
+        lines.append(" | ".join(row[c] if row[c] not in EMPTY_CELLS else "-" for c in columns))
+    return lines
+
+
+def _format_course_table(dept_data: Dict[str, Any], compact: bool = True) -> List[str]:
+    dept_name = dept_data.get('department', 'Unknown Department')
+    parts = [f"\n### {dept_name}\n"]
+    courses = dept_data.get('courses', [])
+    if compact:
+        rows = [[c.get('curricula', ''), c.get('level'), c.get('duration', ''), c.get('requirements', '')]
+                for c in courses]
+        return parts + _dense_table(["Course Name", "Level", "Duration", "Requirements"], rows, "All courses")
+    parts.append("| Course Name | Level | Duration | Requirements |")
+    parts.append("|---|---|---|---|")
+    for course in courses:
+        level = course.get('level') if course.get('level') is not None else 'N/A'
+        parts.append(f"| {course.get('curricula', '')} | {level} | {course.get('duration', '')} | {course.get('requirements', '')} |")
+    return parts
+
+
+def format_course_rows(courses: List[Course]) -> str:
+    rows = [[course.name, course.department, course.level, course.duration, course.requirements] for course in courses]
+    return "\n".join(_dense_table(["Course Name", "Department", "Level", "Duration", "Requirements"], rows,
+                                  "All matching courses"))
+
+
+def _money(value: Any) -> str:
+    if value is None:
+        return "N/A"
+    value = float(value)
+    return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+
+
+def _format_fees(fees_data: Dict[str, Any], compact: bool = True) -> List[str]:
+    if not compact:
+        return _format_fees_verbose(fees_data)
+    fee_parts = [f"### {fees_data.get('title', 'Fee Structure')}"]
+
+    fee_parts.append("Annual fees per academic year (KES):")
+    for item in fees_data.get("annual_fees", []):
+        fee_parts.append(f"- {item.get('item')}: {_money(item.get('cost'))}")
+
+    fee_parts.append("One-time fees for new students (KES):")
+    for level, fees in fees_data.get("new_student_fees", {}).items():
+        fee_parts.append(f"- {level.replace('_', ' ').title()}: total {_money(fees.get('total'))} (registration "
+                         f"{_money(fees.get('registration'))}, student ID {_money(fees.get('student_id'))}, "
+                         f"student union {_money(fees.get('student_union'))})")
+
+    fee_parts.append("Notes on fees:")
+    for note in fees_data.get("payment_instructions", []):
+        fee_parts.append(f"- {normalize_whitespace(note)}")
+    return fee_parts
+
+
+def _money_verbose(value: Any) -> str:
+    return f"{float(value):,.2f}" if value is not None else "N/A"
+
+
+def _format_fees_verbose(fees_data: Dict[str, Any]) -> List[str]:
+    fee_parts = [f"### {fees_data.get('title', 'Fee Structure')}\n"]
+
+    fee_parts.append("**Annual Fees (Per Academic Year):**")
+    for item in fees_data.get("annual_fees", []):
+        fee_parts.append(f"- {item.get('item')}: {_money_verbose(item.get('cost'))} KES")
+
+    fee_parts.append("\n**One-Time Fees for New Students:**")
+    for level, fees in fees_data.get("new_student_fees", {}).items():
+        fee_parts.append(f"- **For {level.replace('_', ' ').title()}:** Total {_money_verbose(fees.get('total'))} KES (Registration: {_money_verbose(fees.get('registration'))}, Student ID: {_money_verbose(fees.get('student_id'))}, Student Union: {_money_verbose(fees.get('student_union'))})")
+
+    fee_parts.append("\n**Important Notes on Fees:**")
+    for note in fees_data.get("payment_instructions", []):
+        fee_parts.append(f"- {note}")
+    return fee_parts
+
+
+def _format_faq(faq: Dict[str, Any]) -> str:
+    return f"Q: {faq.get('question', '')}\nA: {faq.get('answer', '')}"
+
+
+# Document kinds rendered in the full system prompt (website course and
+# department pages are only reachable through retrieval).
+FULL_PROMPT_KINDS = ("general_info", "contact_info", "announcement", "course_table", "fees", "faq")
+
+
+def create_system_prompt(rag_data: Dict[str, List[Any]], compact: bool = True) -> str:
     """
     Builds a dynamic and highly detailed system prompt using all available RAG data.
+
+    With compact=True (the default) the data goes through compact_rag_data and
+    tables use the dense encoding; compact=False renders the original format,
+    for measuring the reduction.
     """
-    
-   
+    if compact:
+        rag_data = compact_rag_data(rag_data)
 
     # General Info, Contacts, Announcement
     info_pieces = []
     for item in rag_data.get("general_info", []) + rag_data.get("contact_info", []) + rag_data.get("announcements", []):
-        info_pieces.append(f"- {item.get('title', '')}: {item.get('text_content', '')}")
+        info_pieces.append(_format_info_item(item))
     general_info_str = "\n".join(info_pieces) if info_pieces else "No general information available."
 
     # course data
     detailed_course_parts = []
     for dept_data in rag_data.get("courses_detailed", []):
-        dept_name = dept_data.get('department', 'Unknown Department')
-        detailed_course_parts.append(f"\n### {dept_name}\n")
-        detailed_course_parts.append("| Course Name | Level | Duration | Requirements |")
-        detailed_course_parts.append("|---|---|---|---|")
-        for course in dept_data.get('courses', []):
-            level = course.get('level') if course.get('level') is not None else 'N/A'
-            detailed_course_parts.append(f"| {course.get('curricula', '')} | {level} | {course.get('duration', '')} | {course.get('requirements', '')} |")
+        detailed_course_parts.extend(_format_course_table(dept_data, compact))
     detailed_courses_str = "\n".join(detailed_course_parts) if detailed_course_parts else "No detailed course list available."
 
    # fee data
     fees_data = rag_data.get("fees_structure")
-    fee_parts = []
-    if fees_data:
-        fee_parts.append(f"### {fees_data.get('title', 'Fee Structure')}\n")
-        
-        fee_parts.append("**Annual Fees (Per Academic Year):**")
-        for item in fees_data.get("annual_fees", []):
-            fee_parts.append(f"- {item.get('item')}: {item.get('cost'):,.2f} KES")
-        
-        fee_parts.append("\n**One-Time Fees for New Students:**")
-        for level, fees in fees_data.get("new_student_fees", {}).items():
-            fee_parts.append(f"- **For {level.replace('_', ' ').title()}:** Total {fees.get('total'):,.2f} KES (Registration: {fees.get('registration'):,.2f}, Student ID: {fees.get('student_id'):,.2f}, Student Union: {fees.get('student_union'):,.2f})")
-
-        fee_parts.append("\n**Important Notes on Fees:**")
-        for note in fees_data.get("payment_instructions", []):
-            fee_parts.append(f"- {note}")
+    fee_parts = _format_fees(fees_data, compact) if fees_data else []
     fees_str = "\n".join(fee_parts) if fee_parts else "No detailed fee structure available."
 
-    # FAQs 
+    # FAQs
     faqs_str_parts = []
     for faq in rag_data.get("faqs", []):
-        faqs_str_parts.append(f"Q: {faq.get('question', '')}\nA: {faq.get('answer', '')}")
+        faqs_str_parts.append(_format_faq(faq))
     faqs_str = "\n\n".join(faqs_str_parts) if faqs_str_parts else "No frequently asked questions available."
 
 
-    system_prompt = f"""
-You are "RNVP Bot," a professional and friendly Student Assistant for the Rift Valley National Polytechnic (RVNP). Your role is to provide accurate and clear information to prospective and current students.
-
-# Your Persona:
-- You are helpful, patient, and precise.
-- You MUST act like a human representative. NEVER mention that you are an AI or refer to the text below as "provided information" or "knowledge base."
-- Answer questions directly and conversationally. Use formatting like bullet points or bold text to improve readability.
-
+    system_prompt = f"""{PERSONA_HEADER}
 # Core Knowledge:
 You have access to official documents. Prioritize information from these sections for the highest accuracy.
 
@@ -93,4 +344,138 @@ This is the primary source for all fee-related questions.
 4.  **Handle Unavailable Information:** If a user asks for something not in any of the sections (e.g., specific exam timetables, hostel room availability), politely state that you don't have that specific detail and advise them to contact the administration directly using the official contact information.
 5.  **External Knowledge:** If asked about a general Kenyan topic not covered here (e.g., "What is NTSA?"), use your general knowledge to provide a helpful, high-level summary.
 """
-    return system_prompt
\ No newline at end of file
+    return system_prompt
+
+
+def build_prompt_documents(rag_data: Dict[str, List[Any]], compact: bool = True) -> List[Document]:
+    """
+    Splits the RAG data into independently retrievable prompt sections.
+
+    Each website record, each department's course table, the fee structure and
+    each FAQ becomes one Document, rendered exactly as in the full system prompt.
+    """
+    if compact:
+        rag_data = compact_rag_data(rag_data)
+    documents = []
+
+    record_kinds = [
+        ("general_info", "general_info"),
+        ("contact_info", "contact_info"),
+        ("announcements", "announcement"),
+        ("courses", "course"),
+        ("departments", "department"),
+    ]
+    for key, kind in record_kinds:
+        for i, item in enumerate(rag_data.get(key, [])):
+            documents.append(Document(f"{kind}:{i}", kind, item.get('title', ''), _format_info_item(item)))
+
+    for i, dept_data in enumerate(rag_data.get("courses_detailed", [])):
+        documents.append(Document(
+            f"course_table:{i}",
+            "course_table",
+            dept_data.get('department', 'Unknown Department'),
+            "\n".join(_format_course_table(dept_data, compact)).strip(),
+        ))
+
+    fees_data = rag_data.get("fees_structure")
+    if fees_data:
+        documents.append(Document("fees:0", "fees", fees_data.get('title', 'Fee Structure'),
+                                  "\n".join(_format_fees(fees_data, compact))))
+
+    for i, faq in enumerate(rag_data.get("faqs", [])):
+        documents.append(Document(f"faq:{i}", "faq", faq.get('question', ''), _format_faq(faq)))
+
+    return documents
+
+
+def compaction_report(rag_data: Dict[str, List[Any]], documents: List[Document],
+                      system_prompt: str) -> Dict[str, Dict[str, int]]:
+    """
+    Estimated tokens of each section group, and of the full system prompt,
+    before compaction and after it (given the compacted documents and prompt).
+    """
+    report: Dict[str, Dict[str, int]] = {group: {"before": 0, "after": 0} for group in GROUP_PRIORITY}
+    for stage, docs in (("before", build_prompt_documents(rag_data, compact=False)), ("after", documents)):
+        for doc in docs:
+            report[section_group(doc.kind)][stage] += estimate_tokens(doc.text)
+    report["full_prompt"] = {
+        "before": estimate_tokens(create_system_prompt(rag_data, compact=False)),
+        "after": estimate_tokens(system_prompt),
+    }
+    return report
+
+
+def format_section(doc: Document) -> str:
+    return f"[{SECTION_LABELS.get(doc.kind, doc.kind)}]\n{doc.text}"
+
+
+def count_section_tokens(doc: Document) -> int:
+    # Includes the blank line that separates sections in the prompt.
+    return estimate_tokens(format_section(doc)) + 2
+
+
+def _truncate_section(doc: Document, budget_tokens: int) -> Optional[Document]:
+    # Keeps whole lines (table rows, list items) from the top of the section.
+    used = count_section_tokens(Document(doc.doc_id, doc.kind, doc.title, ""))
+    kept = []
+    for line in doc.text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget_tokens:
+            break
+        used += cost
+        kept.append(line)
+    if not kept:
+        return None
+    return Document(f"{doc.doc_id}:truncated", doc.kind, doc.title, "\n".join(kept))
+
+
+def fit_documents(documents: List[Document], budget_tokens: int,
+                  section_tokens: Dict[str, int]) -> Tuple[List[Document], int]:
+    """
+    Keeps sections in the given (priority) order while they fit in budget_tokens.
+
+    The first section that does not fit is cut to whole lines if enough budget
+    is left; later sections are still tried, so a small one can fill the gap.
+    section_tokens holds precomputed counts by doc_id; other sections are
+    estimated on the fly. Returns the kept sections and how many were dropped.
+    """
+    kept = []
+    dropped = 0
+    remaining = budget_tokens
+    for doc in documents:
+        cost = section_tokens.get(doc.doc_id)
+        if cost is None:
+            cost = count_section_tokens(doc)
+        if cost <= remaining:
+            kept.append(doc)
+            remaining -= cost
+            continue
+        truncated = None
+        if remaining >= MIN_TRUNCATED_SECTION_TOKENS:
+            truncated = _truncate_section(doc, remaining)
+        if truncated is not None:
+            kept.append(truncated)
+            remaining -= count_section_tokens(truncated)
+        else:
+            dropped += 1
+    return kept, dropped
+
+
+def create_retrieval_prompt(documents: List[Document]) -> str:
+    """
+    Builds a compact system prompt from the persona header and only the given
+    (retrieved) sections, instead of the whole knowledge base.
+    """
+    if documents:
+        section_parts = [format_section(doc) for doc in documents]
+        reference_str = "\n\n".join(section_parts)
+    else:
+        reference_str = "No reference data matched this question."
+
+    return f"""{PERSONA_HEADER}
+--- REFERENCE DATA ---
+
+{reference_str}
+
+--- END OF REFERENCE DATA ---
+{RETRIEVAL_GUIDELINES}"""
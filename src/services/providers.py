@@ -0,0 +1,362 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from .config import BackendSettings, LLMSettings, RoutingSettings
+from .metrics import ChatMetrics
+
+# Samples a backend needs before its own percentile replaces the configured hedge delay.
+MIN_LATENCY_SAMPLES = 20
+# HTTP statuses worth retrying on the same or another backend.
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised without calling upstream when every backend's circuit is open.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"All model backends are unavailable; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LatencyTracker:
+    """
+    Sliding window of a backend's most recent latencies.
+    """
+    __slots__ = ("samples",)
+
+    def __init__(self, window: int = 256):
+        self.samples: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. Once reset_seconds
+    have passed, a single trial call is let through (half-open); its outcome
+    closes the circuit or opens it again.
+    """
+    __slots__ = ("failure_threshold", "reset_seconds", "failures", "opened_at", "probing")
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probing else "open"
+
+    def retry_in(self, now: float) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - now)
+
+    def allow(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or now - self.opened_at < self.reset_seconds:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = now
+
+    def release(self) -> None:
+        """
+        The call was abandoned (it lost a hedge race); let another trial through.
+        """
+        self.probing = False
+
+
+class Backend:
+    """
+    One model backend with its client, circuit breaker and latency history
+    (whole-call time for completions, time to first token for streams).
+    """
+
+    def __init__(self, settings: BackendSettings, routing: RoutingSettings, http_client: httpx.AsyncClient,
+                 metrics: ChatMetrics):
+        from openai import AsyncOpenAI
+        self.name = settings.name
+        self.model = settings.model
+        # Retries are done by the router, which can also fail over to another backend.
+        self.client = AsyncOpenAI(api_key=settings.api_key, base_url=settings.base_url, max_retries=0,
+                                  http_client=http_client)
+        self.breaker = CircuitBreaker(routing.breaker_failures, routing.breaker_reset_seconds)
+        self.latency = LatencyTracker()
+        self.first_token_latency = LatencyTracker()
+        self.ok = metrics.upstream_responses.labels(self.name, "200")
+        self.attempt_seconds = metrics.backend_seconds.labels(self.name)
+        self.circuit_open = metrics.circuit_open.labels(self.name)
+
+    def hedge_delay(self, streaming: bool, routing: RoutingSettings) -> float:
+        tracker = self.first_token_latency if streaming else self.latency
+        delay = tracker.percentile(routing.hedge_percentile)
+        return delay if delay is not None else routing.hedge_delay
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95)
+        ttft_p95 = self.first_token_latency.percentile(95)
+        return {
+            "model": self.model,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "first_token_p95_seconds": round(ttft_p95, 3) if ttft_p95 is not None else None,
+        }
+
+
+class _OpenStream:
+    """
+    A streamed completion whose first text delta has already arrived.
+    """
+    __slots__ = ("response", "chunks", "first")
+
+    def __init__(self, response: Any, chunks: AsyncIterator[Any], first: str):
+        self.response = response
+        self.chunks = chunks
+        self.first = first
+
+
+async def _discard(result: Any) -> None:
+    if isinstance(result, _OpenStream):
+        await result.response.close()
+
+
+def _delta_text(chunk: Any) -> Optional[str]:
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+class ProviderRouter:
+    """
+    Sends each model call to the first backend in preference order whose
+    circuit is closed.
+
+    If the call is still running when that backend's usual p95 has passed
+    (time to first token, for streams), the same call is hedged on the next
+    available backend and the first answer wins; the other is cancelled.
+    Retryable failures (timeouts, connection errors, 408/409/429/5xx) move on
+    to the next backend right away, or back off with full jitter before
+    trying one again, for at most max_retries retries and never past the
+    request deadline. A stream is only retried before its first token.
+    """
+
+    def __init__(self, llm_settings: LLMSettings, routing: RoutingSettings, http_client: httpx.AsyncClient,
+                 metrics: ChatMetrics):
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+        self._timeout_errors = (APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError)
+        self._connection_errors = (APIConnectionError, httpx.TransportError)
+        self._status_error = APIStatusError
+
+        self.llm_settings = llm_settings
+        self.routing = routing
+        self.metrics = metrics
+        backends = routing.backends or (
+            BackendSettings("default", llm_settings.base_url, llm_settings.model, llm_settings.api_key),
+        )
+        self.backends = [Backend(settings, routing, http_client, metrics) for settings in backends]
+        self._rng = random.Random()
+
+    def _status(self, error: BaseException) -> str:
+        if isinstance(error, self._status_error):
+            return str(error.status_code)
+        return "timeout" if isinstance(error, self._timeout_errors) else "error"
+
+    def _retryable(self, error: BaseException) -> bool:
+        if isinstance(error, self._status_error):
+            return error.status_code in RETRYABLE_STATUSES
+        return isinstance(error, self._timeout_errors + self._connection_errors)
+
+    def _pick(self, exclude: Sequence[Backend] = ()) -> Optional[Backend]:
+        now = time.monotonic()
+        for backend in self.backends:
+            if backend not in exclude and backend.breaker.allow(now):
+                return backend
+        return None
+
+    def _unavailable(self) -> UpstreamUnavailable:
+        now = time.monotonic()
+        return UpstreamUnavailable(min(backend.breaker.retry_in(now) for backend in self.backends))
+
+    def _record_failure(self, backend: Backend, error: BaseException) -> None:
+        self.metrics.upstream_responses.labels(backend.name, self._status(error)).inc()
+        if self._retryable(error):
+            backend.breaker.record_failure(time.monotonic())
+        else:
+            # A rejected request (bad input, auth) says nothing about the backend's health.
+            backend.breaker.release()
+        backend.circuit_open.set(1 if backend.breaker.opened_at is not None else 0)
+
+    async def _attempt(self, backend: Backend, call: Callable[[Backend, float], Awaitable[Any]],
+                       deadline: float, streaming: bool) -> Any:
+        started = time.monotonic()
+        try:
+            result = await call(backend, max(deadline - started, 0.001))
+        except asyncio.CancelledError:
+            backend.breaker.release()
+            raise
+        except Exception as e:
+            self._record_failure(backend, e)
+            raise
+        elapsed = time.monotonic() - started
+        (backend.first_token_latency if streaming else backend.latency).observe(elapsed)
+        backend.attempt_seconds.observe(elapsed)
+        backend.breaker.record_success()
+        backend.circuit_open.set(0)
+        backend.ok.inc()
+        return result
+
+    async def _hedged(self, primary: Backend, call: Callable[[Backend, float], Awaitable[Any]],
+                      deadline: float, streaming: bool) -> Tuple[Any, Backend]:
+        tasks: Dict[asyncio.Task, Backend] = {
+            asyncio.create_task(self._attempt(primary, call, deadline, streaming)): primary,
+        }
+        try:
+            hedge_at = time.monotonic() + primary.hedge_delay(streaming, self.routing)
+            error: Optional[BaseException] = None
+            while tasks:
+                now = time.monotonic()
+                hedge_pending = self.routing.hedging and len(tasks) == 1 and len(self.backends) > 1 and error is None
+                wait_until = min(deadline, hedge_at) if hedge_pending else deadline
+                done, _ = await asyncio.wait(tasks, timeout=max(wait_until - now, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    backend = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result(), backend
+                    error = task.exception()
+                if done:
+                    continue
+                if time.monotonic() >= deadline:
+                    raise asyncio.TimeoutError("model call deadline exceeded")
+                secondary = self._pick(exclude=list(tasks.values()))
+                if secondary is not None:
+                    self.metrics.hedged_calls.labels(secondary.name).inc()
+                    tasks[asyncio.create_task(self._attempt(secondary, call, deadline, streaming))] = secondary
+                hedge_at = deadline
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif task.exception() is None:
+                    # Both answered at once; only the returned one is used.
+                    await _discard(task.result())
+
+    async def _call(self, call: Callable[[Backend, float], Awaitable[Any]], streaming: bool) -> Tuple[Any, Backend]:
+        deadline = time.monotonic() + self.llm_settings.timeout
+        failed: List[Backend] = []
+        retries = 0
+        while True:
+            backend = self._pick(exclude=failed) or self._pick()
+            if backend is None:
+                raise self._unavailable()
+            try:
+                return await self._hedged(backend, call, deadline, streaming)
+            except Exception as e:
+                if retries == self.llm_settings.max_retries or not self._retryable(e) or time.monotonic() >= deadline:
+                    raise
+                error = e
+            failed.append(backend)
+            if len(failed) >= len(self.backends):
+                # Every backend has failed once: back off before trying them again.
+                delay = self._rng.uniform(0, min(self.routing.retry_max_delay,
+                                                 self.routing.retry_base_delay * 2 ** retries))
+                if time.monotonic() + delay >= deadline:
+                    raise error
+                await asyncio.sleep(delay)
+                failed.clear()
+            retries += 1
+            self.metrics.retries.inc()
+
+    async def complete(self, messages: List[Dict[str, str]]) -> Tuple[Any, Backend]:
+        """
+        Returns the chat completion and the backend that produced it.
+        """
+        settings = self.llm_settings
+
+        async def call(backend: Backend, timeout: float) -> Any:
+            return await backend.client.chat.completions.create(
+                model=backend.model,
+                messages=messages,
+                temperature=settings.temperature,
+                max_tokens=settings.max_tokens,
+                timeout=timeout,
+            )
+
+        return await self._call(call, streaming=False)
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Yields the text deltas of a streamed completion. Hedging and retries
+        apply until the first token; after that the stream stays on its backend.
+        """
+        settings = self.llm_settings
+
+        async def call(backend: Backend, timeout: float) -> _OpenStream:
+            response = await backend.client.chat.completions.create(
+                model=backend.model,
+                messages=messages,
+                temperature=settings.temperature,
+                max_tokens=settings.max_tokens,
+                stream=True,
+                timeout=timeout,
+            )
+            chunks = response.__aiter__()
+            try:
+                async with asyncio.timeout(timeout):
+                    async for chunk in chunks:
+                        delta = _delta_text(chunk)
+                        if delta:
+                            return _OpenStream(response, chunks, delta)
+                return _OpenStream(response, chunks, "")
+            except BaseException:
+                await response.close()
+                raise
+
+        opened, backend = await self._call(call, streaming=True)
+        try:
+            if opened.first:
+                yield opened.first
+            async for chunk in opened.chunks:
+                delta = _delta_text(chunk)
+                if delta:
+                    yield delta
+        except Exception as e:
+            self._record_failure(backend, e)
+            raise
+        finally:
+            await opened.response.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {backend.name: backend.stats() for backend in self.backends}
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .config import LLMSettings
+from .metrics import ChatMetrics
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a model call is rejected instead of queued, or the provider
+    itself answered 429. retry_after is the suggested wait in seconds.
+    """
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"Rate limited ({reason}); retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate per second up to capacity.
+
+    take() may drive the level below zero: the debt is a reservation that
+    later callers wait out, which keeps admission first come, first served.
+    """
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        return max(0.0, amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Admission:
+    """
+    A granted model call; settle() corrects its token reservation with the actual usage.
+    """
+    __slots__ = ("_limiter", "tokens")
+
+    def __init__(self, limiter: "UpstreamLimiter", tokens: float):
+        self._limiter = limiter
+        self.tokens = tokens
+
+    def settle(self, actual_tokens: int) -> None:
+        bucket = self._limiter.token_bucket
+        if bucket is not None:
+            bucket.give(self.tokens - actual_tokens)
+            self.tokens = actual_tokens
+
+
+class UpstreamLimiter:
+    """
+    Admission control in front of the model API.
+
+    A call first reserves one request and its estimated tokens from the
+    requests-per-minute and tokens-per-minute buckets, then waits for one of
+    max_concurrency slots. At most max_queue calls wait at a time, and a call
+    that could not start within queue_timeout is rejected right away with
+    RateLimitExceeded instead of joining the pile-up, so overload turns into
+    fast 429s rather than timeouts.
+    """
+
+    def __init__(self, settings: LLMSettings, metrics: ChatMetrics):
+        self.request_bucket = TokenBucket(settings.requests_per_minute) if settings.requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(settings.tokens_per_minute) if settings.tokens_per_minute > 0 else None
+        self.max_queue = settings.max_queue
+        self.queue_timeout = settings.queue_timeout
+        self.metrics = metrics
+        self._slots = asyncio.Semaphore(settings.max_concurrency)
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def _quota_wait(self, tokens: float, now: float) -> float:
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = self.request_bucket.wait_time(1, now)
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        return wait
+
+    def _reject(self, reason: str, retry_after: float) -> RateLimitExceeded:
+        self.shed += 1
+        self.metrics.upstream_shed.labels(reason).inc()
+        return RateLimitExceeded(max(1.0, retry_after), reason)
+
+    def _refund(self, tokens: float) -> None:
+        if self.request_bucket is not None:
+            self.request_bucket.give(1)
+        if self.token_bucket is not None:
+            self.token_bucket.give(tokens)
+
+    @asynccontextmanager
+    async def admit(self, estimated_tokens: int) -> AsyncIterator[Admission]:
+        """
+        Holds a concurrency slot for the duration of one model call.
+
+        Raises:
+            RateLimitExceeded: if the queue is full or the call cannot start within queue_timeout.
+        """
+        tokens = float(estimated_tokens)
+        if self.token_bucket is not None:
+            # A prompt larger than the whole quota can still go once the bucket is full.
+            tokens = min(tokens, self.token_bucket.capacity)
+        started = time.monotonic()
+        quota_wait = self._quota_wait(tokens, started)
+        if self.waiting >= self.max_queue:
+            raise self._reject("queue_full", quota_wait)
+        if quota_wait > self.queue_timeout:
+            raise self._reject("quota", quota_wait)
+
+        if self.request_bucket is not None:
+            self.request_bucket.take(1)
+        if self.token_bucket is not None:
+            self.token_bucket.take(tokens)
+        admission = Admission(self, tokens)
+
+        self.waiting += 1
+        self.metrics.upstream_queue_depth.inc()
+        try:
+            if quota_wait > 0:
+                await asyncio.sleep(quota_wait)
+            remaining = self.queue_timeout - (time.monotonic() - started)
+            await asyncio.wait_for(self._slots.acquire(), max(remaining, 0.0))
+        except asyncio.TimeoutError:
+            self._refund(admission.tokens)
+            raise self._reject("timeout", remaining) from None
+        except BaseException:
+            self._refund(admission.tokens)
+            raise
+        finally:
+            self.waiting -= 1
+            self.metrics.upstream_queue_depth.dec()
+            self.metrics.upstream_queue_seconds.observe(time.monotonic() - started)
+
+        self.admitted += 1
+        try:
+            yield admission
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        stats: Dict[str, Any] = {"waiting": self.waiting, "admitted": self.admitted, "shed": self.shed}
+        if self.request_bucket is not None:
+            self.request_bucket.wait_time(0, now)
+            stats["requests_available"] = round(self.request_bucket.level, 1)
+        if self.token_bucket is not None:
+            self.token_bucket.wait_time(0, now)
+            stats["tokens_available"] = round(self.token_bucket.level)
+        return stats
+
+
+def retry_after_seconds(error: Exception, default: float = 1.0) -> float:
+    """
+    The Retry-After of an upstream 429 response, in seconds.
+    """
+    response: Optional[Any] = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value.rstrip("s"))
+            except ValueError:
+                continue
+    return default
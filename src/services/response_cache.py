@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def normalize_message(message: str) -> str:
+    """
+    Canonical form of a user question for cache lookups: Unicode-normalised,
+    lowercased, punctuation stripped and whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", message).lower()
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def prompt_version(system_instruction: str) -> str:
+    """
+    Short content hash of the system prompt; changes whenever the dataset does.
+    """
+    return hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:16]
+
+
+class DiskCacheBackend:
+    """
+    SQLite-backed store that lets cached answers survive restarts.
+
+    Used as a second tier behind the in-memory LRU: misses fall through to disk,
+    and every write goes to both. At most max_entries answers are kept; when a
+    write goes over, the oldest tenth is deleted in one statement. The methods
+    block on SQLite, so ResponseCache calls them from a worker thread.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            if not existed:
+                self._size += 1
+            if self._size > self.max_entries:
+                excess = self._size - self.max_entries + max(1, self.max_entries // 10)
+                deleted = self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self._size -= deleted
+                self.evictions += deleted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (older_than,)).rowcount
+            self._size -= deleted
+            return deleted
+
+    def __len__(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of model answers with a per-entry TTL.
+
+    Keys combine the normalised question with the prompt version, so a
+    regenerated dataset never serves answers built from stale data.
+
+    get() and set() are coroutines: the in-memory tier is served directly and
+    the optional disk tier is read and written in a worker thread, so SQLite
+    I/O never blocks the event loop.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0,
+                 backend: Optional[DiskCacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if backend is not None:
+            backend.prune(time.time() - ttl_seconds)
+
+    @staticmethod
+    def make_key(message: str, version: str) -> str:
+        digest = hashlib.sha256(normalize_message(message).encode("utf-8")).hexdigest()
+        return f"{version}:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if now - created_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.backend is not None:
+            stored = await asyncio.to_thread(self.backend.get, key)
+            if stored is not None:
+                value, created_at = stored
+                if now - created_at < self.ttl_seconds:
+                    self._store(key, value, created_at)
+                    self.hits += 1
+                    return value
+                await asyncio.to_thread(self.backend.delete, key)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        self._store(key, value, created_at)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.set, key, value, created_at)
+
+    def _store(self, key: str, value: str, created_at: float) -> None:
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_backend": self.backend is not None,
+        }
+        if self.backend is not None:
+            stats["disk_size"] = len(self.backend)
+            stats["disk_max_entries"] = self.backend.max_entries
+            stats["disk_evictions"] = self.backend.evictions
+        return stats
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
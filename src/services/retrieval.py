@@ -0,0 +1,89 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from get have how i if in is it
+me my of on or please should tell that the their there this to was what when
+where which who will with would you your
+""".split())
+
+
+@dataclass(frozen=True)
+class Document:
+    """
+    One retrievable prompt section: a rendered block of knowledge-base text.
+    Chunks of a longer section carry the key of that section as parent_id.
+    """
+    doc_id: str
+    kind: str
+    title: str
+    text: str
+    parent_id: Optional[str] = None
+
+
+def _stem(token: str) -> str:
+    # Deliberately tiny suffix stripping: enough to match "fees"/"fee" and
+    # "courses"/"course" without pulling in a stemming library.
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases, splits on non-alphanumerics, drops stopwords and stems the rest.
+    """
+    return [_stem(tok) for tok in _TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    Document length normalisation and IDF are folded into the postings at build
+    time, so a query only sums precomputed weights for the terms it contains.
+    """
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        term_counts = [Counter(tokenize(f"{doc.title} {doc.text}")) for doc in documents]
+        doc_lengths = [sum(counts.values()) for counts in term_counts]
+        avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+        doc_freq: Counter = Counter()
+        for counts in term_counts:
+            doc_freq.update(counts.keys())
+
+        n_docs = len(documents)
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc_idx, counts in enumerate(term_counts):
+            length_norm = k1 * (1 - b + b * doc_lengths[doc_idx] / avg_length) if avg_length else k1
+            for term, tf in counts.items():
+                idf = math.log(1 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                weight = idf * tf * (k1 + 1) / (tf + length_norm)
+                self.postings[term].append((doc_idx, weight))
+        self.postings = dict(self.postings)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[Document, float]]:
+        """
+        Returns up to top_k (document, score) pairs, best first. Documents that
+        share no terms with the query are never returned.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            for doc_idx, weight in self.postings.get(term, ()):
+                scores[doc_idx] += weight
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(self.documents[doc_idx], score) for doc_idx, score in best]
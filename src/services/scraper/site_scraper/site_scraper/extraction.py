@@ -0,0 +1,86 @@
+# Compiles the declarative site specs (site_specs.py) for the spiders.
+#
+# Every selector is translated to XPath and compiled into an lxml XPath
+# object once per process, and every keyword list into one alternation regex,
+# so extracting a page only evaluates precompiled expressions against the
+# lxml tree that Scrapy already parsed (response.selector.root).
+
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+from site_scraper.site_specs import SITE_SPECS
+
+
+def selector_to_xpath(selector):
+    if selector.startswith("xpath:"):
+        return selector[len("xpath:"):]
+    return HTMLTranslator().css_to_xpath(selector)
+
+
+def keyword_regex(keywords):
+    """
+    One case-insensitive regex matching any of the keywords as a substring.
+    """
+    alternatives = sorted(set(keywords), key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in alternatives), re.IGNORECASE)
+
+
+class CompiledSpec:
+    """
+    A site spec with every selector compiled to an lxml XPath object and every
+    keyword list to a regex. Lookups take the page group and field names of
+    the spec and a context node (the document root or a node selected before).
+    """
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.domains = tuple(spec.get("domains", ()))
+        self._xpaths = {
+            (group, field): etree.XPath(selector_to_xpath(selector), smart_strings=False)
+            for group, fields in spec["selectors"].items()
+            for field, selector in fields.items()
+        }
+        self._keywords = {name: keyword_regex(keywords) for name, keywords in spec.get("keywords", {}).items()}
+
+    def all(self, node, group, field):
+        return self._xpaths[(group, field)](node)
+
+    def first(self, node, group, field):
+        results = self._xpaths[(group, field)](node)
+        return results[0] if results else None
+
+    def text(self, node, group, field):
+        """
+        The stripped, non-empty text parts of the selection joined with spaces.
+        """
+        return ' '.join(part.strip() for part in self._xpaths[(group, field)](node) if part.strip())
+
+    def matches(self, keywords, *texts):
+        """
+        Whether any of the texts contains one of the named keywords.
+        """
+        # Keywords never contain a newline, so one search covers all texts.
+        return self._keywords[keywords].search("\n".join(texts)) is not None
+
+
+@lru_cache(maxsize=None)
+def compiled_spec(name):
+    return CompiledSpec(SITE_SPECS[name])
+
+
+def spec_for(site_url, default, name=None):
+    """
+    The compiled spec named name, else the one whose domains include the
+    site's host, else the spider's default.
+    """
+    if name:
+        return compiled_spec(name)
+    host = urlparse(site_url).netloc
+    for spec in SITE_SPECS.values():
+        if host in spec.get("domains", ()):
+            return compiled_spec(spec["name"])
+    return compiled_spec(default)
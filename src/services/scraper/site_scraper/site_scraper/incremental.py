@@ -0,0 +1,248 @@
+# Incremental crawling: skip pages that did not change since the last run and
+# emit only a delta of added, changed and removed records.
+#
+# Conditional requests (If-None-Match / If-Modified-Since) are sent by Scrapy's
+# HTTP cache with the RFC2616 policy (see settings.py): a 304 answer is served
+# from the cache, so link following keeps working without downloading the page.
+# This spider middleware then fingerprints every page and marks pages whose
+# content is unchanged (response.meta["page_unchanged"]) so the spiders skip
+# extraction for them. The records of changed pages are diffed against the
+# previous run by an item pipeline stage placed after normalization and
+# near-duplicate removal, so the delta holds exactly the records that reach
+# the output.
+
+import hashlib
+import json
+import os
+import re
+import weakref
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.http import Request
+from scrapy.utils.project import data_path
+
+
+# Markup that changes on every request (nonces, inline tracking) without
+# changing the page content.
+VOLATILE_MARKUP_RE = re.compile(rb"<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->", re.S | re.I)
+
+
+def page_fingerprint(body):
+    """
+    Content fingerprint of an HTML page, ignoring scripts, styles and comments.
+    """
+    return hashlib.sha1(VOLATILE_MARKUP_RE.sub(b"", body)).hexdigest()
+
+
+def record_key(record):
+    """
+    Stable identity of a scraped record: its source URL, content type and section.
+    Records are keyed once SiteScraperPipeline has normalized them and set the
+    section of website records to their title; the title fallback only serves
+    records that did not pass through it.
+    """
+    metadata = record.get("metadata") or {}
+    section = metadata.get("section") or record.get("title") or ""
+    source = record.get("source_url") or record.get("scraped_url") or ""
+    return "|".join((source, record.get("content_type") or "faq_page", section))
+
+
+def record_hash(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class IncrementalState:
+    """
+    Incremental crawl state of one crawler, shared by IncrementalCrawlMiddleware
+    and IncrementalDeltaPipeline: per page URL, its fingerprint and the key and
+    hash of every record of it that reached the output, as of the previous
+    run (pages) and for the pages re-extracted in this run (crawled).
+    """
+
+    # One state per crawler, so its middleware and pipeline see the same one.
+    _shared = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def shared(cls, crawler):
+        if crawler not in cls._shared:
+            cls._shared[crawler] = cls(crawler)
+        return cls._shared[crawler]
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.full = settings.getbool("INCREMENTAL_FULL")
+        self.state_dir = settings.get("INCREMENTAL_STATE_DIR") or data_path("crawl_state", createdir=True)
+        self.delta_template = settings.get("INCREMENTAL_DELTA_FILE")
+        self.pages = {}
+        self.crawled = {}
+        self.visited = set()
+        # Page URL of every item yielded by a re-extracted page, by item id,
+        # until the item reaches the delta stage or is dropped before it.
+        self.item_pages = {}
+        self.delta_file = None
+        # Called with the record keys of the whole crawl once the state is closed.
+        self.close_listeners = []
+
+    @property
+    def is_open(self):
+        """
+        Whether IncrementalCrawlMiddleware opened this state for a running crawl.
+        """
+        return self.delta_file is not None
+
+    def _state_path(self, spider):
+        return os.path.join(self.state_dir, f"{spider.name}.json")
+
+    def open(self, spider):
+        os.makedirs(self.state_dir, exist_ok=True)
+        try:
+            with open(self._state_path(spider), encoding="utf-8") as f:
+                self.pages = json.load(f)
+        except FileNotFoundError:
+            self.pages = {}
+        delta_path = self.delta_template % {"name": spider.name}
+        self.delta_file = open(delta_path, "w", encoding="utf-8")
+        spider.logger.info(f"Incremental crawl: {len(self.pages)} known pages, delta -> {delta_path}"
+                           + (" (full re-extraction)" if self.full else ""))
+
+    def emit(self, op, key, record):
+        self.delta_file.write(json.dumps({"op": op, "key": key, "record": record}, ensure_ascii=False) + "\n")
+        self.stats.inc_value(f"incremental/records_{op}")
+
+    def close(self, spider, reason):
+        for url, page in self.crawled.items():
+            previous = self.pages.get(url, {}).get("records", {})
+            for key in previous.keys() - page["records"].keys():
+                self.emit("removed", key, None)
+            self.pages[url] = page
+        if reason == "finished":
+            for url in [url for url in self.pages if url not in self.visited]:
+                for key in self.pages.pop(url)["records"]:
+                    self.emit("removed", key, None)
+        self.delta_file.close()
+        self.delta_file = None
+        write_json_atomic(self._state_path(spider), self.pages)
+        record_keys = {key for page in self.pages.values() for key in page["records"]}
+        for listener in self.close_listeners:
+            listener(record_keys)
+        spider.logger.info(
+            "Incremental crawl: %d pages unchanged, %d changed; records added=%d changed=%d removed=%d",
+            self.stats.get_value("incremental/pages_unchanged", 0),
+            self.stats.get_value("incremental/pages_changed", 0),
+            self.stats.get_value("incremental/records_added", 0),
+            self.stats.get_value("incremental/records_changed", 0),
+            self.stats.get_value("incremental/records_removed", 0),
+        )
+
+
+class IncrementalCrawlMiddleware:
+    """
+    Fingerprints every crawled page and marks the pages whose content did not
+    change since the previous run, so the spiders skip extracting them; the
+    items of changed pages are tagged with their page for
+    IncrementalDeltaPipeline. With INCREMENTAL_FULL set every page is
+    re-extracted.
+
+    Pages that were not reached at all are treated as removed only when the
+    crawl finished normally, so an interrupted run never deletes records.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(IncrementalState.shared(crawler))
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.item_discarded, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_discarded, signal=signals.item_error)
+        return s
+
+    def spider_opened(self, spider):
+        self.state.open(spider)
+
+    def process_spider_input(self, response, spider):
+        state = self.state
+        fingerprint = page_fingerprint(response.body)
+        previous = state.pages.get(response.url)
+        unchanged = not state.full and previous is not None and previous["fingerprint"] == fingerprint
+        response.meta["page_fingerprint"] = fingerprint
+        response.meta["page_unchanged"] = unchanged
+        state.visited.add(response.url)
+        if unchanged:
+            state.stats.inc_value("incremental/pages_unchanged")
+        else:
+            state.stats.inc_value("incremental/pages_changed")
+        return None
+
+    async def process_spider_output(self, response, result, spider):
+        if response.meta.get("page_unchanged"):
+            async for item in result:
+                if isinstance(item, Request):
+                    yield item
+            return
+
+        self.state.crawled[response.url] = {"fingerprint": response.meta["page_fingerprint"], "records": {}}
+        async for item in result:
+            if not isinstance(item, Request):
+                self.state.item_pages[id(item)] = response.url
+            yield item
+
+    def item_discarded(self, item, **kwargs):
+        self.state.item_pages.pop(id(item), None)
+
+    def spider_closed(self, spider, reason):
+        self.state.close(spider, reason)
+
+
+class IncrementalDeltaPipeline:
+    """
+    Diffs every record that passed normalization and near-duplicate removal
+    against the records its page produced in the previous run, and writes the
+    added and changed ones to INCREMENTAL_DELTA_FILE; records of the page that
+    no longer come out are written as removed when the crawl closes. Only
+    added and changed records are passed on to later pipelines and feeds,
+    unless INCREMENTAL_FULL is set: then every record is passed on (the delta
+    is still written). Must run after the normalizing and deduplicating
+    pipelines, and needs IncrementalCrawlMiddleware.
+
+    Near-duplicates are only detected among the records extracted in the same
+    run, so an incremental run can add a record that repeats one of a page it
+    skipped as unchanged; a full run deduplicates across the whole site.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(IncrementalState.shared(crawler))
+
+    def process_item(self, item, spider):
+        state = self.state
+        url = state.item_pages.pop(id(item), None)
+        if url is None:
+            return item
+        record = ItemAdapter(item).asdict()
+        key = record_key(record)
+        digest = record_hash(record)
+        state.crawled[url]["records"][key] = digest
+        previous = state.pages.get(url, {}).get("records", {})
+        if key not in previous:
+            state.emit("added", key, record)
+        elif previous[key] != digest:
+            state.emit("changed", key, record)
+        elif not state.full:
+            raise DropItem(f"Unchanged since the last crawl: {key}", log_level="DEBUG")
+        return item
@@ -7,6 +7,18 @@ import scrapy
 
 
 class SiteScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    # One website record (general info, contact, announcement, department or course).
+    source_url = scrapy.Field()
+    content_type = scrapy.Field()
+    title = scrapy.Field()
+    text_content = scrapy.Field()
+    metadata = scrapy.Field()
+
+
+class FaqPageItem(scrapy.Item):
+    # A whole FAQ page with its question/answer list.
+    scraped_url = scrapy.Field()
+    html_page_title = scrapy.Field()
+    faq_section_main_title = scrapy.Field()
+    navigation_links = scrapy.Field()
+    faq_list = scrapy.Field()
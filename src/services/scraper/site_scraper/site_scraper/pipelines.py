@@ -4,10 +4,335 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import hashlib
+import json
+import os
+import re
+import shutil
+import unicodedata
+from collections import deque
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem, NotConfigured
+
+from site_scraper.incremental import IncrementalState, record_key
+from site_scraper.items import FaqPageItem
+
+
+# Content types that only record that a department page was visited; apart
+# from the department name their text is boilerplate.
+MARKER_CONTENT_TYPES = ("department_page_no_courses_itemized",)
+
+# Zero-width and control characters that survive NFKC normalization.
+_INVISIBLE_RE = re.compile("[\u200b-\u200f\u2060\ufeff\x00-\x08\x0e-\x1f\x7f]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+SIMHASH_BITS = 64
+# Fingerprints are indexed by 4 bands of 16 bits: two fingerprints within
+# 3 bits of each other always share at least one band (pigeonhole).
+SIMHASH_BANDS = 4
+
+
+def normalize_text(text):
+    """
+    NFKC-normalizes the text, removes invisible characters and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE_RE.sub(" ", _INVISIBLE_RE.sub("", text)).strip()
+
+
+def simhash(text):
+    """
+    64-bit SimHash of the word trigrams of the text: near-identical texts get
+    fingerprints that differ in only a few bits.
+    """
+    words = _WORD_RE.findall(text.lower())
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
 
 
 class SiteScraperPipeline:
+    """
+    Normalizes every item: NFKC unicode and collapsed whitespace in all text
+    fields. Cuts "Department Page Processed" visit markers down to the
+    department name, so departments without a description or courses are
+    still known, and drops records left without text and FAQ entries without
+    a question or answer. Website records
+    without a metadata section get their title as section, so source_url,
+    content_type and section identify every record.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_item(self, item, spider):
+        if isinstance(item, FaqPageItem):
+            for field in ("html_page_title", "faq_section_main_title"):
+                if item.get(field):
+                    item[field] = normalize_text(item[field])
+            faqs = []
+            for faq in item.get("faq_list") or []:
+                question = normalize_text(faq.get("question") or "")
+                answer = normalize_text(faq.get("answer") or "")
+                if question and answer:
+                    faqs.append({"question": question, "answer": answer})
+            item["faq_list"] = faqs
+            return item
+
+        if item.get("content_type") in MARKER_CONTENT_TYPES:
+            self.stats.inc_value("normalize/markers_trimmed")
+            item["title"] = "Department"
+            item["text_content"] = (item.get("metadata") or {}).get("department") or ""
+        item["title"] = normalize_text(item.get("title") or "")
+        item["text_content"] = normalize_text(item.get("text_content") or "")
+        if not item["text_content"]:
+            self.stats.inc_value("normalize/empty_dropped")
+            raise DropItem(f"No text: {item['title']}", log_level="DEBUG")
+        metadata = dict(item.get("metadata") or {})
+        if not metadata.get("section"):
+            metadata["section"] = item["title"]
+        item["metadata"] = metadata
+        return item
+
+
+class NearDuplicatePipeline:
+    """
+    Drops website records whose text is a near-duplicate (SimHash within
+    DEDUP_MAX_DISTANCE bits) of an earlier record of the same content type,
+    such as a department description repeated on every department page, and
+    near-duplicate entries of FAQ lists.
+
+    Memory is bounded: only the last DEDUP_MAX_FINGERPRINTS fingerprints are
+    kept, in a banded index so each lookup only compares a few candidates.
+    """
+
+    def __init__(self, stats, max_distance, max_fingerprints):
+        self.stats = stats
+        self.max_distance = max_distance
+        self.max_fingerprints = max_fingerprints
+        self.band_bits = SIMHASH_BITS // SIMHASH_BANDS
+        self.band_mask = (1 << self.band_bits) - 1
+        self.recent = deque()
+        self.bands = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(crawler.stats, settings.getint("DEDUP_MAX_DISTANCE"), settings.getint("DEDUP_MAX_FINGERPRINTS"))
+
+    def _band_keys(self, scope, fingerprint):
+        return [(scope, band, fingerprint >> (band * self.band_bits) & self.band_mask)
+                for band in range(SIMHASH_BANDS)]
+
+    def seen(self, scope, text):
+        """
+        Returns whether a near-duplicate of the text was seen in this scope, remembering it if not.
+        """
+        fingerprint = simhash(text)
+        keys = self._band_keys(scope, fingerprint)
+        for key in keys:
+            for other in self.bands.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return True
+        for key in keys:
+            self.bands.setdefault(key, []).append(fingerprint)
+        self.recent.append((scope, fingerprint))
+        if len(self.recent) > self.max_fingerprints:
+            old_scope, old = self.recent.popleft()
+            for key in self._band_keys(old_scope, old):
+                fingerprints = self.bands[key]
+                fingerprints.remove(old)
+                if not fingerprints:
+                    del self.bands[key]
+        return False
+
+    def process_item(self, item, spider):
+        if isinstance(item, FaqPageItem):
+            faqs = [faq for faq in item.get("faq_list") or []
+                    if not self.seen("faq", f"{faq['question']} {faq['answer']}")]
+            self.stats.inc_value("dedup/faqs_dropped", len(item.get("faq_list") or []) - len(faqs))
+            item["faq_list"] = faqs
+            return item
+        if self.seen(item.get("content_type"), item.get("text_content") or ""):
+            self.stats.inc_value("dedup/records_dropped")
+            raise DropItem(f"Near-duplicate: {item.get('title')}", log_level="DEBUG")
+        return item
+
+
+class ShardedJsonlPipeline:
+    """
+    Writes the items of a crawl to size-capped JSONL shards in
+    SHARD_DIR/<spider>/ (part-00000.jsonl, part-00001.jsonl, ...) plus an
+    index.jsonl with the key, content type, shard, byte offset and length of
+    every record, so loaders can read selected records without scanning the
+    shards (see read_sharded_records). A run replaces the spider's previous
+    shards only once it closes. Disabled when SHARD_DIR is empty.
+
+    In an incremental crawl only added and changed records reach this
+    pipeline, so the records of the previous shards that the crawl state
+    still holds (those of unchanged pages) are copied into the new shards
+    once the state is closed; the shards always hold the whole crawl.
+    """
+
+    def __init__(self, shard_dir, max_bytes, spider_name, state=None):
+        self.final_dir = os.path.join(shard_dir, spider_name)
+        self.tmp_dir = self.final_dir + ".tmp"
+        self.max_bytes = max_bytes
+        self.state = state
+        self.index = []
+        self.shard = -1
+        self.shard_file = None
+        self.shard_size = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        shard_dir = crawler.settings.get("SHARD_DIR")
+        if not shard_dir:
+            raise NotConfigured("SHARD_DIR is not set")
+        return cls(shard_dir, crawler.settings.getint("SHARD_MAX_BYTES"), crawler.spidercls.name,
+                   IncrementalState.shared(crawler))
+
+    def _next_shard(self):
+        if self.shard_file is not None:
+            self.shard_file.close()
+        self.shard += 1
+        self.shard_file = open(os.path.join(self.tmp_dir, f"part-{self.shard:05d}.jsonl"), "wb")
+        self.shard_size = 0
+
+    def _write(self, line, key, content_type):
+        if self.shard_size and self.shard_size + len(line) > self.max_bytes:
+            self._next_shard()
+        self.index.append({"key": key, "content_type": content_type, "shard": os.path.basename(self.shard_file.name),
+                           "offset": self.shard_size, "length": len(line)})
+        self.shard_file.write(line)
+        self.shard_size += len(line)
+
+    def open_spider(self, spider):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._next_shard()
+
+    def process_item(self, item, spider):
+        record = ItemAdapter(item).asdict()
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._write(line, record_key(record), record.get("content_type") or "faq_page")
+        return item
+
+    def close_spider(self, spider):
+        if self.state is not None and self.state.is_open:
+            # The records that survive this run are known once the incremental state closes.
+            self.state.close_listeners.append(self._finish)
+        else:
+            self._finish(None)
+
+    def _finish(self, record_keys):
+        if record_keys is not None and os.path.exists(os.path.join(self.final_dir, "index.jsonl")):
+            carried = record_keys - {entry["key"] for entry in self.index}
+            for entry, line in _sharded_lines(self.final_dir, lambda entry: entry["key"] in carried):
+                self._write(line, entry["key"], entry["content_type"])
+        self.shard_file.close()
+        with open(os.path.join(self.tmp_dir, "index.jsonl"), "w", encoding="utf-8") as f:
+            for entry in self.index:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        shutil.rmtree(self.final_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.final_dir)
+
+
+def _sharded_lines(spider_shard_dir, wanted):
+    # (index entry, raw line) of the records whose index entry is wanted, in index order.
+    with open(os.path.join(spider_shard_dir, "index.jsonl"), encoding="utf-8") as f:
+        entries = [entry for entry in map(json.loads, f) if wanted(entry)]
+    handles = {}
+    try:
+        for entry in entries:
+            if entry["shard"] not in handles:
+                handles[entry["shard"]] = open(os.path.join(spider_shard_dir, entry["shard"]), "rb")
+            shard = handles[entry["shard"]]
+            shard.seek(entry["offset"])
+            yield entry, shard.read(entry["length"])
+    finally:
+        for shard in handles.values():
+            shard.close()
+
+
+def read_sharded_records(spider_shard_dir, content_types=None):
+    """
+    Yields the records of a ShardedJsonlPipeline output directory, optionally
+    only those of the given content types, reading just their byte ranges.
+    """
+    for _, line in _sharded_lines(spider_shard_dir,
+                                  lambda entry: content_types is None or entry["content_type"] in content_types):
+        yield json.loads(line)
+
+
+class DatasetWriter:
+    """
+    JSONL dataset shared by every crawler of one process.
+
+    Records are appended to a temporary file as they are scraped; commit()
+    moves it over the dataset in one atomic rename, and discard() drops it,
+    so a failed crawl never leaves a truncated dataset behind.
+    """
+
+    # One writer per dataset path, shared by the crawlers of the process.
+    _open = {}
+
+    @classmethod
+    def shared(cls, path):
+        if path not in cls._open:
+            cls._open[path] = cls(path)
+        return cls._open[path]
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.counts = {}
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write(self, record, source):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.counts[source] = self.counts.get(source, 0) + 1
+
+    def commit(self):
+        self._file.close()
+        self._open.pop(self.path, None)
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        self._open.pop(self.path, None)
+        os.remove(self.tmp_path)
+
+
+class CombinedDatasetPipeline:
+    """
+    Streams the items of every spider into the shared DatasetWriter of the
+    COMBINED_DATASET_FILE setting (see src/refresh_dataset.py). Disabled
+    when the setting is not given.
+    """
+
+    def __init__(self, writer, spider_name):
+        self.writer = writer
+        self.spider_name = spider_name
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("COMBINED_DATASET_FILE")
+        if not path:
+            raise NotConfigured("COMBINED_DATASET_FILE is not set")
+        return cls(DatasetWriter.shared(path), crawler.spidercls.name)
+
     def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict(), self.spider_name)
         return item
@@ -46,9 +46,9 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "site_scraper.middlewares.SiteScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "site_scraper.incremental.IncrementalCrawlMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -64,9 +64,23 @@ ROBOTSTXT_OBEY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "site_scraper.pipelines.SiteScraperPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "site_scraper.pipelines.SiteScraperPipeline": 100,
+    "site_scraper.pipelines.NearDuplicatePipeline": 200,
+    "site_scraper.incremental.IncrementalDeltaPipeline": 300,
+    "site_scraper.pipelines.ShardedJsonlPipeline": 800,
+}
+
+# Near-duplicate suppression (NearDuplicatePipeline): records whose SimHash
+# differs in at most DEDUP_MAX_DISTANCE of 64 bits are dropped; at most
+# DEDUP_MAX_FINGERPRINTS fingerprints are remembered.
+DEDUP_MAX_DISTANCE = 3
+DEDUP_MAX_FINGERPRINTS = 50000
+
+# Sharded JSONL output (ShardedJsonlPipeline): SHARD_DIR/<spider>/part-*.jsonl
+# files of at most SHARD_MAX_BYTES each, with an index.jsonl of record offsets.
+SHARD_DIR = "shards"
+SHARD_MAX_BYTES = 4 * 1024 * 1024
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -83,11 +97,25 @@ ROBOTSTXT_OBEY = True
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# The RFC2616 policy revalidates cached pages with If-None-Match /
+# If-Modified-Since, so unchanged pages come back as a bodyless 304.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+# Keep pages even when the site sends no-store, so the validators are available next run.
+HTTPCACHE_ALWAYS_STORE = True
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = [500, 502, 503, 504]
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+
+# Incremental crawling (see incremental.py): per-page fingerprints are kept in
+# INCREMENTAL_STATE_DIR (default: .scrapy/crawl_state) and the added, changed
+# and removed records of each run, as they come out of normalization and
+# near-duplicate removal, are written to INCREMENTAL_DELTA_FILE by
+# IncrementalDeltaPipeline.
+# Run with -s INCREMENTAL_FULL=1 to re-extract every page and pass every record on.
+INCREMENTAL_STATE_DIR = None
+INCREMENTAL_DELTA_FILE = "%(name)s_delta.jsonl"
+INCREMENTAL_FULL = False
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
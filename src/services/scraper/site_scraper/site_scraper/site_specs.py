@@ -0,0 +1,94 @@
+# Declarative extraction specs, one per site.
+#
+# A spec names every selector the spiders use, grouped by page type, and the
+# keyword lists they filter links and list items with. Selectors are CSS
+# (with parsel's ::text and ::attr() pseudo-elements) or XPath when prefixed
+# with "xpath:". They are evaluated relative to the document or to the node
+# named by the group (an article, a link, a list item). extraction.py compiles
+# each spec once into lxml XPath objects and one regex per keyword list.
+#
+# To onboard a site whose pages follow the same structure, add a spec with
+# the same groups and fields and its domains; the spiders pick it by domain
+# (or by name with -a spec=<name>).
+
+RVNP_SPEC = {
+    "name": "rvnp",
+    "domains": ["rvnp.ac.ke"],
+    "selectors": {
+        "homepage": {
+            "page_title": "title::text",
+            "brand_title": "div#site-identity p.site-title a::text",
+            "brand_description": "div#site-identity p.site-description::text",
+            "contact_phone": "div#quick-contact li.quick-call a::text",
+            "contact_email": "div#quick-contact li.quick-email a::text",
+            "news_title": "div#quick-contact div.top-news span.top-news-title::text",
+            "news_link_text": "div#quick-contact div.top-news a::text",
+            "news_link": "div#quick-contact div.top-news a::attr(href)",
+            "featured_articles": "div#featured-content div.inner-wrapper article",
+            "departments_link": "ul#primary-menu li#menu-item-203 > a::attr(href)",
+            "departments_link_fallback": 'xpath://ul[@id="primary-menu"]//a[contains(translate(text(), "DEPARTMENTS", "departments"), "departments")]/@href',
+        },
+        # Relative to one featured article.
+        "featured_article": {
+            "title": "header.entry-header h2.entry-title a::text",
+            "link": "header.entry-header h2.entry-title a::attr(href)",
+            "paragraphs": "div.entry-content div p::text",
+            "text": "div.entry-content ::text",
+        },
+        "department_list": {
+            "links": "div.entry-content a",
+            # Fallback: the Departments sub-menu, without 'Campuses' (which has children).
+            "nav_links": 'xpath://ul[@id="primary-menu"]/li[@id="menu-item-203"]/ul[@class="sub-menu"]/li[not(contains(@class, "menu-item-has-children"))]/a',
+        },
+        # Relative to one link.
+        "link": {
+            "href": "xpath:@href",
+            "text": "xpath:.//text()",
+        },
+        "department_page": {
+            "heading": "header.entry-header h1.entry-title::text",
+            "paragraphs": "div.entry-content > p",
+            "courses": "div.entry-content ul li",
+            "courses_fallback": "article ul li",
+            # Relative to one paragraph or list item.
+            "text": "xpath:.//text()",
+        },
+    },
+    "keywords": {
+        # Links on the department list page that are not departments.
+        "excluded_links": ['campus', 'gallery', 'news', 'event', 'contact',
+                           'tender', 'download', 'login', 'portal', 'apply',
+                           'about us', 'history', 'policy', 'charter', 'management',
+                           'principal', 'governor', 'registrar', 'dean', 'complaints', 'faqs',
+                           '#', 'javascript:', 'mailto:', '.pdf', '.doc', '.jpg', '.png'],
+        # Department page list items that are not courses.
+        "excluded_courses": ["click here", "download", "admission criteria", "fee structure"],
+    },
+}
+
+HEF_SPEC = {
+    "name": "hef",
+    "domains": ["www.hef.co.ke", "hef.co.ke"],
+    "selectors": {
+        "faq_page": {
+            "page_title": "title::text",
+            "section_title": "div.elementor-element-b88aa82 h2.elementor-heading-title::text",
+            "nav_links": "nav.elementor-nav-menu--main ul.elementor-nav-menu li.menu-item a.elementor-item",
+            "faq_items": "div.elementor-widget-toggle div.elementor-toggle-item",
+        },
+        # Relative to one navigation link.
+        "nav_link": {
+            "text": "::text",
+            "href": "::attr(href)",
+        },
+        # Relative to one toggle item.
+        "faq_item": {
+            "question": "div.elementor-tab-title a.elementor-toggle-title::text",
+            "question_text": "div.elementor-tab-title ::text",
+            "answer_text": "div.elementor-tab-content ::text",
+        },
+    },
+    "keywords": {},
+}
+
+SITE_SPECS = {spec["name"]: spec for spec in (RVNP_SPEC, HEF_SPEC)}
@@ -2,32 +2,41 @@
 import scrapy
 from urllib.parse import urlparse
 
+from site_scraper.extraction import spec_for
+from site_scraper.items import FaqPageItem
+
 class HefFaqSpider(scrapy.Spider):
     name = "hef_faqs"  # Unique name for this spider
 
-    def __init__(self, site_url="https://www.hef.co.ke/faqs/", *args, **kwargs):
+    def __init__(self, site_url="https://www.hef.co.ke/faqs/", spec=None, *args, **kwargs):
         super(HefFaqSpider, self).__init__(*args, **kwargs)
         
         self.start_urls = [site_url]
         parsed_uri = urlparse(site_url)
         self.allowed_domains = [parsed_uri.netloc]
+        # Selectors of this site, compiled once (see site_specs.py).
+        self.spec = spec_for(site_url, "hef", spec)
         self.logger.info(f"HefFaqSpider initialized for URL: {site_url}")
 
     def parse(self, response):
+        if response.meta.get("page_unchanged"):
+            self.logger.info(f"FAQ page unchanged since the last crawl, skipping: {response.url}")
+            return
         self.logger.info(f"Scraping {response.url}")
+        spec, root = self.spec, response.selector.root
 
        
-        html_page_title = response.css('title::text').get()
+        html_page_title = spec.first(root, 'faq_page', 'page_title')
         
         # Main heading of the FAQ section
-        faq_section_title = response.css('div.elementor-element-b88aa82 h2.elementor-heading-title::text').get()
+        faq_section_title = spec.first(root, 'faq_page', 'section_title')
 
         # 2. Main Navigation Links (Example from the provided sticky header)
         nav_links = []
         # The navigation menu in the sticky header
-        for item in response.css('nav.elementor-nav-menu--main ul.elementor-nav-menu li.menu-item a.elementor-item'):
-            text = item.css('::text').get()
-            href = item.css('::attr(href)').get()
+        for item in spec.all(root, 'faq_page', 'nav_links'):
+            text = spec.first(item, 'nav_link', 'text')
+            href = spec.first(item, 'nav_link', 'href')
             if text and href:
                 nav_links.append({
                     'text': text.strip(),
@@ -35,27 +44,25 @@ class HefFaqSpider(scrapy.Spider):
                 })
         faq_items = []
        
-        for toggle_widget in response.css('div.elementor-widget-toggle'):
-            for item in toggle_widget.css('div.elementor-toggle-item'):
-                question = item.css('div.elementor-tab-title a.elementor-toggle-title::text').get()
-                if not question: # Fallback if <a> tag is not directly there or text is outside
-                    question = "".join(item.css('div.elementor-tab-title ::text').getall()).strip()
-
-                answer_parts = item.css('div.elementor-tab-content ::text').getall()
-                answer = ' '.join(part.strip() for part in answer_parts if part.strip())
-
-                if question and answer:
-                    faq_items.append({
-                        'question': question.strip(),
-                        'answer': answer.strip()
-                    })
+        for item in spec.all(root, 'faq_page', 'faq_items'):
+            question = spec.first(item, 'faq_item', 'question')
+            if not question: # Fallback if <a> tag is not directly there or text is outside
+                question = "".join(spec.all(item, 'faq_item', 'question_text')).strip()
+
+            answer = spec.text(item, 'faq_item', 'answer_text')
+
+            if question and answer:
+                faq_items.append({
+                    'question': question.strip(),
+                    'answer': answer.strip()
+                })
         
         
 
-        yield {
+        yield FaqPageItem({
             'scraped_url': response.url,
             'html_page_title': html_page_title.strip() if html_page_title else None,
             'faq_section_main_title': faq_section_title.strip() if faq_section_title else None,
             'navigation_links': nav_links,
             'faq_list': faq_items,
-        }
\ No newline at end of file
+        })
\ No newline at end of file
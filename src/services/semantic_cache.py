@@ -0,0 +1,211 @@
+import math
+import time
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .retrieval import tokenize
+
+# Words a paraphrase may add or leave out without changing what is asked
+# ("how much is the fee for diploma" / "diploma fees?"). Every other word of
+# the two questions must match for a semantic hit.
+FILLER_WORDS = frozenset(tokenize("""
+much many long kindly help know want need like information info detail details explain
+give list show find there any available currently exactly please duration date offer offered rvnp
+"""))
+
+
+class NgramVectorizer:
+    """
+    Hashed character n-gram TF-IDF vectoriser.
+
+    Stopwords are dropped and n-grams are taken inside each (stemmed) word, so
+    "how much is the fee for diploma" and "diploma fees?" map to close vectors
+    regardless of word order. Hashing keeps the dimensionality fixed, which
+    lets vectors live in one preallocated matrix.
+    """
+
+    def __init__(self, dim: int = 512, ngram_sizes: Tuple[int, ...] = (3, 4)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+        # Until fit() is called every bucket is weighted equally (plain TF).
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _buckets(self, text: str) -> Counter:
+        counts: Counter = Counter()
+        for token in tokenize(text):
+            padded = f" {token} "
+            for n in self.ngram_sizes:
+                for i in range(max(1, len(padded) - n + 1)):
+                    counts[zlib.crc32(padded[i:i + n].encode("utf-8")) % self.dim] += 1
+        return counts
+
+    def fit(self, corpus: Iterable[str]) -> "NgramVectorizer":
+        """
+        Learns smoothed IDF weights per hashed bucket from a reference corpus
+        (typically the knowledge-base text); unseen buckets get the highest weight.
+        """
+        doc_freq = np.zeros(self.dim, dtype=np.float64)
+        n_docs = 0
+        for text in corpus:
+            n_docs += 1
+            for bucket in self._buckets(text):
+                doc_freq[bucket] += 1
+        self.idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        return self
+
+    def transform_one(self, text: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the L2-normalised vector for text, written into out if given.
+        """
+        vector = out if out is not None else np.empty(self.dim, dtype=np.float32)
+        vector.fill(0.0)
+        for bucket, tf in self._buckets(text).items():
+            vector[bucket] = (1.0 + math.log(tf)) * self.idf[bucket]
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            self.transform_one(text, out=matrix[row])
+        return matrix
+
+
+def _candidate_keys(text: str) -> Set[str]:
+    # Word-prefix keys used only to shortlist rows before the exact cosine step.
+    return {token[:5] for token in tokenize(text) if len(token) >= 3}
+
+
+def anchor_terms(text: str) -> FrozenSet[str]:
+    """
+    The (stemmed) words of a question that name what it asks about: its
+    courses, qualification levels, numbers and topics, without filler words.
+    """
+    return frozenset(token for token in tokenize(text) if token not in FILLER_WORDS)
+
+
+class SemanticCache:
+    """
+    Paraphrase-tolerant answer cache.
+
+    Question vectors are stored row-wise in one contiguous float32 matrix.
+    A lookup shortlists rows that share a word prefix with the question (rarest
+    prefixes first, capped at max_candidates), scores them with a single
+    batched matrix-vector product and returns the best answer whose cosine
+    similarity clears the threshold and that asks about the same things (the
+    same anchor_terms), so "diploma fees?" never reuses the answer to "fees
+    for diploma in ICT". Capacity is fixed; the least recently used entry is
+    evicted to make room.
+
+    Vectors are only compared within one knowledge-base version, so callers
+    pass the vectoriser of the version they look up (its IDF changes when
+    the knowledge base is reloaded); the one given here is the default.
+    """
+
+    def __init__(self, vectorizer: NgramVectorizer, capacity: int = 10000,
+                 threshold: float = 0.8, ttl_seconds: float = 6 * 3600.0,
+                 max_candidates: int = 4096):
+        self.vectorizer = vectorizer
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_candidates = max_candidates
+
+        self._matrix = np.zeros((capacity, vectorizer.dim), dtype=np.float32)
+        self._created_at = np.zeros(capacity, dtype=np.float64)
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._versions: List[Optional[str]] = [None] * capacity
+        self._anchors: List[FrozenSet[str]] = [frozenset()] * capacity
+        self._keys: List[Set[str]] = [set() for _ in range(capacity)]
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free = list(range(capacity - 1, -1, -1))
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _candidates(self, keys: Set[str]) -> np.ndarray:
+        postings = sorted((self._postings[key] for key in keys if key in self._postings), key=len)
+        candidates: Set[int] = set()
+        for rows in postings:
+            if len(candidates) + len(rows) > self.max_candidates:
+                if not candidates:
+                    candidates.update(islice(rows, self.max_candidates))
+                break
+            candidates.update(rows)
+        return np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+    def lookup(self, question: str, version: str,
+               vectorizer: Optional[NgramVectorizer] = None) -> Optional[Tuple[str, float]]:
+        """
+        Returns (answer, similarity) for the closest cached question above the
+        threshold that was answered under the same prompt version, else None.
+        """
+        rows = self._candidates(_candidate_keys(question))
+        if rows.size:
+            anchors = anchor_terms(question)
+            query = (vectorizer or self.vectorizer).transform_one(question)
+            scores = self._matrix[rows] @ query
+            above = np.flatnonzero(scores >= self.threshold)
+            now = time.time()
+            for pos in above[np.argsort(scores[above])[::-1]]:
+                score = float(scores[pos])
+                slot = int(rows[pos])
+                if (self._versions[slot] == version and self._anchors[slot] == anchors
+                        and now - self._created_at[slot] < self.ttl_seconds):
+                    self._lru.move_to_end(slot)
+                    self.hits += 1
+                    return self._answers[slot], score
+        self.misses += 1
+        return None
+
+    def add(self, question: str, answer: str, version: str, vectorizer: Optional[NgramVectorizer] = None) -> None:
+        if self.capacity <= 0:
+            return
+        slot = self._free.pop() if self._free else self._evict()
+        keys = _candidate_keys(question)
+        (vectorizer or self.vectorizer).transform_one(question, out=self._matrix[slot])
+        self._created_at[slot] = time.time()
+        self._answers[slot] = answer
+        self._versions[slot] = version
+        self._anchors[slot] = anchor_terms(question)
+        self._keys[slot] = keys
+        for key in keys:
+            self._postings[key].add(slot)
+        self._lru[slot] = None
+
+    def _evict(self) -> int:
+        slot, _ = self._lru.popitem(last=False)
+        for key in self._keys[slot]:
+            rows = self._postings[key]
+            rows.discard(slot)
+            if not rows:
+                del self._postings[key]
+        self._keys[slot] = set()
+        self._answers[slot] = None
+        self._versions[slot] = None
+        self._anchors[slot] = frozenset()
+        self.evictions += 1
+        return slot
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+        }
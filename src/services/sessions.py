@@ -0,0 +1,254 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from .tokens import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+# Fixed cost of one session entry besides its key, turns list and texts, as
+# traced on 64-bit CPython: the OrderedDict slot and linked-list node (up to
+# ~136 bytes, counting the table's spare capacity right after it grows) and
+# the Session object with its boxed last_seen and size values (~128 bytes).
+_SESSION_OVERHEAD_BYTES = 136 + 128
+
+
+def history_messages(turns: List[str], budget_tokens: int) -> List[Dict[str, str]]:
+    """
+    Converts stored turns into chat messages, keeping the most recent
+    question/answer pairs that fit in budget_tokens. Older pairs are dropped.
+    """
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for i in range(len(turns) - 2, -1, -2):
+        question, answer = turns[i], turns[i + 1]
+        cost = estimate_tokens(question) + estimate_tokens(answer) + 2 * MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget_tokens:
+            break
+        used += cost
+        kept.append({"role": "assistant", "content": answer})
+        kept.append({"role": "user", "content": question})
+    kept.reverse()
+    return kept
+
+
+class Session:
+    """
+    One conversation: a flat list of alternating user and assistant texts.
+    """
+    __slots__ = ("turns", "size", "last_seen")
+
+    def __init__(self, now: float):
+        self.turns: List[str] = []
+        self.size = _SESSION_OVERHEAD_BYTES
+        self.last_seen = now
+
+
+class SessionBackend(ABC):
+    """
+    Storage interface for conversation history.
+
+    Implementations keep at most max_turns question/answer pairs per session
+    and forget sessions that have been idle longer than their idle timeout.
+    """
+
+    # Whether the methods block on I/O; callers on the event loop then run them in a worker thread.
+    blocking = False
+
+    @abstractmethod
+    def load(self, session_id: str) -> List[str]:
+        """
+        Returns the session's turns, oldest first, as alternating user and
+        assistant texts; empty for unknown or expired sessions.
+        """
+
+    @abstractmethod
+    def append(self, session_id: str, user_message: str, answer: str) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters and gauges of the store; backends report only the fields that apply to them.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    Per-worker session store with LRU, idle-time and total-memory bounds.
+
+    Sessions are kept in least-recently-used order, so both the idle ones and
+    the eviction candidates are always at the front of the dict.
+    """
+
+    def __init__(self, max_sessions: int = 50000, max_bytes: int = 64 * 2**20,
+                 idle_seconds: float = 1800.0, max_turns: int = 10):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen > self.idle_seconds:
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                self.evictions += 1
+            else:
+                break
+            self._drop(session_id)
+
+    def load(self, session_id: str) -> List[str]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        now = time.time()
+        if now - session.last_seen > self.idle_seconds:
+            self.expirations += 1
+            self._drop(session_id)
+            return []
+        return list(session.turns)
+
+    def append(self, session_id: str, user_message: str, answer: str) -> None:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(now)
+            self._bytes += session.size
+
+        turns = session.turns
+        turns.append(user_message)
+        turns.append(answer)
+        if len(turns) > 2 * self.max_turns:
+            del turns[:len(turns) - 2 * self.max_turns]
+
+        size = (_SESSION_OVERHEAD_BYTES + sys.getsizeof(session_id) + sys.getsizeof(turns)
+                + sum(sys.getsizeof(text) for text in turns))
+        self._bytes += size - session.size
+        session.size = size
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        self._evict(now)
+
+    def delete(self, session_id: str) -> None:
+        self._drop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    SQLite-backed session store shared by every worker on one host.
+
+    A local stand-in for a networked store: all workers open the same file,
+    so a conversation survives being routed to a different worker or a restart.
+    It has no size bound other than the idle timeout, so it never evicts.
+    """
+
+    blocking = True
+    # Expired rows are deleted every this many writes.
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str, idle_seconds: float = 1800.0, max_turns: int = 10):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.idle_seconds = idle_seconds
+        self.max_turns = max_turns
+        self.expirations = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, turns TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self.prune()
+
+    def load(self, session_id: str) -> List[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns FROM sessions WHERE session_id = ? AND last_seen >= ?",
+                (session_id, time.time() - self.idle_seconds),
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def append(self, session_id: str, user_message: str, answer: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT turns FROM sessions WHERE session_id = ? AND last_seen >= ?",
+                    (session_id, now - self.idle_seconds),
+                ).fetchone()
+                turns = json.loads(row[0]) if row else []
+                turns.extend((user_message, answer))
+                turns = turns[-2 * self.max_turns:]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, turns, last_seen) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(turns), now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def prune(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM sessions WHERE last_seen < ?", (time.time() - self.idle_seconds,)
+            ).rowcount
+            self.expirations += deleted
+            return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(turns)), 0) FROM sessions").fetchone()
+        # Expired sessions are counted when their rows are pruned.
+        return {"backend": "sqlite", "sessions": count, "bytes": size, "expirations": self.expirations}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
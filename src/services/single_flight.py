@@ -0,0 +1,100 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+class Flight:
+    """
+    One in-flight upstream answer, shared by every request that asked for it.
+
+    The producer appends text deltas as they arrive; each subscriber replays
+    the deltas already received and then follows the live ones, so late
+    joiners see the full answer.
+    """
+
+    def __init__(self):
+        self.deltas: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _publish(self, delta: Optional[str] = None) -> None:
+        if delta:
+            self.deltas.append(delta)
+        # Wake everyone waiting on the current event, then start a new one.
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.deltas):
+                yield self.deltas[sent]
+                sent += 1
+            if self.error is not None:
+                raise self.error
+            if self.done:
+                return
+            await changed.wait()
+
+    async def result(self) -> str:
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return "".join(self.deltas)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent upstream calls for the same key.
+
+    The first request for a key starts the producer in its own task; requests
+    for the same key arriving before it finishes attach to that flight instead
+    of calling the model again. The task is independent of any one request,
+    so a client disconnecting does not cancel the answer the others wait for.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> Tuple[Flight, bool]:
+        """
+        Returns the flight for key and whether this call started it.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return flight, False
+
+        flight = Flight()
+        self._flights[key] = flight
+        self.leaders += 1
+        flight._task = asyncio.create_task(self._run(key, flight, produce))
+        return flight, True
+
+    async def _run(self, key: str, flight: Flight, produce: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for delta in produce():
+                flight._publish(delta)
+        except asyncio.CancelledError:
+            flight.error = RuntimeError("upstream call was cancelled")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._flights.pop(key, None)
+            flight._publish()
+
+    def stats(self) -> Dict[str, int]:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,31 @@
+import re
+
+# Roughly how BPE tokenisers such as Llama 3's split text: letter runs, digit
+# groups of up to three, runs of punctuation and line breaks.
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]+|_+|\n")
+# Letter runs longer than this usually take more than one token.
+_LONG_WORD = 8
+
+# Tokens the chat template adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast token count estimate for Llama 3-style tokenisers, without loading a
+    vocabulary. Errs slightly high on long or unusual words, so budgets fitted
+    with it leave a little headroom.
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        count += 1 + len(piece) // _LONG_WORD if len(piece) > _LONG_WORD else 1
+    return count
+
+
+def estimate_message_tokens(messages) -> int:
+    """
+    Estimated prompt size of a chat completion request.
+    """
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
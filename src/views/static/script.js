@@ -9,6 +9,17 @@ const sendChatBtn    = document.querySelector("#send-btn");
 let isSending       = false;
 const inputInitH    = chatInput.scrollHeight;
 
+// One conversation per browser tab, so follow-up questions keep their context.
+const SESSION_KEY = "rvnp-chat-session";
+const sessionId   = (() => {
+    let id = sessionStorage.getItem(SESSION_KEY);
+    if (!id) {
+        id = (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+        sessionStorage.setItem(SESSION_KEY, id);
+    }
+    return id;
+})();
+
 // ------------  Text helpers ------------
 const urlRegex = /(\b(https?|ftp|file):\/\/[-A-Z0-9+&@#\/%?=~_|$!:,.;]*[-A-Z0-9+&@#\/%?=~_|$])/ig;
 
@@ -50,18 +61,65 @@ const mkTypingLi = () => {
 };
 
 // ------------  Networking ------------
-async function fetchBotReply(message) {
-    const res = await fetch("/chat", {
+const FALLBACK_REPLY    = "I’m not sure how to respond to that right now. Could you ask something else?";
+const ERROR_REPLY       = "⚠️ Server error. Please try again later.";
+const INTERRUPTED_NOTE  = "⚠️ Response interrupted. Please try again.";
+
+// Reads the /chat/stream SSE response and calls onDelta with the text so far.
+// Throws if the server reports an error or the stream ends before `done`.
+async function streamBotReply(message, onDelta) {
+    const res = await fetch("/chat/stream", {
         method : "POST",
-        headers: { "Content-Type": "application/json" },
-        body   : JSON.stringify({ message })
+        headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+        body   : JSON.stringify({ message, session_id: sessionId })
     });
-    if (!res.ok) throw new Error(`Server ${res.status}`);
-    const data = await res.json();
-    return data.response || "I’m not sure how to respond to that right now. Could you ask something else?";
+    if (!res.ok || !res.body) throw new Error(`Server ${res.status}`);
+
+    const reader  = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let text   = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let event = "message";
+            let data  = "";
+            for (const line of rawEvent.split("\n")) {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            const payload = data ? JSON.parse(data) : {};
+
+            if (event === "delta") {
+                text += payload.delta;
+                onDelta(text);
+            } else if (event === "error") {
+                throw new Error(payload.error || "Stream error");
+            } else if (event === "done") {
+                return text;
+            }
+        }
+    }
+    throw new Error("Stream ended before done");
 }
 
 // ------------  UI actions ------------
+function unlockInput() {
+    isSending                        = false;
+    chatInput.disabled               = false;
+    sendChatBtn.style.pointerEvents  = "auto";
+    sendChatBtn.style.visibility     = "hidden";
+    chatInput.focus();
+}
+
 async function sendMessage() {
     const raw = chatInput.value.trim();
     if (isSending || !raw) return;
@@ -77,25 +135,40 @@ async function sendMessage() {
     chatbox.appendChild(typingLi);
     scrollBottom();
 
+    // The reply bubble replaces the typing indicator on the first token and
+    // is re-rendered at most once per animation frame while tokens arrive.
+    let replyLi   = null;
+    let pending   = null;
+    let scheduled = false;
+    const render  = (text) => {
+        pending = text;
+        if (scheduled) return;
+        scheduled = true;
+        requestAnimationFrame(() => {
+            scheduled = false;
+            if (!replyLi) {
+                typingLi.remove();
+                replyLi = mkMessageLi("");
+                chatbox.appendChild(replyLi);
+            }
+            replyLi.querySelector("p").innerHTML = processText(pending);
+            chatbox.scrollTop = chatbox.scrollHeight;
+        });
+    };
+
     let reply;
-    try   { reply = await fetchBotReply(raw); }
-    catch (e) {
+    try {
+        reply = await streamBotReply(raw, render);
+    } catch (e) {
         console.error(e);
-        reply = "⚠️ Server error. Please try again later.";
+        // Retrying would ask the model again, so report the failure instead;
+        // a partial answer stays on screen, marked as cut off.
+        reply = pending === null ? ERROR_REPLY : `${pending} ${INTERRUPTED_NOTE}`;
     }
 
-    // Maintain illusion of typing for at least 800 ms
-    setTimeout(() => {
-        typingLi.remove();
-        chatbox.appendChild(mkMessageLi(reply));
-        scrollBottom();
-
-        isSending                        = false;
-        chatInput.disabled               = false;
-        sendChatBtn.style.pointerEvents  = "auto";
-        sendChatBtn.style.visibility     = "hidden";
-        chatInput.focus();
-    }, 800);
+    render(reply || FALLBACK_REPLY);
+    scrollBottom();
+    unlockInput();
 }
 
 function scrollBottom() {
@@ -0,0 +1,120 @@
+from typing import AsyncIterator, Dict, Iterator, List
+
+import pytest
+from fastapi.testclient import TestClient
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from src import main
+from src.services.app_state import AppServices
+from src.services.chat_service import ChatService
+from src.services.config import (
+    BatchSettings, CatalogSettings, FaqSettings, KnowledgeSettings, LLMSettings, RetrievalSettings,
+)
+from src.services.data_loader import DATASET_FILE, load_and_process_rag_data
+from src.services.knowledge import KnowledgeBase, build_knowledge_base
+from src.services.knowledge_store import KnowledgeStore
+from src.services.metrics import ChatMetrics
+
+
+class FakeClient:
+    """
+    Stands in for LLMClient: records the prompts it is sent and answers each
+    with a fixed text, or raises the configured error (in a stream, after the
+    first words_before_error words).
+    """
+
+    def __init__(self, answer: str = "model answer", error: Exception = None, words_before_error: int = 0):
+        self.settings = LLMSettings(api_key="test")
+        self.metrics = ChatMetrics()
+        self.answer = answer
+        self.error = error
+        self.words_before_error = words_before_error
+        self.prompts: List[List[Dict[str, str]]] = []
+        self.closed = False
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        self.prompts.append(messages)
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        self.prompts.append(messages)
+        for sent, word in enumerate(self.answer.split(" ")):
+            if self.error is not None and sent == self.words_before_error:
+                raise self.error
+            yield word + " "
+        if self.error is not None:
+            raise self.error
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture(scope="session")
+def knowledge() -> KnowledgeBase:
+    return build_knowledge_base(load_and_process_rag_data(DATASET_FILE))
+
+
+@pytest.fixture
+def make_service(knowledge):
+    def make(client: FakeClient, **kwargs) -> ChatService:
+        return ChatService(KnowledgeStore(knowledge), client, RetrievalSettings(), FaqSettings(), CatalogSettings(),
+                           **kwargs)
+    return make
+
+
+@pytest.fixture
+def app_services(knowledge) -> AppServices:
+    client = FakeClient()
+    knowledge_store = KnowledgeStore(knowledge)
+    return AppServices(
+        knowledge_settings=KnowledgeSettings(watch_interval=0),
+        batch_settings=BatchSettings(max_items=10, max_concurrency=2),
+        knowledge_store=knowledge_store,
+        client=client,
+        response_cache=None,
+        semantic_cache=None,
+        single_flight=None,
+        sessions=None,
+        metrics=client.metrics,
+        chat_service=ChatService(knowledge_store, client, RetrievalSettings(), FaqSettings(), CatalogSettings()),
+    )
+
+
+@pytest.fixture
+def app_client(app_services, monkeypatch) -> Iterator[TestClient]:
+    """
+    The app with its lifespan running on app_services instead of services built from the environment.
+    """
+    monkeypatch.setattr(main, "build_services", lambda: app_services)
+    with TestClient(main.create_app()) as client:
+        yield client
+
+
+class ScraperTestSpider(Spider):
+    name = "test_spider"
+
+
+@pytest.fixture
+def page_url() -> str:
+    return "http://example.test/dept/"
+
+
+@pytest.fixture
+def spider() -> ScraperTestSpider:
+    return ScraperTestSpider()
+
+
+@pytest.fixture
+def make_crawler(tmp_path):
+    """
+    Builds crawlers of the test spider that keep their crawl state, delta
+    files and shards under tmp_path; keyword arguments override settings.
+    """
+    def make(**settings):
+        return get_crawler(ScraperTestSpider, {"INCREMENTAL_STATE_DIR": str(tmp_path / "state"),
+                                               "INCREMENTAL_DELTA_FILE": str(tmp_path / "%(name)s_delta.jsonl"),
+                                               "SHARD_DIR": str(tmp_path / "shards"), **settings})
+    return make
@@ -0,0 +1,118 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from src import main
+from src.services.chat_service import RATE_LIMITED_ERROR, UNAVAILABLE_ERROR
+from src.services.config import KnowledgeSettings
+from src.services.providers import UpstreamUnavailable
+from src.services.rate_limiter import RateLimitExceeded
+from src.services.response_cache import ResponseCache
+from src.services.sessions import InMemorySessionBackend
+
+QUESTION = "Tell me about the hostel accommodation rules"
+FAQ_QUESTION = "What is the Higher Education Variable Scholarships and Loans Funding/New Funding Model?"
+
+
+def _events(response):
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        event, data = "message", ""
+        for line in block.split("\n"):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data += line[len("data:"):].strip()
+        events.append((event, json.loads(data) if data else {}))
+    return events
+
+
+def test_chat_stream_sends_meta_deltas_then_done(app_client, app_services):
+    app_services.client.answer = "The hostel closes at ten."
+    response = app_client.post("/chat/stream", json={"message": QUESTION})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response)
+    assert events[0] == ("meta", {"source": "model"})
+    assert [name for name, _ in events[1:]] == ["delta"] * 5 + ["done"]
+    assert "".join(data["delta"] for _, data in events[1:-1]) == "The hostel closes at ten. "
+
+
+def test_chat_stream_reports_a_failure_mid_answer_as_an_error_event(app_client, app_services):
+    app_services.client.answer = "The hostel closes at ten."
+    app_services.client.error = RuntimeError("connection reset")
+    app_services.client.words_before_error = 2
+    events = _events(app_client.post("/chat/stream", json={"message": QUESTION}))
+    assert [name for name, _ in events] == ["meta", "delta", "delta", "error"]
+    assert events[-1][1] == {"error": "Internal server error"}
+
+
+def test_chat_stream_reports_a_failure_before_the_first_delta_as_an_error_event(app_client, app_services):
+    app_services.client.error = RuntimeError("connection refused")
+    events = _events(app_client.post("/chat/stream", json={"message": QUESTION}))
+    assert events == [("error", {"error": "Internal server error"})]
+
+
+def test_lifespan_serves_chat_and_closes_the_services(app_services, monkeypatch):
+    closed = []
+    app_services.response_cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    app_services.sessions = InMemorySessionBackend(max_sessions=8, max_bytes=2**20, idle_seconds=60, max_turns=4)
+    monkeypatch.setattr(app_services.response_cache, "close", lambda: closed.append("response_cache"))
+    monkeypatch.setattr(app_services.sessions, "close", lambda: closed.append("sessions"))
+    # The knowledge watcher runs too, and has to be stopped on shutdown.
+    app_services.knowledge_settings = KnowledgeSettings(watch_interval=0.01)
+    monkeypatch.setattr(main, "build_services", lambda: app_services)
+
+    app_services.client.answer = "The hostel closes at ten."
+    with TestClient(main.create_app()) as client:
+        assert client.app.state.services is app_services
+        response = client.post("/chat", json={"message": QUESTION})
+        assert response.json() == {"response": "The hostel closes at ten.", "source": "model"}
+        assert not app_services.client.closed and closed == []
+    assert app_services.client.closed
+    assert closed == ["response_cache", "sessions"]
+
+
+def _batch_errors(app_client):
+    metrics = app_client.get("/metrics").text
+    line = next(line for line in metrics.splitlines() if line.startswith('chat_errors_total{endpoint="chat_batch"}'))
+    return int(float(line.split()[-1]))
+
+
+def test_batch_returns_results_in_request_order_and_counts_each_failed_item_once(app_client, app_services):
+    app_services.client.error = RuntimeError("connection reset")
+    messages = [QUESTION, FAQ_QUESTION, "  tell me about the HOSTEL accommodation rules?", "When does the term start?"]
+    results = app_client.post("/chat/batch", json={"messages": messages}).json()["results"]
+    error = {"error": "Internal server error"}
+    assert results[0] == results[2] == results[3] == error
+    assert results[1]["source"] == "faq"
+    # The repeated question failed once but stands for two items.
+    assert _batch_errors(app_client) == 3
+
+
+def test_batch_counts_items_shed_by_admission_control(app_client, app_services):
+    app_services.client.error = RateLimitExceeded(2.5, "queue full")
+    results = app_client.post("/chat/batch", json={"messages": [QUESTION, QUESTION, FAQ_QUESTION]}).json()["results"]
+    assert results[0] == results[1] == {"error": RATE_LIMITED_ERROR, "retry_after": 3}
+    assert results[2]["source"] == "faq"
+    assert _batch_errors(app_client) == 2
+
+
+def test_batch_counts_items_shed_for_unavailable_backends(app_client, app_services):
+    app_services.client.error = UpstreamUnavailable(retry_after=2.5)
+    results = app_client.post("/chat/batch", json={"messages": [QUESTION, QUESTION, FAQ_QUESTION]}).json()["results"]
+    assert results[0] == results[1] == {"error": UNAVAILABLE_ERROR, "retry_after": 3}
+    assert results[2]["source"] == "faq"
+    assert _batch_errors(app_client) == 2
+
+
+def test_streamed_batch_sends_one_result_per_item_then_done(app_client, app_services):
+    app_services.client.answer = "The hostel closes at ten."
+    events = _events(app_client.post("/chat/batch", json={"messages": [QUESTION, FAQ_QUESTION, QUESTION],
+                                                          "stream": True}))
+    assert events[-1] == ("done", {})
+    by_index = {data["index"]: data for name, data in events[:-1]}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[0]["response"] == by_index[2]["response"] == "The hostel closes at ten."
+    assert by_index[1]["source"] == "faq"
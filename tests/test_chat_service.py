@@ -0,0 +1,86 @@
+import asyncio
+from dataclasses import replace
+
+from src.services.chat_service import RATE_LIMITED_ERROR, SOURCE_FAQ, SOURCE_MODEL, UNAVAILABLE_ERROR
+from src.services.knowledge import KnowledgeBase
+from src.services.providers import UpstreamUnavailable
+from src.services.rate_limiter import RateLimitExceeded
+from src.services.response_cache import ResponseCache
+from src.services.single_flight import SingleFlight
+
+from conftest import FakeClient
+
+QUESTION = "Tell me about the hostel accommodation rules"
+FAQ_QUESTION = "What is the Higher Education Variable Scholarships and Loans Funding/New Funding Model?"
+
+
+async def _collect(results):
+    return [result async for result in results]
+
+
+def test_batch_reports_unavailable_backends_as_unavailable(make_service):
+    service = make_service(FakeClient(error=UpstreamUnavailable(retry_after=12)))
+    [result] = asyncio.run(_collect(service.reply_batch([QUESTION, QUESTION.upper()], max_concurrency=2)))
+    assert result.indices == [0, 1]
+    assert result.error == UNAVAILABLE_ERROR
+    assert result.retry_after == 12
+
+
+def test_batch_reports_shed_questions_as_rate_limited(make_service):
+    service = make_service(FakeClient(error=RateLimitExceeded(3, "queue full")))
+    [result] = asyncio.run(_collect(service.reply_batch([QUESTION], max_concurrency=1)))
+    assert result.error == RATE_LIMITED_ERROR
+    assert result.retry_after == 3
+
+
+def test_concurrent_identical_questions_share_one_upstream_call(make_service):
+    client = FakeClient()
+    service = make_service(client, single_flight=SingleFlight())
+
+    async def run():
+        return await asyncio.gather(*(service.reply(QUESTION) for _ in range(5)))
+
+    replies = asyncio.run(run())
+    assert {reply.source for reply in replies} == {SOURCE_MODEL}
+    assert len(client.prompts) == 1
+
+
+def test_context_version_tracks_the_retrieved_documents_and_the_template(knowledge):
+    documents = knowledge.retrieve(QUESTION, 3)
+    version = knowledge.context_version(documents)
+    assert knowledge.context_version(list(documents)) == version
+    assert knowledge.context_version(documents[1:]) != version
+    assert replace(knowledge, retrieval_prompt_version="other").context_version(documents) != version
+
+
+def _count_retrievals(monkeypatch):
+    calls = []
+    retrieve = KnowledgeBase.retrieve
+
+    def counting(self, question, top_k):
+        calls.append(question)
+        return retrieve(self, question, top_k)
+
+    monkeypatch.setattr(KnowledgeBase, "retrieve", counting)
+    return calls
+
+
+def test_faq_answers_skip_retrieval(make_service, monkeypatch):
+    calls = _count_retrievals(monkeypatch)
+    client = FakeClient()
+    service = make_service(client, response_cache=ResponseCache(max_entries=8, ttl_seconds=60))
+    reply = asyncio.run(service.reply(FAQ_QUESTION))
+    assert reply.source == SOURCE_FAQ
+    assert calls == [] and client.prompts == []
+
+
+def test_model_replies_retrieve_once_and_are_cached_on_the_context(make_service, knowledge, monkeypatch):
+    calls = _count_retrievals(monkeypatch)
+    client = FakeClient()
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    service = make_service(client, response_cache=cache)
+    assert asyncio.run(service.reply(QUESTION)).source == SOURCE_MODEL
+    assert calls == [QUESTION]
+
+    documents = knowledge.retrieve(QUESTION, service.retrieval_settings.top_k)
+    assert asyncio.run(cache.get(cache.make_key(QUESTION, knowledge.context_version(documents)))) == client.answer
@@ -0,0 +1,59 @@
+from src.services.chunking import chunk_section, chunk_sections, content_id, section_key, split_text
+from src.services.retrieval import Document
+
+SENTENCES = [f"Sentence number {i} says something about the hostel and its rules." for i in range(40)]
+TEXT = " ".join(SENTENCES)
+
+
+def _section(text=TEXT, title="Accommodation"):
+    return Document("accommodation", "general_info", title, text)
+
+
+def test_content_id_depends_only_on_the_parts():
+    assert content_id("a", "bc") == content_id("a", "bc")
+    assert content_id("a", "bc") != content_id("ab", "c")
+    assert len(content_id("a")) == 16
+
+
+def test_split_text_is_deterministic_and_overlaps():
+    chunks = split_text(TEXT, max_tokens=64, overlap_tokens=16)
+    assert chunks == split_text(TEXT, max_tokens=64, overlap_tokens=16)
+    assert len(chunks) > 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # Every chunk starts with the last sentence of the one before it.
+        assert previous.endswith(chunk.split(".")[0] + ".")
+    assert all(sentence in " ".join(chunks) for sentence in SENTENCES)
+
+
+def test_split_text_cuts_an_oversized_sentence_between_words():
+    chunks = split_text("word " * 400, max_tokens=32, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(set(chunk.split()) == {"word"} for chunk in chunks)
+
+
+def test_chunk_ids_are_content_derived_and_share_the_parent():
+    section = _section()
+    chunks = chunk_section(section)
+    assert len(chunks) > 1
+    assert {chunk.parent_id for chunk in chunks} == {section_key(section)}
+    assert all(chunk.doc_id == content_id(chunk.kind, chunk.title, chunk.text) for chunk in chunks)
+    assert chunks[1].text.startswith("Accommodation (continued):\n")
+
+    # Editing the last sentence keeps the IDs of the chunks before it.
+    edited = chunk_section(_section(TEXT.replace("number 39", "number thirty-nine")))
+    assert [chunk.doc_id for chunk in edited[:-1]] == [chunk.doc_id for chunk in chunks[:-1]]
+    assert edited[-1].doc_id != chunks[-1].doc_id
+
+
+def test_unchunked_kinds_stay_whole():
+    table = Document("table", "course_table", "Courses", TEXT)
+    [chunk] = chunk_section(table)
+    assert chunk.text == TEXT
+
+
+def test_chunk_sections_reuses_the_chunks_of_unchanged_sections():
+    unchanged, changed = _section(title="Accommodation"), _section(title="Library")
+    previous = chunk_sections([unchanged, changed])
+    reused = chunk_sections([unchanged, _section("The library opens at 8am.", "Library")], previous)
+    assert reused[section_key(unchanged)] is previous[section_key(unchanged)]
+    assert section_key(changed) not in reused
@@ -0,0 +1,115 @@
+import json
+import os
+
+from src.combine_files import (
+    INDEX_SUFFIX, build_index, index_entries, load_index, merge_changes, read_changes, record_key, tombstone,
+)
+from src.services.data_loader import load_and_process_rag_data
+
+URL = "http://example.test/dept/"
+
+
+def _record(title, text):
+    return {"source_url": URL, "content_type": "course_info", "title": title, "text_content": text,
+            "metadata": {"section": title}}
+
+
+def _change(record):
+    return record_key(record), (json.dumps(record) + "\n").encode("utf-8")
+
+
+def _courses(path):
+    return {record["title"]: record["text_content"] for record in load_and_process_rag_data(path)["courses"]}
+
+
+def _dataset(tmp_path, *records):
+    path = str(tmp_path / "combined.jsonl")
+    merge_changes(path, [_change(record) for record in records])
+    return path
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_upsert_inserts_updates_and_keeps_missing_records(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y"))
+    counts = merge_changes(path, [_change(_record("Course: Y", "Diploma in Y, revised")),
+                                  _change(_record("Course: Z", "Diploma in Z"))])
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 0, "unchanged": 0}
+    # X is absent from the changes but kept.
+    assert _courses(path) == {"Course: X": "Diploma in X", "Course: Y": "Diploma in Y, revised",
+                              "Course: Z": "Diploma in Z"}
+
+
+def test_merge_only_appends_the_changes(tmp_path):
+    x, y = _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y")
+    path = _dataset(tmp_path, x, y)
+    before = _read(path)
+    offset_of_y = len(_change(x)[1])
+    revised = _change(_record("Course: Y", "Diploma in Y, revised"))
+    merge_changes(path, [revised])
+    # The old line stays in place and a tombstone supersedes it.
+    assert _read(path) == before + revised[1] + tombstone(offset_of_y)
+    assert index_entries(load_index(path))[revised[0]] == [len(before), len(revised[1])]
+
+
+def test_removed_delta_lines_delete(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y"))
+    delta = tmp_path / "delta.jsonl"
+    delta.write_text(
+        json.dumps({"op": "removed", "key": record_key(_record("Course: X", "")), "record": None}) + "\n"
+        + json.dumps({"op": "added", "key": "", "record": _record("Course: Z", "Diploma in Z")}) + "\n"
+        + json.dumps({"op": "removed", "key": "unknown|course_info|Course: W", "record": None}) + "\n",
+        encoding="utf-8")
+    counts = merge_changes(path, read_changes([str(delta)]))
+    assert counts == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 0}
+    assert _courses(path) == {"Course: Y": "Diploma in Y", "Course: Z": "Diploma in Z"}
+
+
+def test_superseded_lines_are_compacted_away(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y"))
+    for i in range(4):
+        merge_changes(path, [_change(_record("Course: Y", f"Diploma in Y, revision {i}"))])
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    assert _courses(path) == {"Course: X": "Diploma in X", "Course: Y": "Diploma in Y, revision 3"}
+    # The index still matches the file after the rewrite.
+    assert index_entries(load_index(path)) == index_entries(build_index(path))
+
+
+def test_unchanged_merge_leaves_the_file_untouched(tmp_path):
+    record = _record("Course: X", "Diploma in X")
+    path = _dataset(tmp_path, record)
+    before = os.stat(path).st_mtime_ns
+    assert merge_changes(path, [_change(record)]) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 1}
+    assert os.stat(path).st_mtime_ns == before
+
+
+def test_replace_rebuilds_from_the_changes_alone(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y"))
+    counts = merge_changes(path, [_change(_record("Course: Y", "Diploma in Y"))], replace=True)
+    assert counts["inserted"] == 1
+    assert _courses(path) == {"Course: Y": "Diploma in Y"}
+    assert sorted(os.listdir(tmp_path)) == ["combined.jsonl", "combined.jsonl" + INDEX_SUFFIX]
+
+
+def test_index_is_persisted_and_rebuilt_after_outside_edits(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"), _record("Course: Y", "Diploma in Y"))
+    assert os.path.exists(path + INDEX_SUFFIX)
+    merge_changes(path, [_change(_record("Course: Y", "Diploma in Y, revised"))])
+    assert index_entries(load_index(path)) == index_entries(build_index(path))
+
+    with open(path, "ab") as f:
+        f.write(_change(_record("Course: Z", "Diploma in Z"))[1])
+    assert index_entries(load_index(path)) == index_entries(build_index(path))
+    assert merge_changes(path, [_change(_record("Course: Z", "Diploma in Z"))])["unchanged"] == 1
+
+
+def test_a_torn_last_line_does_not_swallow_the_next_merge(tmp_path):
+    path = _dataset(tmp_path, _record("Course: X", "Diploma in X"))
+    with open(path, "ab") as f:
+        f.write(_change(_record("Course: Y", "Diploma in Y"))[1][:20])
+    merge_changes(path, [_change(_record("Course: Z", "Diploma in Z"))])
+    assert _courses(path) == {"Course: X": "Diploma in X", "Course: Z": "Diploma in Z"}
@@ -0,0 +1,47 @@
+from src.services.course_catalog import CourseCatalog
+
+COURSES = [
+    {"department": "ICT", "courses": [
+        {"curricula": "Diploma in Information Communication Technology", "level": "6", "duration": "3 years",
+         "requirements": "KCSE C-"},
+        {"curricula": "Certificate in Information Communication Technology", "level": "5", "duration": "2 years",
+         "requirements": "KCSE D"},
+        {"curricula": "Artisan in Computer Studies", "level": None, "duration": "1 year", "requirements": "KCPE"},
+    ]},
+]
+FEES = {
+    "title": "Fees",
+    "annual_fees": [{"item": "Tuition", "cost": 56420}, {"item": "Exam", "cost": None}],
+    "new_student_fees": {
+        "diploma_level_6": {"total": 3000, "registration": 1000, "student_id": 500, "student_union": 1500},
+    },
+}
+
+
+def test_answers_a_clearly_named_course():
+    answer = CourseCatalog(COURSES, FEES).answer("requirements for diploma in information communication technology")
+    assert answer.course.name == "Diploma in Information Communication Technology"
+    assert "KCSE C-" in answer.text
+
+
+def test_question_matching_two_levels_equally_is_left_to_the_model():
+    catalog = CourseCatalog(COURSES, FEES)
+    assert catalog.answer("requirements for information communication technology") is None
+    assert catalog.answer("requirements for certificate in information communication technology").course.level == "5"
+
+
+def test_fee_answer_tolerates_a_missing_cost():
+    answer = CourseCatalog(COURSES, FEES).answer("fees for diploma in information communication technology")
+    assert "Tuition: 56,420.00 KES" in answer.text
+    assert "Exam: N/A" in answer.text
+    assert "Total 3,000.00 KES" in answer.text
+
+
+def test_question_without_an_attribute_gets_no_direct_answer():
+    assert CourseCatalog(COURSES, FEES).answer("artisan in computer studies") is None
+
+
+def test_rows_for_returns_the_matching_courses_best_first():
+    rows = CourseCatalog(COURSES, FEES).rows_for("diploma in information communication technology")
+    assert rows[0].name == "Diploma in Information Communication Technology"
+    assert CourseCatalog(COURSES, FEES).rows_for("swimming") == []
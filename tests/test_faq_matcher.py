@@ -0,0 +1,38 @@
+from src.services.config import FaqSettings
+from src.services.faq_matcher import FaqMatcher
+from src.services.semantic_cache import NgramVectorizer
+
+FAQS = [
+    {"question": "1. How do I apply for a hostel room?", "answer": "Apply at the dean of students' office."},
+    {"question": "What are the fees for the diploma in ICT?", "answer": "KES 56,420 per year."},
+]
+
+
+def _matcher():
+    vectorizer = NgramVectorizer().fit(faq["question"] for faq in FAQS)
+    return FaqMatcher(FAQS, vectorizer)
+
+
+def test_exact_questions_match_with_full_confidence():
+    match = _matcher().match("how do i apply for a hostel room")
+    assert match.question == "How do I apply for a hostel room?"
+    assert match.confidence == 1.0
+
+
+def test_rewordings_with_the_same_anchor_terms_match():
+    match = _matcher().match("how can I apply for a room in the hostel?")
+    assert match.answer == "Apply at the dean of students' office."
+    assert match.confidence >= FaqSettings().threshold
+
+
+def test_questions_about_something_else_do_not_match():
+    matcher = _matcher()
+    assert matcher.match("How do I apply for a library card?") is None
+    assert matcher.match("What are the fees for the certificate in ICT?") is None
+
+
+def test_near_wordings_of_stored_faqs_are_not_answered_from_them(knowledge):
+    threshold = FaqSettings().threshold
+    for question in ("Is the application for funds mandatory?", "What happens to my fund if I defer my studies?"):
+        match = knowledge.faq_matcher.match(question)
+        assert match is None or match.confidence < threshold, (question, match)
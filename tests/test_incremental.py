@@ -0,0 +1,66 @@
+import asyncio
+import inspect
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+
+from site_scraper.incremental import IncrementalCrawlMiddleware, page_fingerprint, record_key
+from site_scraper.items import SiteScraperItem
+
+BODY = b"<html><body><p>The department trains technicians.</p></body></html>"
+
+
+async def _output(middleware, response, spider, results):
+    async def result():
+        for item in results:
+            yield item
+    return [item async for item in middleware.process_spider_output(response, result(), spider)]
+
+
+def test_hooks_take_the_spider_argument():
+    for hook in (IncrementalCrawlMiddleware.process_spider_input, IncrementalCrawlMiddleware.process_spider_output):
+        assert "spider" in inspect.signature(hook).parameters
+
+
+def test_fingerprint_ignores_scripts_styles_and_comments():
+    noisy = b"<html><script>var nonce = 1;</script><!-- 12:00 --><body><p>The department trains technicians.</p>" \
+            b"<style>p {}</style></body></html>"
+    assert page_fingerprint(noisy) == page_fingerprint(BODY)
+    assert page_fingerprint(noisy) == page_fingerprint(noisy.replace(b"nonce = 1", b"nonce = 2"))
+    assert page_fingerprint(BODY) != page_fingerprint(BODY.replace(b"technicians", b"artisans"))
+
+
+def test_record_key_uses_the_section_and_falls_back_to_the_title(page_url):
+    record = {"source_url": page_url, "content_type": "course_info", "title": "Course: X", "metadata": {"section": "S"}}
+    assert record_key(record) == f"{page_url}|course_info|S"
+    assert record_key({**record, "metadata": {}}) == f"{page_url}|course_info|Course: X"
+    assert record_key({"scraped_url": page_url}) == f"{page_url}|faq_page|"
+
+
+def test_unchanged_page_yields_only_its_requests(make_crawler, spider, page_url):
+    middleware = IncrementalCrawlMiddleware.from_crawler(make_crawler())
+    middleware.spider_opened(spider)
+    middleware.state.pages = {page_url: {"fingerprint": page_fingerprint(BODY), "records": {}}}
+    response = HtmlResponse(page_url, body=BODY, request=Request(page_url))
+    middleware.process_spider_input(response, spider)
+    assert response.meta["page_unchanged"]
+
+    follow = Request("http://example.test/next/")
+    item = SiteScraperItem(source_url=page_url, content_type="course_info", title="Course: X", text_content="x")
+    assert asyncio.run(_output(middleware, response, spider, [item, follow])) == [follow]
+    middleware.spider_closed(spider, "finished")
+
+
+def test_changed_page_passes_its_items_on_tagged_with_the_page(make_crawler, spider, page_url):
+    middleware = IncrementalCrawlMiddleware.from_crawler(make_crawler())
+    middleware.spider_opened(spider)
+    response = HtmlResponse(page_url, body=BODY, request=Request(page_url))
+    middleware.process_spider_input(response, spider)
+    assert not response.meta["page_unchanged"]
+
+    item = SiteScraperItem(source_url=page_url, content_type="course_info", title="Course: X", text_content="x")
+    assert asyncio.run(_output(middleware, response, spider, [item])) == [item]
+    assert middleware.state.item_pages == {id(item): page_url}
+    middleware.item_discarded(item)
+    assert middleware.state.item_pages == {}
+    middleware.spider_closed(spider, "finished")
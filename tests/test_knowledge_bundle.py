@@ -0,0 +1,88 @@
+import json
+import shutil
+
+import pytest
+
+from src.services import knowledge_bundle
+from src.services.data_loader import DATASET_FILE
+from src.services.knowledge_bundle import (
+    compile_bundle, content_hash, load_knowledge_base, read_bundle, write_bundle,
+)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    dataset = str(tmp_path / "combined.jsonl")
+    shutil.copyfile(DATASET_FILE, dataset)
+    return dataset, str(tmp_path / "knowledge.bundle")
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = knowledge_bundle.build_knowledge_base
+
+    def counting(*args):
+        calls.append(args)
+        return build(*args)
+
+    monkeypatch.setattr(knowledge_bundle, "build_knowledge_base", counting)
+    return calls
+
+
+def test_written_bundle_reads_back_as_the_same_knowledge_base(paths):
+    dataset, bundle = paths
+    kb, source_hash = compile_bundle(dataset, bundle)
+    loaded = read_bundle(bundle, expected_hash=source_hash)
+    assert loaded.version == kb.version
+    assert [doc.doc_id for doc in loaded.documents] == [doc.doc_id for doc in kb.documents]
+    assert loaded.chunks.keys() == kb.chunks.keys()
+
+
+def test_up_to_date_bundle_is_loaded_without_rebuilding(paths, builds):
+    dataset, bundle = paths
+    kb, _ = compile_bundle(dataset, bundle)
+    builds.clear()
+    assert load_knowledge_base(dataset, bundle).version == kb.version
+    assert builds == []
+
+
+def test_stale_bundle_is_rejected_and_rebuilt(paths, builds):
+    dataset, bundle = paths
+    kb, old_hash = compile_bundle(dataset, bundle)
+    with open(dataset, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"source_url": "http://example.test/news", "content_type": "general_info",
+                            "title": "News", "text_content": "The library now opens at 7am."}) + "\n")
+    new_hash = content_hash(dataset)
+    assert new_hash != old_hash
+    assert read_bundle(bundle, expected_hash=new_hash) is None
+
+    builds.clear()
+    rebuilt = load_knowledge_base(dataset, bundle)
+    assert len(builds) == 1
+    assert rebuilt.version != kb.version
+    assert read_bundle(bundle, expected_hash=new_hash).version == rebuilt.version
+
+
+def test_corrupt_or_foreign_bundles_are_ignored_and_rebuilt(paths, builds):
+    dataset, bundle = paths
+    source_hash = content_hash(dataset)
+    with open(bundle, "wb") as f:
+        f.write(knowledge_bundle._header(source_hash) + b"not a pickle")
+    assert read_bundle(bundle, expected_hash=source_hash) is None
+
+    with open(bundle, "wb") as f:
+        f.write(b"PK\x03\x04 something else entirely")
+    assert read_bundle(bundle) is None
+
+    builds.clear()
+    kb = load_knowledge_base(dataset, bundle)
+    assert len(builds) == 1
+    assert read_bundle(bundle, expected_hash=source_hash).version == kb.version
+
+
+def test_a_failed_write_leaves_no_temp_file(paths, tmp_path):
+    _, bundle = paths
+    with pytest.raises(Exception):
+        write_bundle(lambda: None, "hash", bundle)
+    assert [path.name for path in tmp_path.iterdir()] == ["combined.jsonl"]
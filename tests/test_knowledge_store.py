@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+
+from src.services import knowledge_bundle
+from src.services.data_loader import DATASET_FILE
+from src.services.knowledge_bundle import load_knowledge_base
+from src.services.knowledge_store import KnowledgeStore
+
+NEWS = {"source_url": "http://example.test/news", "content_type": "general_info", "title": "News",
+        "text_content": "The library now opens at 7am."}
+
+
+@pytest.fixture
+def store(tmp_path):
+    dataset = str(tmp_path / "combined.jsonl")
+    bundle = str(tmp_path / "knowledge.bundle")
+    shutil.copyfile(DATASET_FILE, dataset)
+    return KnowledgeStore(load_knowledge_base(dataset, bundle), dataset, bundle)
+
+
+def _append(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _touch_later(path):
+    # Coarse filesystem timestamps would otherwise hide a quick rewrite from the watcher.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_reload_swaps_in_the_new_version(store):
+    old = store.current
+    _append(store.dataset_file, NEWS)
+    assert asyncio.run(store.reload())
+    assert store.current.version != old.version
+    assert store.status()["reloads"] == 1
+    assert not asyncio.run(store.reload())
+
+
+def test_an_empty_or_unreadable_dataset_keeps_the_current_version(store):
+    old = store.current
+    with open(store.dataset_file, "w", encoding="utf-8") as f:
+        f.write('{"source_url": "http://example.test/", "title": "Trunc')
+    assert not asyncio.run(store.reload())
+    assert store.current is old
+    status = store.status()
+    assert status["failed_reloads"] == 1
+    assert "empty knowledge base" in status["last_error"]
+
+
+def test_a_failing_build_keeps_the_current_version(store, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("disk full")
+
+    old = store.current
+    _append(store.dataset_file, NEWS)
+    monkeypatch.setattr(knowledge_bundle, "build_knowledge_base", fail)
+    assert not asyncio.run(store.reload())
+    assert store.current is old
+    assert store.status()["last_error"] == "RuntimeError: disk full"
+
+    monkeypatch.undo()
+    assert asyncio.run(store.reload())
+    assert store.status()["last_error"] is None
+
+
+def test_watcher_reloads_when_the_dataset_changes(store):
+    old = store.current
+
+    async def run():
+        watcher = asyncio.create_task(store.watch(0.01))
+        await asyncio.sleep(0.05)
+        assert store.current is old
+        _append(store.dataset_file, NEWS)
+        _touch_later(store.dataset_file)
+        for _ in range(200):
+            if store.current is not old:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(run())
+    assert store.current.version != old.version
+    assert store.reloads == 1
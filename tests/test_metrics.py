@@ -0,0 +1,58 @@
+import pytest
+
+from src.services.metrics import ChatMetrics, MetricsRegistry, _Metric
+
+QUESTION = "Tell me about the hostel accommodation rules"
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("name", "help")
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Time per stage.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels("lookup").observe(value)
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# HELP stage_seconds Time per stage.",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="lookup",le="0.1"} 2',
+        'stage_seconds_bucket{stage="lookup",le="1.0"} 3',
+        'stage_seconds_bucket{stage="lookup",le="+Inf"} 4',
+        'stage_seconds_sum{stage="lookup"} 3.65',
+        'stage_seconds_count{stage="lookup"} 4',
+    ]
+
+
+def test_counters_gauges_and_stats_sources_render_with_escaped_labels():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors.", ("endpoint",)).labels('a"b').inc(2)
+    registry.gauge("in_flight", "In flight.").labels().set(3)
+    registry.add_stats_source("cache", lambda: {"hits": 5, "size": None}, counters=("hits",), gauges=("size",))
+    text = registry.render()
+    assert 'errors_total{endpoint="a\\"b"} 2\n' in text
+    assert "in_flight 3\n" in text
+    assert "# TYPE cache_hits_total counter\ncache_hits_total 5\n" in text
+    assert "# TYPE cache_size gauge\ncache_size 0\n" in text
+
+
+def test_request_timer_records_one_request_and_leaves_nothing_in_flight():
+    metrics = ChatMetrics()
+    with metrics.track("chat"):
+        assert metrics.requests_in_flight.labels("chat").value == 1
+    assert metrics.requests_in_flight.labels("chat").value == 0
+    assert metrics.request_seconds.labels("chat").count == 1
+
+
+def test_metrics_endpoint_reports_the_answered_requests(app_client):
+    assert app_client.post("/chat", json={"message": QUESTION}).status_code == 200
+    response = app_client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'chat_request_duration_seconds_count{endpoint="chat"} 1\n' in text
+    assert 'chat_request_duration_seconds_bucket{endpoint="chat",le="+Inf"} 1\n' in text
+    assert 'chat_replies_total{source="model"} 1\n' in text
+    assert 'chat_requests_in_flight{endpoint="chat"} 0\n' in text
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+
+import pytest
+from scrapy import Request
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse
+
+from site_scraper.incremental import IncrementalCrawlMiddleware, IncrementalDeltaPipeline
+from site_scraper.items import SiteScraperItem
+from site_scraper.pipelines import (
+    CombinedDatasetPipeline, DatasetWriter, NearDuplicatePipeline, ShardedJsonlPipeline, SiteScraperPipeline,
+    normalize_text, read_sharded_records, simhash,
+)
+from src.services.data_loader import load_and_process_rag_data
+
+PAGE_A, PAGE_B = "http://example.test/dept/a", "http://example.test/dept/b"
+
+
+def _item(title, text, content_type="course_info", url=PAGE_A):
+    return SiteScraperItem(source_url=url, content_type=content_type, title=title, text_content=text)
+
+
+def test_combined_dataset_pipeline_writes_on_commit_only(tmp_path, make_crawler, spider):
+    path = str(tmp_path / "combined.jsonl")
+    pipeline = CombinedDatasetPipeline.from_crawler(make_crawler(COMBINED_DATASET_FILE=path))
+    item = _item("Course: X", "Diploma in X")
+    assert pipeline.process_item(item, spider) is item
+    writer = DatasetWriter.shared(path)
+    assert writer.counts == {"test_spider": 1}
+    assert not (tmp_path / "combined.jsonl").exists()
+    writer.commit()
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["Course: X"]
+
+
+def test_discarded_dataset_leaves_the_previous_file(tmp_path):
+    path = tmp_path / "combined.jsonl"
+    path.write_text("previous\n", encoding="utf-8")
+    writer = DatasetWriter.shared(str(path))
+    writer.write({"title": "new"}, "test_spider")
+    writer.discard()
+    assert path.read_text(encoding="utf-8") == "previous\n"
+    assert not (tmp_path / "combined.jsonl.tmp").exists()
+
+
+def test_normalize_text_applies_nfkc_and_strips_invisible_characters():
+    assert normalize_text("\ufb01nance\u200b  office\n\t hours ") == "finance office hours"
+
+
+def test_simhash_keeps_near_identical_texts_within_a_few_bits():
+    text = " ".join(f"word{i}" for i in range(80))
+    assert simhash(text) == simhash(text.upper().replace(" ", ", "))
+    assert bin(simhash(text) ^ simhash(text.replace("word70", "changed"))).count("1") <= 6
+    other = "Hostel rooms are allocated to first year students on a first come first served basis"
+    assert bin(simhash(text) ^ simhash(other)).count("1") > 16
+
+
+def _dedup(make_crawler, max_fingerprints=100):
+    return NearDuplicatePipeline.from_crawler(make_crawler(DEDUP_MAX_DISTANCE=3,
+                                                           DEDUP_MAX_FINGERPRINTS=max_fingerprints))
+
+
+def test_near_duplicates_of_the_same_content_type_are_dropped(make_crawler, spider):
+    pipeline = _dedup(make_crawler)
+    text = "The department trains technicians in electrical power, installation and maintenance work."
+    pipeline.process_item(_item("About A", text, "department_description"), spider)
+    with pytest.raises(DropItem):
+        pipeline.process_item(_item("About C", text.replace("trains", "trains  "), "department_description"), spider)
+    # The same text under another content type is kept.
+    pipeline.process_item(_item("Course: A", text), spider)
+
+
+def test_dedup_memory_is_bounded(make_crawler, spider):
+    pipeline = _dedup(make_crawler, max_fingerprints=2)
+    texts = [f"Record number {word} describes a completely different subject area" for word in ("one", "two", "six")]
+    for text in texts:
+        pipeline.process_item(_item("T", text), spider)
+    assert len(pipeline.recent) == 2
+    assert sum(len(fingerprints) for fingerprints in pipeline.bands.values()) == 2 * 4
+    # The oldest fingerprint was forgotten, so its text is accepted again.
+    pipeline.process_item(_item("T", texts[0]), spider)
+
+
+def _marker(department, url=PAGE_A):
+    item = _item(f"Department Page Processed: {department}", f"This department page for '{department}' was scraped.",
+                 "department_page_no_courses_itemized", url)
+    item["metadata"] = {"department": department}
+    return item
+
+
+def test_normalization_trims_markers_and_sets_the_section(make_crawler, spider):
+    pipeline = SiteScraperPipeline.from_crawler(make_crawler())
+    marker = pipeline.process_item(_marker("Liberal  Studies"), spider)
+    assert (marker["title"], marker["text_content"]) == ("Department", "Liberal Studies")
+    with pytest.raises(DropItem):
+        pipeline.process_item(_item("Empty", " \u200b "), spider)
+    item = pipeline.process_item(_item("Course:\u00a0 Diploma", " Diploma  in X "), spider)
+    assert item["title"] == "Course: Diploma"
+    assert item["text_content"] == "Diploma in X"
+    assert item["metadata"] == {"section": "Course: Diploma"}
+
+
+def test_normalized_records_load_into_their_categories(tmp_path, make_crawler, spider):
+    pipeline = SiteScraperPipeline.from_crawler(make_crawler())
+    items = [_item("About A", "The department trains technicians.", "department_description", PAGE_A),
+             _marker("Liberal Studies", PAGE_B), _item("Course: X", "Diploma in X", url=PAGE_A),
+             _item("Open day", "The institute holds an open day in May.", "general_summary")]
+    path = tmp_path / "combined.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(dict(pipeline.process_item(item, spider))) + "\n")
+    rag_data = load_and_process_rag_data(str(path))
+    assert [(record["title"], record["text_content"]) for record in rag_data["departments"]] == [
+        ("About A", "The department trains technicians."), ("Department", "Liberal Studies")]
+    assert [record["title"] for record in rag_data["courses"]] == ["Course: X"]
+    assert [record["title"] for record in rag_data["general_info"]] == ["Open day"]
+
+
+def test_shards_are_capped_and_readable_through_the_index(tmp_path, make_crawler, spider):
+    pipeline = ShardedJsonlPipeline.from_crawler(make_crawler(SHARD_DIR=str(tmp_path), SHARD_MAX_BYTES=460))
+    pipeline.open_spider(spider)
+    for i in range(6):
+        pipeline.process_item(_item(f"Course: {i}", "x" * 100, "course_info" if i % 2 else "department_description"),
+                              spider)
+    pipeline.close_spider(spider)
+    shard_dir = tmp_path / "test_spider"
+    assert len(list(shard_dir.glob("part-*.jsonl"))) == 3
+    records = list(read_sharded_records(str(shard_dir), content_types=("course_info",)))
+    assert [record["title"] for record in records] == ["Course: 1", "Course: 3", "Course: 5"]
+
+
+class _Crawl:
+    """
+    One run of the incremental middleware and the item pipelines over pages
+    given as (url, body, items), closed in the engine's order: the pipelines,
+    then the spider_closed handlers.
+    """
+
+    def __init__(self, make_crawler, spider):
+        crawler = make_crawler(DEDUP_MAX_DISTANCE=3, DEDUP_MAX_FINGERPRINTS=100)
+        self.delta_path = crawler.settings["INCREMENTAL_DELTA_FILE"] % {"name": spider.name}
+        self.shard_dir = os.path.join(crawler.settings["SHARD_DIR"], spider.name)
+        self.spider = spider
+        self.middleware = IncrementalCrawlMiddleware.from_crawler(crawler)
+        self.shards = ShardedJsonlPipeline.from_crawler(crawler)
+        self.pipelines = [SiteScraperPipeline.from_crawler(crawler), NearDuplicatePipeline.from_crawler(crawler),
+                          IncrementalDeltaPipeline.from_crawler(crawler), self.shards]
+
+    def run(self, pages):
+        self.middleware.spider_opened(self.spider)
+        self.shards.open_spider(self.spider)
+        output = []
+        for url, body, items in pages:
+            response = HtmlResponse(url, body=body, request=Request(url))
+            self.middleware.process_spider_input(response, self.spider)
+
+            async def result(items=items):
+                for item in items:
+                    yield item
+
+            async def collect():
+                return [item async for item in self.middleware.process_spider_output(response, result(), self.spider)]
+
+            for item in asyncio.run(collect()):
+                try:
+                    for pipeline in self.pipelines:
+                        item = pipeline.process_item(item, self.spider)
+                except DropItem:
+                    self.middleware.item_discarded(item)
+                    continue
+                output.append(item)
+        self.shards.close_spider(self.spider)
+        self.middleware.spider_closed(self.spider, "finished")
+        with open(self.delta_path, encoding="utf-8") as f:
+            return output, [json.loads(line) for line in f]
+
+
+def test_delta_holds_the_normalized_and_deduplicated_records(make_crawler, spider):
+    description = "The department trains technicians in electrical power, installation and maintenance work."
+    page_a = (PAGE_A, b"<p>a</p>", [
+        _item("Course:  Diploma in X", "Diploma in X - 3 years", url=PAGE_A),
+        _marker("Electrical", PAGE_A),
+        _item("About A", description, "department_description", PAGE_A),
+    ])
+    page_b = (PAGE_B, b"<p>b</p>", [_item("About B", description, "department_description", PAGE_B)])
+
+    output, delta = _Crawl(make_crawler, spider).run([page_a, page_b])
+    assert [item["title"] for item in output] == ["Course: Diploma in X", "Department", "About A"]
+    assert [(line["op"], line["key"]) for line in delta] == [
+        ("added", f"{PAGE_A}|course_info|Course: Diploma in X"),
+        ("added", f"{PAGE_A}|department_page_no_courses_itemized|Department"),
+        ("added", f"{PAGE_A}|department_description|About A"),
+    ]
+    assert delta[0]["record"]["metadata"] == {"section": "Course: Diploma in X"}
+
+
+def test_next_run_writes_only_changes_and_removals(make_crawler, spider):
+    x, z = _item("Course: X", "Diploma in X", url=PAGE_A), _item("Course: Z", "Diploma in Z", url=PAGE_B)
+    _Crawl(make_crawler, spider).run([(PAGE_A, b"<p>a</p>", [x, _item("Course: Y", "Diploma in Y", url=PAGE_A)]),
+                                      (PAGE_B, b"<p>b</p>", [z])])
+
+    revised = _item("Course: Y", "Diploma in Y, revised", url=PAGE_A)
+    output, delta = _Crawl(make_crawler, spider).run([(PAGE_A, b"<p>a, revised</p>", [x.copy(), revised]),
+                                                      (PAGE_B, b"<p>b</p>", [z.copy()])])
+    assert [item["title"] for item in output] == ["Course: Y"]
+    assert [(line["op"], line["key"]) for line in delta] == [("changed", f"{PAGE_A}|course_info|Course: Y")]
+
+    # X is gone from a re-extracted page and page b is no longer linked.
+    _, delta = _Crawl(make_crawler, spider).run([(PAGE_A, b"<p>a, revised again</p>", [revised.copy()])])
+    assert sorted((line["op"], line["key"]) for line in delta) == [
+        ("removed", f"{PAGE_A}|course_info|Course: X"),
+        ("removed", f"{PAGE_B}|course_info|Course: Z"),
+    ]
+
+
+def test_shards_of_an_incremental_run_still_hold_the_whole_crawl(tmp_path, make_crawler, spider):
+    x, y = _item("Course: X", "Diploma in X", url=PAGE_A), _item("Course: Y", "Diploma in Y", url=PAGE_A)
+    z = _item("Course: Z", "Diploma in Z", url=PAGE_B)
+    first = _Crawl(make_crawler, spider)
+    first.run([(PAGE_A, b"<p>a</p>", [x, y]), (PAGE_B, b"<p>b</p>", [z])])
+
+    # Nothing changed on page b, so the second run passes none of its records on.
+    second = _Crawl(make_crawler, spider)
+    output, _ = second.run([(PAGE_A, b"<p>a, revised</p>", [_item("Course: Y", "Diploma in Y, revised", url=PAGE_A)]),
+                            (PAGE_B, b"<p>b</p>", [z.copy()])])
+    assert [item["title"] for item in output] == ["Course: Y"]
+    records = {record["title"]: record["text_content"] for record in read_sharded_records(second.shard_dir)}
+    assert records == {"Course: Y": "Diploma in Y, revised", "Course: Z": "Diploma in Z"}
+    assert not (tmp_path / "shards" / "test_spider.tmp").exists()
@@ -0,0 +1,45 @@
+from src.services.knowledge import build_knowledge_base
+from src.services.prompt_builder import compact_rag_data, create_system_prompt
+
+FEES = {
+    "title": "Fee Structure",
+    "annual_fees": [{"item": "Tuition", "cost": 56420}, {"item": "Exam", "cost": None}],
+    "new_student_fees": {"diploma_level_6": {"total": 3000, "registration": None}},
+    "payment_instructions": ["Pay  at the   bank."],
+}
+
+
+def test_compact_fee_table_renders_missing_amounts():
+    prompt = create_system_prompt({"fees_structure": FEES})
+    assert "- Tuition: 56,420" in prompt
+    assert "- Exam: N/A" in prompt
+    assert "total 3,000 (registration N/A" in prompt
+
+
+def test_uncompacted_fee_table_renders_missing_amounts():
+    prompt = create_system_prompt({"fees_structure": FEES}, compact=False)
+    assert "- Tuition: 56,420.00 KES" in prompt
+    assert "- Exam: N/A KES" in prompt
+    assert "Registration: N/A" in prompt
+
+
+def test_compact_prompt_is_smaller():
+    rag_data = {"fees_structure": FEES}
+    assert len(create_system_prompt(rag_data)) < len(create_system_prompt(rag_data, compact=False))
+
+
+CONTACT = {"title": "Contacts", "text_content": "Call 0712 345 678 or email info@rvnp.ac.ke"}
+ABOUT = {"title": "About", "text_content": "RVNP is in Eldoret. Call 0712 345 678 or email info@rvnp.ac.ke for admissions."}
+
+
+def test_near_duplicates_are_merged_within_a_record_list():
+    compacted = compact_rag_data({"general_info": [ABOUT, {"title": "Phone", "text_content": "Call 0712 345 678"}]})
+    assert [item["title"] for item in compacted["general_info"]] == ["About / Phone"]
+
+
+def test_contacts_repeated_in_a_longer_record_stay_pinned():
+    rag_data = {"general_info": [ABOUT], "contact_info": [CONTACT]}
+    assert compact_rag_data(rag_data)["contact_info"][0]["title"] == "Contacts"
+    pinned = build_knowledge_base(rag_data).pinned
+    assert [doc.kind for doc in pinned] == ["contact_info"]
+    assert "info@rvnp.ac.ke" in pinned[0].text
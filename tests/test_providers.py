@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.services.config import BackendSettings, LLMSettings, RoutingSettings
+from src.services.metrics import ChatMetrics
+from src.services.providers import CircuitBreaker, ProviderRouter, UpstreamUnavailable
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=0) and breaker.state == "closed"
+    breaker.record_failure(now=1)
+    assert breaker.state == "open" and not breaker.allow(now=5)
+    assert breaker.retry_in(now=5) == 6
+    # After the reset time a single trial call is let through.
+    assert breaker.allow(now=11) and breaker.state == "half_open"
+    assert not breaker.allow(now=11)
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow(now=12)
+
+
+def test_failed_trial_opens_the_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=10)
+    breaker.record_failure(now=10)
+    assert breaker.state == "open" and not breaker.allow(now=15)
+
+
+def _completion(text):
+    return {"id": "c", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]}
+
+
+def _router(statuses, max_retries=2, breaker_failures=5):
+    """
+    A router over backends named after the keys of statuses, each answering
+    with its list of HTTP statuses in turn (200 for a completion).
+    """
+    calls = []
+
+    def handler(request):
+        host = request.url.host
+        calls.append(host)
+        status = statuses[host].pop(0)
+        if status == 200:
+            return httpx.Response(200, json=_completion(f"answer from {host}"))
+        return httpx.Response(status, json={"error": {"message": "failed"}})
+
+    llm = LLMSettings(api_key="test", timeout=5, max_retries=max_retries)
+    routing = RoutingSettings(
+        backends=tuple(BackendSettings(host, f"http://{host}/v1", "m", "key") for host in statuses),
+        hedging=False, breaker_failures=breaker_failures, retry_base_delay=0.001, retry_max_delay=0.001,
+    )
+    router = ProviderRouter(llm, routing, httpx.AsyncClient(transport=httpx.MockTransport(handler)), ChatMetrics())
+    return router, calls
+
+
+def _answer(router):
+    async def run():
+        response, backend = await router.complete(MESSAGES)
+        return response.choices[0].message.content, backend.name
+    return asyncio.run(run())
+
+
+def test_retryable_failure_fails_over_to_the_next_backend():
+    router, calls = _router({"primary": [503], "secondary": [200]})
+    assert _answer(router) == ("answer from secondary", "secondary")
+    assert calls == ["primary", "secondary"]
+
+
+def test_retries_back_off_and_try_every_backend_again():
+    router, calls = _router({"primary": [503, 200], "secondary": [502]})
+    assert _answer(router) == ("answer from primary", "primary")
+    assert calls == ["primary", "secondary", "primary"]
+
+
+def test_gives_up_after_max_retries():
+    router, calls = _router({"primary": [503, 503, 503]}, max_retries=1)
+    with pytest.raises(Exception) as error:
+        _answer(router)
+    assert getattr(error.value, "status_code", None) == 503
+    assert len(calls) == 2
+
+
+def test_rejected_request_is_not_retried_and_keeps_the_circuit_closed():
+    router, calls = _router({"primary": [400], "secondary": [200]}, breaker_failures=1)
+    with pytest.raises(Exception) as error:
+        _answer(router)
+    assert getattr(error.value, "status_code", None) == 400
+    assert calls == ["primary"]
+    assert router.backends[0].breaker.state == "closed"
+
+
+def test_open_circuits_everywhere_fail_fast():
+    router, calls = _router({"primary": [503]}, max_retries=0, breaker_failures=1)
+    with pytest.raises(Exception):
+        _answer(router)
+    with pytest.raises(UpstreamUnavailable) as error:
+        _answer(router)
+    assert error.value.retry_after > 0
+    assert calls == ["primary"]
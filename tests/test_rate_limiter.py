@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src.services.config import LLMSettings
+from src.services.metrics import ChatMetrics
+from src.services.rate_limiter import RateLimitExceeded, TokenBucket, UpstreamLimiter
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.take(60)
+    # One token per second: 10 tokens are available after 10 seconds.
+    assert bucket.wait_time(10, now + 10) == 0
+    assert bucket.wait_time(20, now + 10) == pytest.approx(10)
+    assert bucket.wait_time(0, now + 1000) == 0 and bucket.level == 60
+
+
+def test_bucket_debt_is_waited_out_by_later_callers():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    bucket.take(90)
+    assert bucket.wait_time(1, now) == pytest.approx(31)
+
+
+def test_settle_refunds_the_unused_reservation():
+    limiter = UpstreamLimiter(LLMSettings(api_key="test", tokens_per_minute=1000), ChatMetrics())
+
+    async def run():
+        async with limiter.admit(400) as admission:
+            admission.settle(100)
+
+    asyncio.run(run())
+    assert limiter.token_bucket.level == pytest.approx(900, abs=1)
+
+
+def test_call_over_the_quota_is_shed_instead_of_queued():
+    limiter = UpstreamLimiter(LLMSettings(api_key="test", requests_per_minute=1, queue_timeout=5), ChatMetrics())
+
+    async def run():
+        async with limiter.admit(10):
+            pass
+        async with limiter.admit(10):
+            pass
+
+    with pytest.raises(RateLimitExceeded) as error:
+        asyncio.run(run())
+    assert error.value.reason == "quota"
+    assert error.value.retry_after > 5
+    assert (limiter.admitted, limiter.shed) == (1, 1)
+
+
+def test_full_queue_rejects_new_calls():
+    limiter = UpstreamLimiter(LLMSettings(api_key="test", max_concurrency=1, max_queue=1, queue_timeout=5),
+                              ChatMetrics())
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.admit(10):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        try:
+            async with limiter.admit(10):
+                pass
+        finally:
+            release.set()
+            await asyncio.gather(holder, waiter)
+
+    with pytest.raises(RateLimitExceeded) as error:
+        asyncio.run(run())
+    assert error.value.reason == "queue_full"
+    assert limiter.admitted == 2
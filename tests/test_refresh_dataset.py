@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from site_scraper.pipelines import DatasetWriter
+from src.refresh_dataset import SCRAPY_DATA_DIR, SCRAPY_PROJECT_DIR, crawl_into_dataset, project_settings
+
+
+def test_project_paths_are_resolved_without_changing_directory():
+    cwd = os.getcwd()
+    settings = project_settings()
+    assert os.getcwd() == cwd
+    assert settings.get("HTTPCACHE_DIR") == os.path.join(SCRAPY_DATA_DIR, "httpcache")
+    assert settings.get("INCREMENTAL_STATE_DIR") == os.path.join(SCRAPY_DATA_DIR, "crawl_state")
+    assert settings.get("SHARD_DIR") == os.path.join(SCRAPY_PROJECT_DIR, "shards")
+    assert os.path.isabs(settings.get("INCREMENTAL_DELTA_FILE"))
+
+
+def test_a_crawl_that_fails_to_start_leaves_no_temp_file(tmp_path):
+    output_file = str(tmp_path / "combined.jsonl")
+    with pytest.raises(KeyError):
+        crawl_into_dataset(output_file, ["no_such_spider"])
+    assert list(tmp_path.iterdir()) == []
+    assert output_file not in DatasetWriter._open
@@ -0,0 +1,82 @@
+import asyncio
+import types
+
+import pytest
+
+from src.services import response_cache
+from src.services.response_cache import DiskCacheBackend, ResponseCache, normalize_message
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_make_key_ignores_case_punctuation_and_spacing():
+    assert normalize_message("  What are the FEES?? ") == "what are the fees"
+    assert ResponseCache.make_key("What are the fees?", "v1") == ResponseCache.make_key("what are  the fees", "v1")
+    assert ResponseCache.make_key("What are the fees?", "v1") != ResponseCache.make_key("What are the fees?", "v2")
+
+
+def test_lru_evicts_the_least_recently_used_entry(clock):
+    async def run():
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        await cache.set("a", "A")
+        await cache.set("b", "B")
+        assert await cache.get("a") == "A"
+        await cache.set("c", "C")
+        return cache, await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    cache, a, b, c = asyncio.run(run())
+    assert (a, b, c) == ("A", None, "C")
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    async def run():
+        cache = ResponseCache(max_entries=8, ttl_seconds=60)
+        await cache.set("a", "A")
+        clock.value += 59
+        fresh = await cache.get("a")
+        clock.value += 2
+        return cache, fresh, await cache.get("a")
+
+    cache, fresh, expired = asyncio.run(run())
+    assert fresh == "A"
+    assert expired is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_tier_survives_a_new_memory_tier(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def run():
+        first = ResponseCache(max_entries=8, ttl_seconds=60, backend=DiskCacheBackend(path))
+        await first.set("a", "A")
+        first.close()
+        second = ResponseCache(max_entries=8, ttl_seconds=60, backend=DiskCacheBackend(path))
+        try:
+            return await second.get("a")
+        finally:
+            second.close()
+
+    assert asyncio.run(run()) == "A"
+
+
+def test_disk_tier_deletes_the_oldest_entries_beyond_its_bound(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path / "cache.sqlite"), max_entries=10)
+    try:
+        for i in range(11):
+            backend.set(f"k{i}", "v", created_at=float(i))
+        # Going over the bound deletes the excess plus a tenth of the bound.
+        assert len(backend) == 9
+        assert backend.evictions == 2
+        assert backend.get("k0") is None and backend.get("k1") is None
+        assert backend.get("k10") == ("v", 10.0)
+        backend.set("k10", "w", created_at=11.0)
+        assert len(backend) == 9
+    finally:
+        backend.close()
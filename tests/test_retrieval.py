@@ -0,0 +1,42 @@
+from src.services.retrieval import BM25Index, Document, tokenize
+
+
+def _doc(doc_id, title, text):
+    return Document(doc_id, "general_info", title, text)
+
+
+DOCS = [
+    _doc("fees", "Fee structure", "Tuition fees are paid per term at the finance office."),
+    _doc("hostel", "Accommodation", "The hostel has rooms for 400 students. Hostel fees are paid per term."),
+    _doc("library", "Library", "The library opens at 8am and lends books to students."),
+]
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("What are the fees for courses?") == ["fee", "course"]
+
+
+def test_search_ranks_the_most_relevant_document_first():
+    index = BM25Index(DOCS)
+    results = index.search("hostel rooms", top_k=3)
+    assert [doc.doc_id for doc, _ in results] == ["hostel"]
+
+
+def test_search_orders_by_score_and_respects_top_k():
+    index = BM25Index(DOCS)
+    results = index.search("fees per term", top_k=3)
+    assert [doc.doc_id for doc, _ in results] == ["fees", "hostel"]
+    assert results[0][1] > results[1][1]
+    assert len(index.search("fees per term", top_k=1)) == 1
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    index = BM25Index(DOCS)
+    # "students" appears in two documents, "books" only in the library one.
+    [(best, _)] = index.search("students books", top_k=1)
+    assert best.doc_id == "library"
+
+
+def test_query_without_known_terms_returns_nothing():
+    assert BM25Index(DOCS).search("swimming pool") == []
+    assert BM25Index([]).search("fees") == []
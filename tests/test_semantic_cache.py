@@ -0,0 +1,51 @@
+from src.services.semantic_cache import NgramVectorizer, SemanticCache, anchor_terms
+
+CORPUS = [
+    "Diploma in ICT fees and duration",
+    "Certificate in Electrical Installation entry requirements",
+    "Hostel accommodation for students",
+    "Library opening hours",
+]
+
+
+def _cache(**kwargs):
+    return SemanticCache(NgramVectorizer(dim=256).fit(CORPUS), **kwargs)
+
+
+def test_paraphrase_with_only_filler_words_added_hits():
+    cache = _cache(threshold=0.8)
+    cache.add("What are the fees for the Diploma in ICT?", "KES 30,000 per term", "v1")
+    match = cache.lookup("Please tell me the fees for the diploma in ICT", "v1")
+    assert match is not None and match[0] == "KES 30,000 per term"
+
+
+def test_similar_question_about_something_else_misses():
+    cache = _cache(threshold=0.5)
+    cache.add("What are the fees for the Diploma in ICT?", "ICT fees", "v1")
+    assert anchor_terms("fees for the certificate in ICT") != anchor_terms("fees for the Diploma in ICT")
+    assert cache.lookup("What are the fees for the Certificate in ICT?", "v1") is None
+
+
+def test_answers_are_scoped_to_the_knowledge_base_version():
+    cache = _cache()
+    cache.add("Library opening hours", "8am", "v1")
+    assert cache.lookup("Library opening hours", "v2") is None
+    assert cache.lookup("Library opening hours", "v1")[0] == "8am"
+
+
+def test_lookup_uses_the_given_vectorizer():
+    cache = _cache()
+    other = NgramVectorizer(dim=256).fit(["completely different corpus text"])
+    cache.add("Hostel accommodation for students", "Yes", "v2", other)
+    assert cache.lookup("Hostel accommodation for students", "v2", other)[0] == "Yes"
+
+
+def test_capacity_evicts_the_least_recently_used_question():
+    cache = _cache(capacity=2)
+    cache.add("Library opening hours", "8am", "v1")
+    cache.add("Hostel accommodation for students", "Yes", "v1")
+    assert cache.lookup("Library opening hours", "v1") is not None
+    cache.add("Diploma in ICT fees and duration", "KES", "v1")
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.lookup("Hostel accommodation for students", "v1") is None
+    assert cache.lookup("Library opening hours", "v1") is not None
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from src.services.sessions import InMemorySessionBackend, SessionBackend, SqliteSessionBackend, history_messages
+
+from conftest import FakeClient
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SessionBackend()
+
+
+def test_memory_store_keeps_the_last_turns_and_evicts_the_least_recently_written_session():
+    store = InMemorySessionBackend(max_sessions=2, max_turns=2)
+    for i in range(3):
+        store.append("a", f"q{i}", f"a{i}")
+    assert store.load("a") == ["q1", "a1", "q2", "a2"]
+    store.append("b", "q", "a")
+    store.append("a", "q3", "a3")
+    store.append("c", "q", "a")
+    assert store.load("b") == []
+    assert store.load("a") == ["q2", "a2", "q3", "a3"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_accounts_for_what_it_actually_allocates():
+    store = InMemorySessionBackend(max_sessions=10_000, max_bytes=2**30)
+    tracemalloc.start()
+    for i in range(3000):
+        for turn in range(3):
+            store.append(f"session-{i}", f"question {i} {turn} " * 5, f"answer {i} {turn} " * 20)
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert traced <= store.stats()["bytes"] <= 1.2 * traced
+
+
+def test_sqlite_store_reports_size_and_expirations(tmp_path):
+    store = SqliteSessionBackend(str(tmp_path / "sessions.db"), idle_seconds=0.05, max_turns=4)
+    try:
+        store.append("a", "question", "answer")
+        stats = store.stats()
+        assert stats["sessions"] == 1 and stats["bytes"] > 0 and stats["expirations"] == 0
+        assert "evictions" not in stats
+        time.sleep(0.1)
+        assert store.load("a") == []
+        assert store.prune() == 1
+        assert store.stats() == {"backend": "sqlite", "sessions": 0, "bytes": 0, "expirations": 1}
+    finally:
+        store.close()
+
+
+def test_history_keeps_the_most_recent_pairs_within_the_budget():
+    turns = ["old question " * 20, "old answer " * 20, "new question", "new answer"]
+    assert history_messages(turns, budget_tokens=30) == [
+        {"role": "user", "content": "new question"},
+        {"role": "assistant", "content": "new answer"},
+    ]
+
+
+def test_blocking_store_is_used_off_the_event_loop(tmp_path, make_service):
+    store = SqliteSessionBackend(str(tmp_path / "sessions.db"), idle_seconds=60, max_turns=4)
+    threads = []
+    for name in ("load", "append"):
+        method = getattr(store, name)
+
+        def record(*args, _method=method):
+            threads.append(threading.current_thread())
+            return _method(*args)
+        setattr(store, name, record)
+    service = make_service(FakeClient(), sessions=store)
+    try:
+        asyncio.run(service.reply("Tell me about the hostel accommodation rules", session_id="s1"))
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+        assert len(store.load("s1")) == 2
+    finally:
+        store.close()
@@ -0,0 +1,46 @@
+from src.services import knowledge_bundle, response_cache, tokens
+from src.services.prompt_builder import count_section_tokens, fit_documents
+from src.services.retrieval import Document
+from src.services.tokens import estimate_message_tokens, estimate_tokens
+
+
+def _doc(doc_id, lines):
+    return Document(doc_id, "general_info", doc_id.title(), "\n".join(lines))
+
+
+def test_estimate_counts_words_digit_groups_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Fees: 56420 KES") == 5
+    # Long words count as several tokens.
+    assert estimate_tokens("accommodation") == 2
+
+
+def test_message_estimate_adds_the_template_overhead():
+    messages = [{"role": "user", "content": "hello there"}]
+    assert estimate_message_tokens(messages) == estimate_tokens("hello there") + 4
+
+
+def test_fit_documents_keeps_sections_in_order_within_the_budget():
+    small = _doc("small", ["Open on weekdays."])
+    large = _doc("large", [f"Line {i} of the hostel rules for every student." for i in range(40)])
+    costs = {doc.doc_id: count_section_tokens(doc) for doc in (small, large)}
+
+    kept, dropped = fit_documents([small, large], costs["small"] + costs["large"], costs)
+    assert kept == [small, large] and dropped == 0
+
+    kept, dropped = fit_documents([large, small], costs["small"] + 10, costs)
+    assert kept == [small] and dropped == 1
+
+
+def test_fit_documents_cuts_an_oversized_section_to_whole_lines():
+    large = _doc("large", [f"Line {i} of the hostel rules for every student." for i in range(40)])
+    kept, dropped = fit_documents([large], 120, {})
+    assert dropped == 0
+    [cut] = kept
+    assert cut.text.startswith("Line 0 ") and len(cut.text) < len(large.text)
+    assert count_section_tokens(cut) <= 120
+
+
+def test_bundle_key_covers_the_token_and_normalization_modules():
+    assert tokens in knowledge_bundle._BUILDER_MODULES
+    assert response_cache in knowledge_bundle._BUILDER_MODULES